@@ -22,6 +22,8 @@ from tools.knowledge_tools import get_knowledge_tools
 from tools.search_tools import get_search_tools
 from knowledge_base import initialize_knowledge_base
 from google.oauth2.credentials import Credentials
+from google_clients import get_service
+from drive_resolver import get_drive_resolver
 
 
 class AgentState(TypedDict):
@@ -39,25 +41,26 @@ class MemoryLogger:
     
     def _ensure_memory_doc(self):
         """Ensure the Agent_Memory_Log document exists, create if not."""
-        from googleapiclient.discovery import build
+        docs_service = get_service(self.creds, 'docs')
+        resolver = get_drive_resolver()
         
-        docs_service = build('docs', 'v1', credentials=self.creds)
-        drive_service = build('drive', 'v3', credentials=self.creds)
-        
-        # Search for existing document
-        results = drive_service.files().list(
-            q="name='Agent_Memory_Log' and mimeType='application/vnd.google-apps.document'",
-            fields="files(id, name)"
-        ).execute()
-        
-        files = results.get('files', [])
+        # Look up the existing document (cached by name); a cached ID that now 404s is dropped
+        # and looked up again, and if the document is gone it is recreated below
+        file, _ = resolver.fetch(
+            self.creds, 'Agent_Memory_Log',
+            lambda f: docs_service.documents().get(documentId=f['id'], fields='documentId').execute(),
+            mime_type='application/vnd.google-apps.document'
+        )
         
-        if files:
-            self.doc_id = files[0]['id']
+        if file:
+            self.doc_id = file['id']
         else:
             # Create new document
             doc = docs_service.documents().create(body={'title': 'Agent_Memory_Log'}).execute()
             self.doc_id = doc.get('documentId')
+            resolver.remember(self.creds, 'Agent_Memory_Log', {
+                'id': self.doc_id, 'name': 'Agent_Memory_Log', 'mimeType': 'application/vnd.google-apps.document'
+            }, mime_type='application/vnd.google-apps.document')
             
             # Add initial header
             requests = [
@@ -75,9 +78,7 @@ class MemoryLogger:
     
     def log_conversation(self, user_message: str, agent_response: str):
         """Log a conversation turn to the memory doc."""
-        from googleapiclient.discovery import build
-        
-        docs_service = build('docs', 'v1', credentials=self.creds)
+        docs_service = get_service(self.creds, 'docs')
         
         # Get current document end index
         doc = docs_service.documents().get(documentId=self.doc_id).execute()
@@ -107,9 +108,7 @@ class MemoryLogger:
     
     def log_action(self, action: str, details: str = ""):
         """Log an action (tool call) to the memory doc."""
-        from googleapiclient.discovery import build
-        
-        docs_service = build('docs', 'v1', credentials=self.creds)
+        docs_service = get_service(self.creds, 'docs')
         
         # Get current document end index
         doc = docs_service.documents().get(documentId=self.doc_id).execute()
@@ -358,10 +358,9 @@ def generate_daily_briefing(creds: Credentials) -> str:
     Returns a formatted string.
     """
     from tools.calendar_tools import get_calendar_service
-    from tools.gmail_tools import get_gmail_service
-    from googleapiclient.discovery import build
+    from tools.gmail_tools import get_gmail_service, get_message_metadata, message_headers
+    from tools.task_tools import get_tasks_service
     from datetime import datetime, timedelta
-    import base64
     
     briefing_parts = []
     briefing_parts.append("=" * 60)
@@ -423,12 +422,11 @@ def generate_daily_briefing(creds: Credentials) -> str:
         messages = results.get('messages', [])
         briefing_parts.append("HIGH PRIORITY EMAILS")
         if messages:
-            for msg in messages[:5]:  # Top 5
-                msg_detail = gmail_service.users().messages().get(userId='me', id=msg['id']).execute()
-                payload = msg_detail['payload']
-                headers = payload.get('headers', [])
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
+            top_messages = get_message_metadata(gmail_service, [msg['id'] for msg in messages[:5]])  # Top 5
+            for msg_detail in top_messages:
+                headers = message_headers(msg_detail)
+                subject = headers.get('Subject', 'No Subject')
+                sender = headers.get('From', 'Unknown')
                 # Extract email from sender (may include name)
                 sender_email = sender.split('<')[-1].replace('>', '').strip() if '<' in sender else sender
                 briefing_parts.append(f"  • From: {sender_email}")
@@ -443,7 +441,7 @@ def generate_daily_briefing(creds: Credentials) -> str:
     
     # 3. Due Tasks
     try:
-        tasks_service = build('tasks', 'v1', credentials=creds)
+        tasks_service = get_tasks_service(creds)
         tasklists = tasks_service.tasklists().list(maxResults=10).execute()
         tasklist_items = tasklists.get('items', [])
         
@@ -628,7 +626,7 @@ def generate_meeting_prep(creds: Credentials) -> str:
     Identify the next event, search Gmail/Drive for context on attendees, and return a summary.
     """
     from tools.calendar_tools import get_calendar_service
-    from tools.gmail_tools import get_gmail_service
+    from tools.gmail_tools import get_gmail_service, get_message_metadata, message_headers
     from tools.drive_tools import get_drive_service, get_docs_service
     from datetime import datetime, timedelta
     from dateutil import tz
@@ -711,12 +709,11 @@ def generate_meeting_prep(creds: Credentials) -> str:
                 messages = results.get('messages', [])
                 if messages:
                     context_parts.append("Recent Email Context:")
-                    for msg in messages[:3]:  # Top 3
-                        msg_detail = gmail_service.users().messages().get(userId='me', id=msg['id']).execute()
-                        payload = msg_detail['payload']
-                        headers = payload.get('headers', [])
-                        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                        sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
+                    recent = get_message_metadata(gmail_service, [msg['id'] for msg in messages[:3]])  # Top 3
+                    for msg_detail in recent:
+                        headers = message_headers(msg_detail)
+                        subject = headers.get('Subject', 'No Subject')
+                        sender = headers.get('From', 'Unknown')
                         context_parts.append(f"  • {subject} (from {sender})")
                     context_parts.append("")
             except Exception as e:
@@ -761,8 +758,8 @@ def inbox_triage(creds: Credentials) -> List[Dict[str, str]]:
     Read top 10 unread emails and return a list of dicts with: sender, subject, summary, suggested_action.
     For now, summary and suggested_action will be basic - can be enhanced with LLM later.
     """
-    from tools.gmail_tools import get_gmail_service
-    import base64
+    from tools.gmail_tools import get_gmail_service, get_message_metadata, message_headers
+    import html
     
     try:
         gmail_service = get_gmail_service(creds)
@@ -780,32 +777,18 @@ def inbox_triage(creds: Credentials) -> List[Dict[str, str]]:
         
         triage_list = []
         
-        for msg in messages[:10]:
+        # Headers and Gmail's plain-text snippet for all messages in one batched request
+        for msg_detail in get_message_metadata(gmail_service, [msg['id'] for msg in messages[:10]]):
             try:
-                msg_detail = gmail_service.users().messages().get(userId='me', id=msg['id']).execute()
-                payload = msg_detail['payload']
-                headers = payload.get('headers', [])
+                headers = message_headers(msg_detail)
                 
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                sender_header = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
+                subject = headers.get('Subject', 'No Subject')
+                sender_header = headers.get('From', 'Unknown')
                 # Extract email from sender
                 sender = sender_header.split('<')[-1].replace('>', '').strip() if '<' in sender_header else sender_header
                 
-                # Get body for summary (first 200 chars)
-                body = ""
-                try:
-                    if 'parts' in payload:
-                        for part in payload['parts']:
-                            if part['mimeType'] == 'text/plain':
-                                data = part['body']['data']
-                                body = base64.urlsafe_b64decode(data).decode('utf-8')
-                                break
-                    else:
-                        if payload['mimeType'] == 'text/plain':
-                            data = payload['body']['data']
-                            body = base64.urlsafe_b64decode(data).decode('utf-8')
-                except:
-                    body = ""
+                # Summary from the snippet (first 200 chars of the body)
+                body = html.unescape(msg_detail.get('snippet', ''))
                 
                 summary = body[:200].replace('\n', ' ').strip() if body else "No preview available"
                 if len(summary) == 200:
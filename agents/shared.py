@@ -7,6 +7,8 @@ from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 from datetime import datetime
 from google.oauth2.credentials import Credentials
+from google_clients import get_service
+from drive_resolver import get_drive_resolver
 
 
 class AgentState(TypedDict):
@@ -25,25 +27,26 @@ class MemoryLogger:
     
     def _ensure_memory_doc(self):
         """Ensure the memory document exists, create if not."""
-        from googleapiclient.discovery import build
-        
-        docs_service = build('docs', 'v1', credentials=self.creds)
-        drive_service = build('drive', 'v3', credentials=self.creds)
-        
-        # Search for existing document
-        results = drive_service.files().list(
-            q=f"name='{self.doc_name}' and mimeType='application/vnd.google-apps.document'",
-            fields="files(id, name)"
-        ).execute()
-        
-        files = results.get('files', [])
+        docs_service = get_service(self.creds, 'docs')
+        resolver = get_drive_resolver()
+        
+        # Look up the existing document (cached by name); a cached ID that now 404s is dropped
+        # and looked up again, and if the document is gone it is recreated below
+        file, _ = resolver.fetch(
+            self.creds, self.doc_name,
+            lambda f: docs_service.documents().get(documentId=f['id'], fields='documentId').execute(),
+            mime_type='application/vnd.google-apps.document'
+        )
         
-        if files:
-            self.doc_id = files[0]['id']
+        if file:
+            self.doc_id = file['id']
         else:
             # Create new document
             doc = docs_service.documents().create(body={'title': self.doc_name}).execute()
             self.doc_id = doc.get('documentId')
+            resolver.remember(self.creds, self.doc_name, {
+                'id': self.doc_id, 'name': self.doc_name, 'mimeType': 'application/vnd.google-apps.document'
+            }, mime_type='application/vnd.google-apps.document')
             
             # Add initial header
             requests = [
@@ -61,9 +64,7 @@ class MemoryLogger:
     
     def log_conversation(self, user_message: str, agent_response: str, agent_name: str = "Agent"):
         """Log a conversation turn to the memory doc."""
-        from googleapiclient.discovery import build
-        
-        docs_service = build('docs', 'v1', credentials=self.creds)
+        docs_service = get_service(self.creds, 'docs')
         
         # Get current document end index
         doc = docs_service.documents().get(documentId=self.doc_id).execute()
@@ -93,9 +94,7 @@ class MemoryLogger:
     
     def log_action(self, action: str, details: str = "", agent_name: str = "Agent"):
         """Log an action (tool call) to the memory doc."""
-        from googleapiclient.discovery import build
-        
-        docs_service = build('docs', 'v1', credentials=self.creds)
+        docs_service = get_service(self.creds, 'docs')
         
         # Get current document end index
         doc = docs_service.documents().get(documentId=self.doc_id).execute()
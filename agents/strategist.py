@@ -14,7 +14,9 @@ from langgraph.checkpoint.memory import MemorySaver
 from google.oauth2.credentials import Credentials
 
 from agents.shared import AgentState, MemoryLogger, run_agent
-from tools.drive_tools import get_drive_service, get_docs_service, get_sheets_service, get_drive_tools
+from tools.drive_tools import get_docs_service, get_sheets_service, get_drive_tools
+from drive_resolver import get_drive_resolver
+from doc_extractor import GET_ALL_TABS, extract_document
 
 
 def load_strategy_context(creds: Credentials) -> str:
@@ -29,82 +31,44 @@ def load_strategy_context(creds: Credentials) -> str:
     ]
     
     context_parts = []
-    drive_service = get_drive_service(creds)
     docs_service = get_docs_service(creds)
     sheets_service = get_sheets_service(creds)
+    resolver = get_drive_resolver()
+    
+    def open_file(file):
+        """Fetch a Doc, or a Sheet's metadata (other types aren't read)."""
+        if 'document' in file.get('mimeType', ''):
+            return docs_service.documents().get(documentId=file['id'], **GET_ALL_TABS).execute()
+        if 'spreadsheet' in file.get('mimeType', ''):
+            return sheets_service.spreadsheets().get(spreadsheetId=file['id']).execute()
+        return None
     
     for file_name in required_files:
         try:
-            # Search for the file - try multiple variations
-            search_queries = [
-                f"name='{file_name}'",
-                f"name contains '{file_name}'",
-                f"fullText contains '{file_name}'"
-            ]
-            
-            file_id = None
-            file_type = None
+            # Find the file (exact name, then partial and full-text matches; lookups are cached)
+            file, opened = resolver.fetch(creds, file_name, open_file, fuzzy=True)
             
-            for query in search_queries:
-                results = drive_service.files().list(
-                    q=query,
-                    pageSize=5,
-                    fields="files(id, name, mimeType)"
-                ).execute()
-                
-                files = results.get('files', [])
-                if files:
-                    # Prefer exact match
-                    exact_match = [f for f in files if f.get('name') == file_name]
-                    if exact_match:
-                        file_id = exact_match[0]['id']
-                        file_type = exact_match[0].get('mimeType', '')
-                        break
-                    else:
-                        file_id = files[0]['id']
-                        file_type = files[0].get('mimeType', '')
-                        break
-            
-            if not file_id:
+            if not file:
                 context_parts.append(f"\n--- {file_name} ---\n[FILE NOT FOUND - Please ensure this file exists in Google Drive]")
                 continue
             
+            file_id = file['id']
+            file_type = file.get('mimeType', '')
+            
             # Read content based on file type
             content = ""
             if 'document' in file_type:
                 # Google Doc
-                doc = docs_service.documents().get(documentId=file_id).execute()
-                title = doc.get('title', file_name)
-                body_content = doc.get('body', {}).get('content', [])
-                
-                # Extract text from document elements
-                for element in body_content:
-                    if 'paragraph' in element:
-                        para = element['paragraph']
-                        for elem in para.get('elements', []):
-                            if 'textRun' in elem:
-                                content += elem['textRun'].get('content', '')
-                    elif 'table' in element:
-                        # Handle tables
-                        for row in element['table'].get('tableRows', []):
-                            row_text = []
-                            for cell in row.get('tableCells', []):
-                                cell_content = cell.get('content', [])
-                                cell_text = ""
-                                for cell_elem in cell_content:
-                                    if 'paragraph' in cell_elem:
-                                        for para_elem in cell_elem['paragraph'].get('elements', []):
-                                            if 'textRun' in para_elem:
-                                                cell_text += para_elem['textRun'].get('content', '')
-                                row_text.append(cell_text)
-                            content += ' | '.join(row_text) + '\n'
+                extracted = extract_document(opened)
+                title = extracted['title'] or file_name
+                content = extracted['text']
                 
                 context_parts.append(f"\n--- {title} ---\n{content}")
                 
             elif 'spreadsheet' in file_type:
                 # Google Sheet - read first tab
                 try:
-                    spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=file_id).execute()
+                    spreadsheet = opened
                     sheet_names = [s.get('properties', {}).get('title', 'Sheet1') for s in spreadsheet.get('sheets', [])]
                     first_sheet = sheet_names[0] if sheet_names else 'Sheet1'
                     
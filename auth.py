@@ -7,7 +7,7 @@ import os
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
+from google_clients import get_service
 
 # Scopes required for the application
 SCOPES = [
@@ -109,7 +109,7 @@ def get_user_email(creds):
             if creds.expired and creds.refresh_token:
                 creds.refresh(Request())
         
-        gmail_service = build('gmail', 'v1', credentials=creds)
+        gmail_service = get_service(creds, 'gmail')
         profile = gmail_service.users().getProfile(userId='me').execute()
         email = profile.get('emailAddress')
         if email:
@@ -123,7 +123,7 @@ def get_user_email(creds):
             if creds.expired and creds.refresh_token:
                 creds.refresh(Request())
         
-        service = build('oauth2', 'v2', credentials=creds)
+        service = get_service(creds, 'oauth2')
         user_info = service.userinfo().get().execute()
         email = user_info.get('email')
         if email:
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Offline retrieval quality and latency benchmark for the knowledge base.
+
+Builds a fresh collection from a local fixture corpus (no Drive access), runs a
+labeled query set in every search mode and reports recall@k, MRR, p50/p95 query
+latency, index build time and on-disk size. Results are written to a JSON file
+so runs can be compared over time.
+
+Usage:
+    python3 benchmark_knowledge_base.py
+    python3 benchmark_knowledge_base.py --scale 25 --k 1 3 5 10
+    python3 benchmark_knowledge_base.py --baseline benchmarks/results/benchmark_20250101_120000.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from knowledge_base import KnowledgeBase, SEARCH_MODES
+
+BENCHMARK_DIR = Path(__file__).parent / "benchmarks"
+FIXTURE_MIME_TYPE = "text/markdown"
+
+# Suffix for the extra copies of each fixture document added by --scale
+COPY_SEPARATOR = "__copy"
+
+
+def markdown_to_blocks(text: str) -> List[Dict[str, Any]]:
+    """
+    Convert a fixture markdown file into document blocks (see chunking.py).
+
+    Supports ATX headings, paragraphs separated by blank lines and pipe tables.
+    """
+    blocks = []
+    paragraph = []
+    table_rows = []
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append({"type": "paragraph", "text": ' '.join(paragraph)})
+            paragraph.clear()
+
+    def flush_table():
+        if table_rows:
+            blocks.append({"type": "table", "rows": list(table_rows)})
+            table_rows.clear()
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('|'):
+            flush_paragraph()
+            cells = [cell.strip() for cell in stripped.strip('|').split('|')]
+            # Skip the header separator row (| --- | --- |)
+            if not all(set(cell) <= set('-: ') for cell in cells):
+                table_rows.append(' | '.join(cells))
+            continue
+        flush_table()
+
+        if not stripped:
+            flush_paragraph()
+        elif stripped.startswith('#'):
+            flush_paragraph()
+            level = len(stripped) - len(stripped.lstrip('#'))
+            blocks.append({"type": "heading", "text": stripped[level:].strip(), "level": level})
+        else:
+            paragraph.append(stripped)
+
+    flush_paragraph()
+    flush_table()
+    return blocks
+
+
+def load_corpus(corpus_dir: Path) -> List[Tuple[str, str, List[Dict[str, Any]]]]:
+    """Load fixture documents as (doc_id, file_name, blocks), using the file stem as the ID."""
+    corpus = []
+    for path in sorted(corpus_dir.glob("*.md")):
+        with open(path, 'r') as f:
+            corpus.append((path.stem, path.name, markdown_to_blocks(f.read())))
+    return corpus
+
+
+def load_queries(queries_path: Path) -> List[Dict[str, Any]]:
+    """Load the labeled query set: [{"query": ..., "relevant": [doc_id, ...]}, ...]."""
+    with open(queries_path, 'r') as f:
+        return json.load(f)
+
+
+def directory_size(path: Path) -> int:
+    """Total size in bytes of every file under path."""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def git_commit() -> str:
+    """Short hash of the current git commit, if available."""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def build_knowledge_base(corpus, directory: Path, scale: int = 1) -> Tuple[KnowledgeBase, Dict[str, Any]]:
+    """
+    Index the fixture corpus into a fresh knowledge base.
+
+    Args:
+        corpus: Documents from load_corpus
+        directory: Empty directory for the collection
+        scale: Number of copies of the corpus to index (simulates a larger collection)
+
+    Returns:
+        The knowledge base and index statistics
+    """
+    kb = KnowledgeBase(creds=None, persist_directory=str(directory))
+    # Load the model up front so build time measures indexing, not the model download
+    kb.embedding_model.model
+
+    start = time.time()
+    for copy in range(scale):
+        for doc_id, file_name, blocks in corpus:
+            file_id = doc_id if copy == 0 else f"{doc_id}{COPY_SEPARATOR}{copy}"
+            kb.index_blocks(file_id, file_name, FIXTURE_MIME_TYPE, blocks, save=False)
+    kb.lexical_index.save()
+    build_seconds = time.time() - start
+
+    return kb, {
+        "documents": len(kb.manifest),
+        "chunks": kb.collection.count(),
+        "build_seconds": build_seconds,
+        "disk_bytes": directory_size(directory)
+    }
+
+
+def evaluate(kb: KnowledgeBase, queries: List[Dict[str, Any]], mode: str, ks: List[int],
+             repeats: int = 1, rerank: bool = False) -> Dict[str, Any]:
+    """
+    Run the labeled queries in one search mode.
+
+    Relevance is judged per document: a query's rank is the position of the
+    first result from a relevant document (copies count as their original).
+
+    Returns:
+        Recall@k, MRR, latency percentiles and per-query ranks
+    """
+    max_k = max(ks)
+    latencies_ms = []
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks = []
+    per_query = []
+
+    for labeled in queries:
+        relevant = set(labeled["relevant"])
+        for _ in range(repeats):
+            # Measure uncached searches against a warm model
+            kb._search_cache.clear()
+            kb._query_embedding_cache.clear()
+            start = time.perf_counter()
+            results = kb.search(labeled["query"], n_results=max_k, mode=mode, rerank=rerank)
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        ranked_docs = []
+        for result in results:
+            doc_id = result["file_id"].split(COPY_SEPARATOR)[0]
+            if doc_id not in ranked_docs:
+                ranked_docs.append(doc_id)
+
+        for k in ks:
+            recalls[k].append(len(relevant & set(ranked_docs[:k])) / len(relevant))
+        rank = next((i + 1 for i, doc_id in enumerate(ranked_docs) if doc_id in relevant), None)
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        per_query.append({"query": labeled["query"], "rank": rank})
+
+    metrics = {f"recall@{k}": sum(values) / len(values) for k, values in recalls.items()}
+    metrics["mrr"] = sum(reciprocal_ranks) / len(reciprocal_ranks)
+    metrics["latency_ms"] = {
+        "p50": percentile(latencies_ms, 50),
+        "p95": percentile(latencies_ms, 95),
+        "mean": sum(latencies_ms) / len(latencies_ms)
+    }
+    metrics["per_query"] = per_query
+    return metrics
+
+
+def print_report(report: Dict[str, Any], baseline: Dict[str, Any] = None):
+    """Print a summary table, with deltas against a baseline report if given."""
+    index = report["index"]
+    print(f"\nIndex: {index['documents']} documents, {index['chunks']} chunks, "
+          f"built in {index['build_seconds']:.2f}s, {index['disk_bytes'] / 1024 / 1024:.2f} MB on disk")
+
+    ks = report["config"]["k"]
+    header = f"{'Mode':<8}" + ''.join(f" {'R@' + str(k):>7}" for k in ks) + f" {'MRR':>7} {'p50 ms':>8} {'p95 ms':>8}"
+    print("\n" + header)
+    for mode, metrics in report["modes"].items():
+        row = f"{mode:<8}" + ''.join(f" {metrics[f'recall@{k}']:>7.3f}" for k in ks)
+        row += f" {metrics['mrr']:>7.3f} {metrics['latency_ms']['p50']:>8.1f} {metrics['latency_ms']['p95']:>8.1f}"
+        print(row)
+
+        previous = (baseline or {}).get("modes", {}).get(mode)
+        if previous:
+            delta = f"{'  Δ':<8}" + ''.join(
+                f" {metrics[f'recall@{k}'] - previous.get(f'recall@{k}', 0.0):>+7.3f}" for k in ks
+            )
+            delta += (f" {metrics['mrr'] - previous['mrr']:>+7.3f}"
+                      f" {metrics['latency_ms']['p50'] - previous['latency_ms']['p50']:>+8.1f}"
+                      f" {metrics['latency_ms']['p95'] - previous['latency_ms']['p95']:>+8.1f}")
+            print(delta)
+
+
+def main():
+    """Build the fixture knowledge base, run the benchmark and write the results."""
+    parser = argparse.ArgumentParser(description="Offline knowledge base retrieval benchmark")
+    parser.add_argument("--corpus", type=Path, default=BENCHMARK_DIR / "corpus",
+                        help="Directory of fixture markdown documents")
+    parser.add_argument("--queries", type=Path, default=BENCHMARK_DIR / "queries.json",
+                        help="Labeled query set (JSON)")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5], help="Recall cut-offs")
+    parser.add_argument("--modes", nargs="+", choices=SEARCH_MODES, default=SEARCH_MODES,
+                        help="Search modes to benchmark")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Index this many copies of the corpus to measure a larger collection")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per query")
+    parser.add_argument("--rerank", action="store_true", help="Re-rank results with the cross-encoder")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="Results file (default: benchmarks/results/benchmark_<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Previous results file to compare against")
+    parser.add_argument("--keep-index", type=Path, default=None,
+                        help="Build the collection in this directory and keep it (default: temporary directory)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    queries = load_queries(args.queries)
+    if not corpus or not queries:
+        print(f"No fixture documents in {args.corpus} or no queries in {args.queries}")
+        sys.exit(1)
+    print(f"Benchmarking {len(queries)} queries against {len(corpus)} fixture documents (x{args.scale})...")
+
+    if args.keep_index:
+        if args.keep_index.exists() and any(args.keep_index.iterdir()):
+            print(f"{args.keep_index} is not empty; choose a new directory for the benchmark index")
+            sys.exit(1)
+        index_dir = args.keep_index
+        index_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        index_dir = Path(tempfile.mkdtemp(prefix="kb_benchmark_"))
+
+    try:
+        kb, index_stats = build_knowledge_base(corpus, index_dir, scale=args.scale)
+        # Warm-up so one-off model and index loading isn't counted as query latency
+        kb.search(queries[0]["query"], rerank=args.rerank)
+        modes = {mode: evaluate(kb, queries, mode, args.k, args.repeats, args.rerank) for mode in args.modes}
+    finally:
+        if not args.keep_index:
+            shutil.rmtree(index_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "config": {
+            "corpus": str(args.corpus),
+            "queries": str(args.queries),
+            "query_count": len(queries),
+            "k": args.k,
+            "scale": args.scale,
+            "repeats": args.repeats,
+            "rerank": args.rerank,
+            "chunker": type(kb.chunker).__name__,
+            "embedding_model": kb.embedding_model.model_name,
+            "embedding_backend": kb.embedding_model.backend
+        },
+        "index": index_stats,
+        "modes": modes
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or BENCHMARK_DIR / "results" / f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\n✓ Results written to {output}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n\nInterrupted by user.")
+        sys.exit(0)
@@ -0,0 +1,245 @@
+"""
+Local BM25 inverted index for lexical knowledge base search.
+
+Kept alongside the Chroma collection (same chunk IDs) so exact-match terms
+like SKUs, customer names and campaign names can be found even when the
+embedding similarity is weak.
+"""
+
+import heapq
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Iterable, Optional, Tuple
+
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens used for indexing and querying."""
+    return TERM_PATTERN.findall(text.lower())
+
+
+class BM25Index:
+    """Incrementally updatable BM25 index persisted as a JSON file."""
+
+    def __init__(self, path: Optional[Path] = None, k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            path: File to persist the index to (None keeps it in memory only)
+            k1: BM25 term-frequency saturation
+            b: BM25 length normalization
+        """
+        self.path = Path(path) if path else None
+        self.k1 = k1
+        self.b = b
+        self._docs: Dict[str, Tuple[int, Dict[str, int]]] = {}
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._dirty = False
+        # Changes since the last load or save (None marks a removal), replayed onto a newer saved index
+        self._pending: Dict[str, Optional[Tuple[int, Dict[str, int]]]] = {}
+        self._removed_prefixes: List[str] = []
+        self._cleared = False
+        self._loaded_version = None
+        self._lock = threading.RLock()
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._docs
+
+    def ids(self) -> List[str]:
+        """Return the IDs of every indexed chunk."""
+        with self._lock:
+            return list(self._docs)
+    
+    def _add_terms(self, chunk_id: str, length: int, term_counts: Dict[str, int]):
+        self._docs[chunk_id] = (length, term_counts)
+        self._total_length += length
+        for term, count in term_counts.items():
+            self._postings.setdefault(term, {})[chunk_id] = count
+
+    def add(self, chunk_id: str, text: str):
+        """Index (or re-index) a chunk."""
+        tokens = tokenize(text)
+        with self._lock:
+            self._remove_one(chunk_id)
+            self._add_terms(chunk_id, len(tokens), dict(Counter(tokens)))
+            self._pending[chunk_id] = self._docs[chunk_id]
+            self._dirty = True
+
+    def _remove_one(self, chunk_id: str):
+        entry = self._docs.pop(chunk_id, None)
+        if entry is None:
+            return
+        length, term_counts = entry
+        self._total_length -= length
+        for term in term_counts:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(chunk_id, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _remove_one_prefix(self, prefix: str):
+        for chunk_id in [chunk_id for chunk_id in self._docs if chunk_id.startswith(prefix)]:
+            self._remove_one(chunk_id)
+
+    def remove(self, chunk_ids: Iterable[str]):
+        """Remove chunks from the index."""
+        with self._lock:
+            for chunk_id in chunk_ids:
+                # Recorded even if absent here: another process may have saved it
+                self._remove_one(chunk_id)
+                self._pending[chunk_id] = None
+                self._dirty = True
+
+    def remove_prefix(self, prefix: str):
+        """Remove every chunk whose ID starts with prefix (e.g. all chunks of one file)."""
+        with self._lock:
+            self.remove([chunk_id for chunk_id in self._docs if chunk_id.startswith(prefix)])
+            self._removed_prefixes.append(prefix)
+            self._dirty = True
+
+    def clear(self):
+        """Remove every chunk from the index."""
+        with self._lock:
+            self._docs.clear()
+            self._postings.clear()
+            self._total_length = 0
+            self._pending = {}
+            self._removed_prefixes = []
+            self._cleared = True
+            self._dirty = True
+
+    def search(self, query: str, n_results: int = 10,
+               allowed_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """
+        Rank chunks against a query.
+
+        Args:
+            query: Search query
+            n_results: Number of results to return
+            allowed_ids: Optional set of chunk IDs to restrict results to
+
+        Returns:
+            List of (chunk_id, score) pairs, best first
+        """
+        allowed = set(allowed_ids) if allowed_ids is not None else None
+        with self._lock:
+            total_docs = len(self._docs)
+            if total_docs == 0:
+                return []
+            avg_length = self._total_length / total_docs
+
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                for chunk_id, tf in postings.items():
+                    if allowed is not None and chunk_id not in allowed:
+                        continue
+                    length = self._docs[chunk_id][0]
+                    norm = tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avg_length))
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * norm
+
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
+
+    def _file_version(self) -> Optional[Tuple[int, int]]:
+        """Identity of the saved file (every save replaces it), or None if there is none."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def load(self):
+        """Load the index from disk, if it has been saved before (discarding unsaved changes)."""
+        if not self.path or not self.path.exists():
+            return
+        with self._lock:
+            version = self._file_version()
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            self._docs.clear()
+            self._postings.clear()
+            self._total_length = 0
+            for chunk_id, (length, term_counts) in data.get('docs', {}).items():
+                self._add_terms(chunk_id, length, term_counts)
+            self._pending = {}
+            self._removed_prefixes = []
+            self._cleared = False
+            self._dirty = False
+            self._loaded_version = version
+
+    def refresh(self):
+        """Reload the index if another process (e.g. the indexer) saved a newer version."""
+        if not self.path or self._dirty:
+            return
+        version = self._file_version()
+        if version is not None and version != self._loaded_version:
+            self.load()
+
+    def save(self):
+        """
+        Persist the index if it changed (written to a temp file, then atomically replaced).
+
+        If another process saved the index since it was loaded, its version is
+        reloaded and this index's changes are applied on top, so neither
+        process's entries are lost.
+        """
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            version = self._file_version()
+            if not self._cleared and version is not None and version != self._loaded_version:
+                # Another process saved since this index was loaded: keep its entries and replay ours
+                pending, prefixes = self._pending, self._removed_prefixes
+                self.load()
+                for prefix in prefixes:
+                    self._remove_one_prefix(prefix)
+                for chunk_id, entry in pending.items():
+                    self._remove_one(chunk_id)
+                    if entry is not None:
+                        self._add_terms(chunk_id, *entry)
+            # A unique temp file, so another process saving the same index can't clobber this one
+            with tempfile.NamedTemporaryFile('w', dir=self.path.parent, prefix=self.path.name + '.',
+                                             suffix='.tmp', delete=False) as f:
+                json.dump({"docs": self._docs}, f)
+            os.replace(f.name, self.path)
+            self._pending = {}
+            self._removed_prefixes = []
+            self._cleared = False
+            self._dirty = False
+            self._loaded_version = self._file_version()
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Fuse several ranked lists of IDs with reciprocal rank fusion.
+
+    Args:
+        rankings: Ranked ID lists, best first
+        k: RRF damping constant
+
+    Returns:
+        List of (id, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,126 @@
+"""
+Resumable checkpoints for long indexing runs.
+
+A full index lists Drive one page at a time. The checkpoint remembers the page
+token of the earliest page that still has unfinished files (plus the last file
+processed), so an interrupted run can restart from that page instead of from
+scratch. Files on that page that were already indexed are skipped by the
+manifest's modifiedTime check.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class IndexCheckpoint:
+    """Tracks listed pages and finished files of one indexing run and saves the resume position."""
+
+    def __init__(self, path: Path, run_key: str):
+        """
+        Args:
+            path: JSON file the checkpoint is saved to
+            run_key: Identifies the run (e.g. the Drive query); a saved checkpoint
+                for a different run is ignored
+        """
+        self.path = Path(path)
+        self.run_key = run_key
+        self._lock = threading.Lock()
+        self._pages = OrderedDict()  # page number -> {"token": ..., "pending": set of file IDs}
+        self._file_pages: Dict[str, int] = {}
+        self._next_page = 0
+        self._after_last_page = None
+        self.resume_token: Optional[str] = None
+        self.last_file: Optional[Dict[str, str]] = None
+        self.files_done = 0
+        self.saved = self._load()
+
+    def _load(self) -> bool:
+        """Load a saved checkpoint for this run; returns True if one was found."""
+        if not self.path.exists():
+            return False
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        if data.get('run_key') != self.run_key:
+            return False
+        self.resume_token = data.get('page_token')
+        self.last_file = data.get('last_file')
+        self.files_done = data.get('files_done', 0)
+        return True
+
+    def save(self):
+        """
+        Write the checkpoint (unique temp file, then atomic replace).
+
+        Files finish on several threads at once, so the write and the replace
+        both happen under the lock; otherwise a slower writer could replace the
+        file with an older position.
+        """
+        with self._lock:
+            data = {
+                "run_key": self.run_key,
+                "page_token": self.resume_token,
+                "last_file": self.last_file,
+                "files_done": self.files_done,
+                "saved_at": datetime.utcnow().isoformat()
+            }
+            with tempfile.NamedTemporaryFile('w', dir=self.path.parent, prefix=self.path.name + '.',
+                                             suffix='.tmp', delete=False) as f:
+                json.dump(data, f, indent=2)
+            os.replace(f.name, self.path)
+
+    def clear(self):
+        """Delete the checkpoint after a completed run."""
+        with self._lock:
+            if self.path.exists():
+                self.path.unlink()
+            self.saved = False
+
+    def page_listed(self, page_token: Optional[str], file_ids: List[str], next_page_token: Optional[str]):
+        """
+        Record a listed page before any of its files are processed.
+
+        Args:
+            page_token: Token the page was requested with (None for the first page)
+            file_ids: IDs of the files on the page
+            next_page_token: Token of the following page (None on the last page)
+        """
+        with self._lock:
+            page = self._next_page
+            self._next_page += 1
+            self._pages[page] = {"token": page_token, "pending": set(file_ids)}
+            for file_id in file_ids:
+                self._file_pages[file_id] = page
+            self._after_last_page = next_page_token
+            self._advance()
+
+    def file_done(self, file_id: str, file_name: str = None):
+        """Mark a file as finished (indexed, unchanged or skipped) and save the new position."""
+        with self._lock:
+            page = self._file_pages.pop(file_id, None)
+            if page is None:
+                return
+            self._pages[page]["pending"].discard(file_id)
+            self.last_file = {"id": file_id, "name": file_name or file_id}
+            self.files_done += 1
+            self._advance()
+        self.save()
+
+    def _advance(self):
+        """Drop leading pages with no pending files and move the resume token past them."""
+        while self._pages:
+            first = next(iter(self._pages))
+            if self._pages[first]["pending"]:
+                self.resume_token = self._pages[first]["token"]
+                return
+            del self._pages[first]
+        self.resume_token = self._after_last_page
+
+    def summary(self) -> Dict[str, Any]:
+        """Saved position, for progress output."""
+        return {"page_token": self.resume_token, "last_file": self.last_file, "files_done": self.files_done}
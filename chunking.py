@@ -0,0 +1,262 @@
+"""
+Chunking strategies for the knowledge base.
+
+Documents are extracted into a list of blocks (headings, paragraphs and tables)
+and a chunker packs those blocks into chunks for embedding.
+
+Block format:
+    {"type": "heading", "text": "Roadmap", "level": 1}
+    {"type": "paragraph", "text": "..."}
+    {"type": "table", "rows": ["a | b", "1 | 2"], "title": "Sheet1"}  # title is optional
+
+Chunk format:
+    {"text": "...", "section": "Strategy > Roadmap"}
+"""
+
+import re
+from typing import List, Dict, Any, Callable, Iterable
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+SECTION_SEPARATOR = " > "
+
+
+def count_tokens(text: str) -> int:
+    """Approximate the number of model tokens in text (words and punctuation marks)."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def block_lines(block: Dict[str, Any]) -> List[str]:
+    """Plain-text lines of one block (its text, or a table's title and rows)."""
+    if block["type"] == "table":
+        return ([block["title"]] if block.get("title") else []) + list(block.get("rows", []))
+    return [block.get("text", "")]
+
+
+def blocks_to_text(blocks: Iterable[Dict[str, Any]]) -> str:
+    """Flatten blocks into plain text (one block or table row per line)."""
+    return "\n".join(line for block in blocks for line in block_lines(block))
+
+
+class Chunker:
+    """Base class for chunkers. Subclasses turn document blocks into chunks."""
+
+    def chunk(self, blocks: Iterable[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """
+        Split document blocks into chunks.
+
+        Args:
+            blocks: Document blocks (see module docstring); any iterable, read once
+
+        Returns:
+            List of chunks with text and section path
+        """
+        raise NotImplementedError
+
+
+class WordChunker(Chunker):
+    """Legacy chunker: splits the plain text on whitespace at a fixed character size."""
+
+    def __init__(self, chunk_size: int = 1000):
+        self.chunk_size = chunk_size
+
+    def chunk(self, blocks: Iterable[Dict[str, Any]]) -> List[Dict[str, str]]:
+        chunks = []
+        current_chunk = []
+        current_length = 0
+
+        for word in blocks_to_text(blocks).split():
+            word_length = len(word) + 1  # +1 for space
+            if current_length + word_length > self.chunk_size and current_chunk:
+                chunks.append(' '.join(current_chunk))
+                current_chunk = [word]
+                current_length = word_length
+            else:
+                current_chunk.append(word)
+                current_length += word_length
+
+        if current_chunk:
+            chunks.append(' '.join(current_chunk))
+
+        return [{"text": text, "section": ""} for text in chunks]
+
+
+class StructureChunker(Chunker):
+    """
+    Structure-aware chunker.
+
+    - Never crosses a heading boundary; the heading path is recorded as the chunk section
+    - Keeps paragraphs whole unless a single paragraph exceeds the chunk size
+    - Splits tables and sheet tabs on row boundaries, repeating the header row in each chunk
+    - Carries `overlap_tokens` of trailing text into the next chunk within a section
+    """
+
+    def __init__(self, chunk_tokens: int = 200, overlap_tokens: int = 30,
+                 token_counter: Callable[[str], int] = count_tokens):
+        """
+        Args:
+            chunk_tokens: Target maximum chunk size in tokens
+            overlap_tokens: Tokens of trailing text repeated at the start of the next chunk
+            token_counter: Function returning the token count of a string
+        """
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens must be smaller than chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.token_counter = token_counter
+
+    def _split_long_word(self, word: str, max_tokens: int) -> List[str]:
+        """Hard-split a single word (e.g. a URL or a run of dashes) into windows of at most max_tokens."""
+        pieces = []
+        current = ""
+        current_tokens = 0
+        # Without whitespace the token pattern matches cover the whole word
+        for token in TOKEN_PATTERN.findall(word):
+            token_tokens = self.token_counter(token)
+            if token_tokens > max_tokens:
+                # Only possible with a subword token_counter; fall back to character windows
+                if current:
+                    pieces.append(current)
+                    current = ""
+                    current_tokens = 0
+                pieces.extend(token[i:i + max_tokens] for i in range(0, len(token), max_tokens))
+                continue
+            if current and current_tokens + token_tokens > max_tokens:
+                pieces.append(current)
+                current = ""
+                current_tokens = 0
+            current += token
+            current_tokens += token_tokens
+        if current:
+            pieces.append(current)
+        return pieces
+
+    def _split_words(self, text: str, max_tokens: int) -> List[str]:
+        """Split text that is too large for one chunk into word windows of at most max_tokens."""
+        pieces = []
+        current = []
+        current_tokens = 0
+        for word in text.split():
+            word_tokens = self.token_counter(word)
+            if word_tokens > max_tokens:
+                if current:
+                    pieces.append(' '.join(current))
+                    current = []
+                    current_tokens = 0
+                pieces.extend(self._split_long_word(word, max_tokens))
+                continue
+            if current and current_tokens + word_tokens > max_tokens:
+                pieces.append(' '.join(current))
+                current = []
+                current_tokens = 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append(' '.join(current))
+        return pieces
+
+    def _tail(self, text: str) -> str:
+        """Return the trailing words of text that fit in the overlap budget."""
+        words = text.split()
+        tail = []
+        tail_tokens = 0
+        for word in reversed(words):
+            word_tokens = self.token_counter(word)
+            if tail_tokens + word_tokens > self.overlap_tokens:
+                break
+            tail.append(word)
+            tail_tokens += word_tokens
+        return ' '.join(reversed(tail))
+
+    def chunk(self, blocks: Iterable[Dict[str, Any]]) -> List[Dict[str, str]]:
+        chunks = []
+        headings = []  # (level, text) pairs for the current heading path
+        state = {"units": [], "tokens": 0, "section": "", "header": None, "has_body": False}
+
+        def flush(carry_overlap: bool = False):
+            text = "\n".join(state["units"]).strip()
+            has_body = state["has_body"]
+            state["units"] = []
+            state["tokens"] = 0
+            state["has_body"] = False
+            # A heading with no body text is already captured in the section path
+            if not text or not has_body:
+                return
+            chunks.append({"text": text, "section": state["section"]})
+            if carry_overlap and self.overlap_tokens:
+                tail = self._tail(text)
+                if tail:
+                    state["units"].append(tail)
+                    state["tokens"] = self.token_counter(tail)
+
+        def add(text: str, is_heading: bool = False, split: bool = True):
+            tokens = self.token_counter(text)
+            if split and tokens > self.chunk_tokens:
+                # Pieces are added as they are, so splitting can't recurse without end
+                for piece in self._split_words(text, self.chunk_tokens - self.overlap_tokens):
+                    add(piece, is_heading, split=False)
+                return
+
+            if state["units"] and state["tokens"] + tokens > self.chunk_tokens:
+                header = state["header"]
+                # Rows are records; repeat the header row instead of overlapping
+                flush(carry_overlap=header is None)
+                if header is not None and header != text:
+                    state["units"].append(header)
+                    state["tokens"] = self.token_counter(header)
+                if state["units"] and state["tokens"] + tokens > self.chunk_tokens:
+                    state["units"] = []
+                    state["tokens"] = 0
+
+            state["units"].append(text)
+            state["tokens"] += tokens
+            state["has_body"] = state["has_body"] or not is_heading
+
+        def section_path(extra: str = None) -> str:
+            parts = [text for _, text in headings]
+            if extra:
+                parts.append(extra)
+            return SECTION_SEPARATOR.join(parts)
+
+        for block in blocks:
+            kind = block["type"]
+
+            if kind == "heading":
+                flush()
+                level = block.get("level", 1)
+                headings = [h for h in headings if h[0] < level]
+                headings.append((level, block["text"].strip()))
+                state["section"] = section_path()
+                add(block["text"].strip(), is_heading=True)
+
+            elif kind == "table":
+                rows = [row for row in block.get("rows", []) if row.strip()]
+                if not rows:
+                    continue
+                title = block.get("title")
+                table_tokens = sum(self.token_counter(row) for row in rows)
+
+                # Titled tables (sheet tabs) are their own section; otherwise start a
+                # new chunk if the table doesn't fit alongside the current text
+                if title:
+                    flush()
+                    state["section"] = section_path(title)
+                elif state["has_body"] and state["tokens"] + table_tokens > self.chunk_tokens:
+                    flush()
+
+                state["header"] = rows[0]
+                for row in rows:
+                    add(row)
+                state["header"] = None
+
+                if title:
+                    flush()
+                    state["section"] = section_path()
+
+            else:
+                text = block.get("text", "").strip()
+                if text:
+                    add(text)
+
+        flush()
+        return chunks
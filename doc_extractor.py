@@ -0,0 +1,138 @@
+"""
+Single-pass text and outline extraction for Google Docs.
+
+Every reader of Docs API documents (read_google_doc_by_name, the strategy
+context loader, DriveReadDocTool and the knowledge base indexer) shares
+extract_document, so text comes out the same everywhere:
+
+- Paragraph text keeps its line breaks. Person chips and rich links are
+  rendered by name/title.
+- Each table row becomes one "cell | cell | cell" line. A cell's content is
+  flattened to a single line, with each row of a nested table rendered as
+  "[cell; cell]" so it can't be mistaken for cells of the outer table.
+- Documents fetched with includeTabsContent=True have every tab (and child
+  tab) extracted in order, each introduced by its title.
+- With outline=True the same pass also returns structural blocks (headings
+  with levels, paragraphs and tables), in the format chunking.StructureChunker
+  expects.
+
+Text is collected into lists and joined once, so extraction is linear in the
+document size.
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Arguments for documents().get so that every tab's content is returned
+GET_ALL_TABS = {"includeTabsContent": True}
+
+
+def _element_text(element: Dict[str, Any]) -> str:
+    """Text of one paragraph element (text runs, person chips and rich links)."""
+    if 'textRun' in element:
+        return element['textRun'].get('content', '')
+    if 'person' in element:
+        properties = element['person'].get('personProperties', {})
+        return properties.get('name') or properties.get('email', '')
+    if 'richLink' in element:
+        properties = element['richLink'].get('richLinkProperties', {})
+        return properties.get('title') or properties.get('uri', '')
+    return ''
+
+
+def paragraph_text(paragraph: Dict[str, Any]) -> str:
+    """Concatenated text of a Docs paragraph, including its trailing newline."""
+    return ''.join(_element_text(element) for element in paragraph.get('elements', []))
+
+
+def _collect_text(content: List[Dict[str, Any]], parts: List[str]):
+    """Append the plain text of structural elements (recursing into tables) to parts."""
+    for element in content:
+        if 'paragraph' in element:
+            parts.append(paragraph_text(element['paragraph']))
+        elif 'table' in element:
+            # Only reached inside table cells: mark nested rows off from the outer table's cells
+            for row in _table_rows(element['table'], separator='; '):
+                parts.append(f"[{row}]\n")
+
+
+def _table_rows(table: Dict[str, Any], separator: str = ' | ') -> List[str]:
+    """One "cell | cell" line per table row; each cell (nested tables included) on one line."""
+    rows = []
+    for row in table.get('tableRows', []):
+        cells = []
+        for cell in row.get('tableCells', []):
+            parts: List[str] = []
+            _collect_text(cell.get('content', []), parts)
+            cells.append(' '.join(''.join(parts).split()))
+        rows.append(separator.join(cells))
+    return rows
+
+
+def _iter_tabs(tabs: List[Dict[str, Any]]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Yield (title, body content) for tabs and their child tabs, depth first."""
+    for tab in tabs:
+        title = tab.get('tabProperties', {}).get('title', '')
+        yield title, tab.get('documentTab', {}).get('body', {}).get('content', [])
+        yield from _iter_tabs(tab.get('childTabs', []))
+
+
+def iter_document_bodies(doc: Dict[str, Any]) -> List[Tuple[str, List[Dict[str, Any]]]]:
+    """(tab title, body content) for each tab, or a single untitled body for documents fetched without tabs."""
+    if doc.get('tabs'):
+        return list(_iter_tabs(doc['tabs']))
+    return [('', doc.get('body', {}).get('content', []))]
+
+
+def extract_document(doc: Dict[str, Any], outline: bool = False) -> Dict[str, Any]:
+    """
+    Extract a Docs API document's text, and optionally its outline, in one pass.
+
+    Args:
+        doc: Document resource from documents().get (with or without includeTabsContent)
+        outline: Also return structural blocks
+
+    Returns:
+        Dict with "title", "text" and "outline". The outline is None unless
+        requested. Otherwise it is a list of {"type": "heading", "text", "level"}
+        (TITLE is level 0 and tab titles are level 0 in multi-tab documents),
+        {"type": "paragraph", "text"} and {"type": "table", "rows"} blocks.
+    """
+    text_parts: List[str] = []
+    blocks: Optional[List[Dict[str, Any]]] = [] if outline else None
+    bodies = iter_document_bodies(doc)
+
+    for tab_title, content in bodies:
+        if len(bodies) > 1 and tab_title:
+            text_parts.append(f"\n=== {tab_title} ===\n")
+            if outline:
+                blocks.append({"type": "heading", "text": tab_title, "level": 0})
+
+        for element in content:
+            if 'paragraph' in element:
+                paragraph = element['paragraph']
+                raw = paragraph_text(paragraph)
+                text_parts.append(raw)
+                if not outline:
+                    continue
+                text = raw.strip()
+                if not text:
+                    continue
+                style = paragraph.get('paragraphStyle', {}).get('namedStyleType', 'NORMAL_TEXT')
+                if style == 'TITLE':
+                    blocks.append({"type": "heading", "text": text, "level": 0})
+                elif style.startswith('HEADING_'):
+                    blocks.append({"type": "heading", "text": text, "level": int(style.split('_')[1])})
+                else:
+                    blocks.append({"type": "paragraph", "text": text})
+            elif 'table' in element:
+                rows = _table_rows(element['table'])
+                text_parts.append(''.join(row + '\n' for row in rows))
+                if outline:
+                    blocks.append({"type": "table", "rows": rows})
+
+    return {"title": doc.get('title', ''), "text": ''.join(text_parts), "outline": blocks}
+
+
+def document_text(doc: Dict[str, Any]) -> str:
+    """Plain text of a Docs API document (see extract_document)."""
+    return extract_document(doc)["text"]
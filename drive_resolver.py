@@ -0,0 +1,239 @@
+"""
+Cached resolution of Drive file names to file IDs.
+
+Tools that open well-known files by name (Vonga_Customer_DB, the strategy
+documents, the agent memory log) used to search Drive on every call, falling
+through up to three queries that end in an expensive fullText search.
+DriveNameResolver caches name -> (file ID, MIME type, modifiedTime) per
+account:
+
+- Found files are kept for DRIVE_NAME_CACHE_TTL seconds (default 6 hours) and
+  misses for DRIVE_NAME_NEGATIVE_TTL seconds (default 5 minutes).
+- The cache is saved to DRIVE_NAME_CACHE_FILE (default drive_name_cache.json,
+  next to token.json), so a new process resolves known names with no API calls.
+- fetch() drops an entry whose file returns 404 (deleted or access revoked)
+  and looks the name up again.
+
+Usage:
+    from drive_resolver import get_drive_resolver
+    file = get_drive_resolver().resolve(creds, "Vonga_Customer_DB", mime_type=SHEET_MIME_TYPE)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from google_clients import credentials_key, get_service
+
+DEFAULT_CACHE_FILE = os.getenv("DRIVE_NAME_CACHE_FILE", "drive_name_cache.json")
+DEFAULT_TTL_SECONDS = float(os.getenv("DRIVE_NAME_CACHE_TTL", str(6 * 3600)))
+DEFAULT_NEGATIVE_TTL_SECONDS = float(os.getenv("DRIVE_NAME_NEGATIVE_TTL", "300"))
+
+CACHE_FORMAT = 1
+
+_resolver: Optional["DriveNameResolver"] = None
+_resolver_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    """Escape a string for use inside a quoted Drive query term."""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+
+def _account(creds) -> str:
+    """Stable, non-secret identifier of the account behind creds."""
+    return hashlib.sha256(repr(credentials_key(creds)).encode("utf-8")).hexdigest()[:16]
+
+
+def is_not_found(error: Exception) -> bool:
+    """True if error is an API 404 (the file was deleted or is no longer shared)."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    return str(status) == "404"
+
+
+class DriveNameResolver:
+    """Thread-safe, disk-backed cache of Drive name lookups with positive and negative TTLs."""
+
+    def __init__(self, path: str = DEFAULT_CACHE_FILE, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 negative_ttl_seconds: float = DEFAULT_NEGATIVE_TTL_SECONDS):
+        """
+        Args:
+            path: JSON file the cache is persisted to (None keeps it in memory only)
+            ttl_seconds: Seconds a found file stays cached
+            negative_ttl_seconds: Seconds a name that matched nothing stays cached
+        """
+        self.path = Path(path) if path else None
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        # "account|mime|fuzzy|name" -> {"file": {...} or None, "expires_at": epoch seconds}
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "queries": 0, "invalidations": 0}
+        self._load()
+
+    @staticmethod
+    def _key(account: str, name: str, mime_type: Optional[str], fuzzy: bool) -> str:
+        return f"{account}|{mime_type or ''}|{int(fuzzy)}|{name}"
+
+    def _load(self):
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable Drive name cache {self.path}: {e}")
+            return
+        if data.get("format") != CACHE_FORMAT:
+            return
+        now = time.time()
+        self._entries = {key: entry for key, entry in data.get("entries", {}).items()
+                         if entry.get("expires_at", 0) > now}
+
+    def save(self):
+        """Write the unexpired entries to the cache file."""
+        if self.path is None:
+            return
+        now = time.time()
+        # Written under the lock with a unique temp file, so concurrent saves can't collide
+        with self._lock:
+            entries = {key: entry for key, entry in self._entries.items() if entry["expires_at"] > now}
+            try:
+                with tempfile.NamedTemporaryFile('w', dir=self.path.parent, prefix=self.path.name + '.',
+                                                 suffix='.tmp', delete=False) as f:
+                    json.dump({"format": CACHE_FORMAT, "entries": entries}, f)
+                os.replace(f.name, self.path)
+            except OSError as e:
+                print(f"Could not save Drive name cache to {self.path}: {e}")
+
+    def _store(self, key: str, file: Optional[Dict[str, Any]]):
+        ttl = self.ttl_seconds if file else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[key] = {"file": file, "expires_at": time.time() + ttl}
+        self.save()
+
+    def _search(self, creds, name: str, mime_type: Optional[str], fuzzy: bool) -> Optional[Dict[str, Any]]:
+        """Query Drive: exact name first, then (if fuzzy) name contains and full-text matches."""
+        drive_service = get_service(creds, 'drive')
+        terms = [f"name='{_escape(name)}'"]
+        if fuzzy:
+            terms += [f"name contains '{_escape(name)}'", f"fullText contains '{_escape(name)}'"]
+        mime_filter = f" and mimeType='{mime_type}'" if mime_type else ""
+
+        for term in terms:
+            with self._lock:
+                self._stats["queries"] += 1
+            results = drive_service.files().list(
+                q=f"{term}{mime_filter} and trashed=false",
+                pageSize=5,
+                fields="files(id, name, mimeType, modifiedTime)"
+            ).execute()
+            files = results.get('files', [])
+            if files:
+                # Prefer an exact match
+                exact = [f for f in files if f.get('name') == name]
+                return (exact or files)[0]
+        return None
+
+    def resolve(self, creds, name: str, mime_type: str = None, fuzzy: bool = False,
+                refresh: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Find a Drive file by name, using the cache when possible.
+
+        Args:
+            creds: Google credentials (entries are cached per account)
+            name: File name
+            mime_type: Only match files of this MIME type
+            fuzzy: Fall back to "name contains" and full-text matches if no name matches exactly
+            refresh: Ignore any cached entry and query Drive
+
+        Returns:
+            Dict with id, name, mimeType and modifiedTime, or None if nothing matches
+        """
+        key = self._key(_account(creds), name, mime_type, fuzzy)
+        if not refresh:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry["expires_at"] > time.time():
+                    self._stats["hits"] += 1
+                    return dict(entry["file"]) if entry["file"] else None
+                self._stats["misses"] += 1
+
+        file = self._search(creds, name, mime_type, fuzzy)
+        self._store(key, file)
+        return dict(file) if file else None
+
+    def fetch(self, creds, name: str, fetch: Callable[[Dict[str, Any]], Any], mime_type: str = None,
+              fuzzy: bool = False) -> Tuple[Optional[Dict[str, Any]], Any]:
+        """
+        Resolve name and run fetch(file), re-resolving once if the cached file is gone.
+
+        Args:
+            creds: Google credentials
+            name: File name
+            fetch: Callable making the first API call on the file (e.g. documents().get)
+            mime_type: Only match files of this MIME type
+            fuzzy: Allow partial and full-text matches (see resolve)
+
+        Returns:
+            (file, fetch result), or (None, None) if no file matches
+        """
+        file = self.resolve(creds, name, mime_type, fuzzy)
+        if file is None:
+            return None, None
+        try:
+            return file, fetch(file)
+        except Exception as e:
+            if not is_not_found(e):
+                raise
+            self.invalidate(creds, file_id=file['id'])
+        file = self.resolve(creds, name, mime_type, fuzzy, refresh=True)
+        if file is None:
+            return None, None
+        return file, fetch(file)
+
+    def remember(self, creds, name: str, file: Dict[str, Any], mime_type: str = None, fuzzy: bool = False):
+        """Cache a file just created or found by other means (replaces a cached miss)."""
+        self._store(self._key(_account(creds), name, mime_type, fuzzy), dict(file))
+
+    def invalidate(self, creds=None, name: str = None, file_id: str = None):
+        """
+        Drop cached entries for a name and/or file ID (everything if neither is given).
+
+        Args:
+            creds: Limit to this account's entries (all accounts if None)
+            name: Drop entries for this name
+            file_id: Drop entries resolving to this file
+        """
+        prefix = f"{_account(creds)}|" if creds is not None else ""
+        with self._lock:
+            dropped = [
+                key for key, entry in self._entries.items()
+                if key.startswith(prefix)
+                and (name is None or key.split('|', 3)[3] == name)
+                and (file_id is None or (entry["file"] or {}).get('id') == file_id)
+            ]
+            for key in dropped:
+                del self._entries[key]
+            self._stats["invalidations"] += len(dropped)
+        if dropped:
+            self.save()
+
+    def stats(self) -> Dict[str, int]:
+        """Cache hits and misses, Drive queries made, entries invalidated and entries held."""
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries))
+
+
+def get_drive_resolver() -> DriveNameResolver:
+    """Return the process-wide Drive name resolver."""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = DriveNameResolver()
+        return _resolver
@@ -0,0 +1,244 @@
+"""
+Process-wide embedding service for the knowledge base.
+
+The sentence-transformers model (and torch) is only imported and loaded on the
+first encode call, and a single instance per model name and backend is shared
+by every KnowledgeBase in the process.
+
+Backends:
+    torch - default PyTorch model
+    onnx  - ONNX Runtime export of the same model (same embedding space)
+    int8  - dynamically int8-quantized ONNX model (fastest on CPU, small accuracy loss)
+"""
+
+import importlib.util
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+EMBEDDING_BACKENDS = ["torch", "onnx", "int8"]
+
+# Backend used when none is given; override with the KB_EMBEDDING_BACKEND environment variable
+DEFAULT_EMBEDDING_BACKEND = os.getenv("KB_EMBEDDING_BACKEND", "torch")
+
+# Quantized ONNX weights shipped in the model repository (AVX2 works on any modern x86 CPU)
+INT8_ONNX_FILE = os.getenv("KB_INT8_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Small cross-encoder used to re-rank search candidates on CPU
+DEFAULT_RERANKER_MODEL = os.getenv("KB_RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec('sentence_transformers') is not None
+
+_services: Dict[Tuple[str, str], "EmbeddingService"] = {}
+_rerankers: Dict[str, "RerankerService"] = {}
+_services_lock = threading.Lock()
+
+
+class EmbeddingService:
+    """Lazily loaded embedding model shared across knowledge bases and agents."""
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, backend: str = DEFAULT_EMBEDDING_BACKEND):
+        """
+        Args:
+            model_name: sentence-transformers model name
+            backend: One of EMBEDDING_BACKENDS
+        """
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{backend}'. Use one of: {', '.join(EMBEDDING_BACKENDS)}")
+        self.model_name = model_name
+        self.backend = backend
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the model weights have been loaded."""
+        return self._model is not None
+
+    @property
+    def model(self):
+        """The underlying SentenceTransformer, loaded on first access."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    print(f"Loading embedding model {self.model_name} ({self.backend})...")
+                    self._model = self._load_model()
+                    print("✓ Embedding model loaded")
+        return self._model
+
+    def _load_model(self):
+        """Load the SentenceTransformer for the configured backend."""
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            return SentenceTransformer(self.model_name, backend="onnx")
+        if self.backend == "int8":
+            return SentenceTransformer(self.model_name, backend="onnx", model_kwargs={"file_name": INT8_ONNX_FILE})
+        return SentenceTransformer(self.model_name)
+
+    def encode(self, texts: List[str], **kwargs):
+        """Encode texts (same arguments as SentenceTransformer.encode)."""
+        return self.model.encode(texts, **kwargs)
+
+    def start_multi_process_pool(self):
+        """Start a multi-process encoding pool (see SentenceTransformer.start_multi_process_pool)."""
+        return self.model.start_multi_process_pool()
+
+    def encode_multi_process(self, texts: List[str], pool, **kwargs):
+        """Encode texts using a multi-process pool."""
+        return self.model.encode_multi_process(texts, pool, **kwargs)
+
+    def stop_multi_process_pool(self, pool):
+        """Stop a multi-process encoding pool."""
+        self.model.stop_multi_process_pool(pool)
+
+
+def get_embedding_service(model_name: str = DEFAULT_EMBEDDING_MODEL,
+                          backend: Optional[str] = None) -> EmbeddingService:
+    """Return the process-wide embedding service for a model and backend, creating it if needed."""
+    backend = backend or DEFAULT_EMBEDDING_BACKEND
+    with _services_lock:
+        service = _services.get((model_name, backend))
+        if service is None:
+            service = EmbeddingService(model_name, backend)
+            _services[(model_name, backend)] = service
+        return service
+
+
+class RerankerService:
+    """Lazily loaded cross-encoder that scores (query, passage) pairs on CPU."""
+
+    def __init__(self, model_name: str = DEFAULT_RERANKER_MODEL, max_length: int = 512):
+        """
+        Args:
+            model_name: sentence-transformers CrossEncoder model name
+            max_length: Maximum tokens per (query, passage) pair
+        """
+        self.model_name = model_name
+        self.max_length = max_length
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the model weights have been loaded."""
+        return self._model is not None
+
+    @property
+    def model(self):
+        """The underlying CrossEncoder, loaded on first access."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    import torch
+                    from sentence_transformers import CrossEncoder
+
+                    print(f"Loading re-ranking model {self.model_name}...")
+                    model = CrossEncoder(self.model_name, max_length=self.max_length, device="cpu")
+                    # Return raw logits on every sentence-transformers version; score() applies the sigmoid
+                    for attr in ("activation_fn", "default_activation_function"):
+                        if hasattr(model, attr):
+                            setattr(model, attr, torch.nn.Identity())
+                    self._model = model
+                    print("✓ Re-ranking model loaded")
+        return self._model
+
+    def score(self, query: str, passages: List[str], batch_size: int = 32) -> List[float]:
+        """
+        Score passages against a query.
+
+        Returns:
+            Relevance of each passage in [0, 1]
+        """
+        if not passages:
+            return []
+        logits = self.model.predict([(query, passage) for passage in passages], batch_size=batch_size)
+        return [1.0 / (1.0 + math.exp(-float(logit))) for logit in logits]
+
+
+def get_reranker_service(model_name: str = DEFAULT_RERANKER_MODEL) -> RerankerService:
+    """Return the process-wide re-ranking service for a model, creating it if needed."""
+    with _services_lock:
+        service = _rerankers.get(model_name)
+        if service is None:
+            service = RerankerService(model_name)
+            _rerankers[model_name] = service
+        return service
+
+
+def _pseudo_query(text: str, max_words: int = 12) -> str:
+    """Use the opening words of a chunk as a query that should retrieve that chunk."""
+    return ' '.join(text.split()[:max_words])
+
+
+def compare_backends(texts: List[str], backends: List[str] = None, k: int = 5,
+                     model_name: str = DEFAULT_EMBEDDING_MODEL, batch_size: int = 64) -> List[Dict[str, float]]:
+    """
+    Compare embedding backends for accuracy and throughput on a sample of chunks.
+
+    The first backend is the reference. For every backend this measures load
+    time and encoding throughput, the mean cosine similarity of its chunk
+    embeddings to the reference embeddings, self-retrieval recall@k (a query
+    made from the opening words of each chunk should retrieve that chunk), and
+    the overlap of its top-k neighbours with the reference backend's.
+
+    Args:
+        texts: Sample of chunk texts (e.g. from the knowledge base collection)
+        backends: Backends to compare (default: all, torch first)
+        k: Cut-off for recall and overlap
+        model_name: sentence-transformers model name
+        batch_size: Encoding batch size
+
+    Returns:
+        One result dict per backend
+    """
+    import numpy as np
+
+    backends = backends or EMBEDDING_BACKENDS
+    queries = [_pseudo_query(text) for text in texts]
+    k = min(k, len(texts))
+    results = []
+    reference_chunks = None
+    reference_top_k = None
+
+    for backend in backends:
+        service = get_embedding_service(model_name, backend)
+
+        load_start = time.time()
+        service.model
+        load_seconds = time.time() - load_start
+
+        # Warm-up so one-off graph initialisation isn't counted as throughput
+        service.encode(texts[:min(len(texts), batch_size)], batch_size=batch_size)
+
+        encode_start = time.time()
+        chunk_embeddings = np.asarray(service.encode(texts, batch_size=batch_size, normalize_embeddings=True))
+        encode_seconds = time.time() - encode_start
+        query_embeddings = np.asarray(service.encode(queries, batch_size=batch_size, normalize_embeddings=True))
+
+        scores = query_embeddings @ chunk_embeddings.T
+        top_k = np.argsort(-scores, axis=1)[:, :k]
+        recall = float(np.mean([i in row for i, row in enumerate(top_k)]))
+
+        if reference_chunks is None:
+            reference_chunks = chunk_embeddings
+            reference_top_k = top_k
+        similarity = float(np.mean(np.sum(chunk_embeddings * reference_chunks, axis=1)))
+        overlap = float(np.mean([
+            len(set(row) & set(ref_row)) / k for row, ref_row in zip(top_k, reference_top_k)
+        ]))
+
+        results.append({
+            "backend": backend,
+            "load_seconds": load_seconds,
+            "chunks_per_second": len(texts) / encode_seconds if encode_seconds > 0 else 0.0,
+            "cosine_to_reference": similarity,
+            f"recall_at_{k}": recall,
+            f"overlap_at_{k}": overlap,
+        })
+
+    return results
@@ -0,0 +1,187 @@
+"""
+Shared Google API service clients.
+
+Building a service with googleapiclient's build() parses the API's discovery
+document and opens a new HTTP connection every time, which costs hundreds of
+milliseconds per tool call. GoogleClientRegistry builds each service once per
+credentials and API and hands the same object to every caller:
+
+- Discovery documents are loaded from the copies bundled with
+  google-api-python-client and parsed once per API version, never fetched.
+- httplib2 connections are not thread-safe, so every request is sent through
+  a keep-alive connection owned by the calling thread (one per credentials),
+  which lets one cached service be used from several threads at once.
+
+Usage:
+    from google_clients import get_service
+    drive = get_service(creds, 'drive')
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import httplib2
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+
+# Version used when get_service is called without one
+DEFAULT_API_VERSIONS = {
+    "drive": "v3",
+    "docs": "v1",
+    "sheets": "v4",
+    "gmail": "v1",
+    "calendar": "v3",
+    "tasks": "v1",
+    "oauth2": "v2",
+}
+
+# Socket timeout for API requests, in seconds
+DEFAULT_HTTP_TIMEOUT = int(os.getenv("GOOGLE_API_TIMEOUT", "60"))
+
+# Credentials whose services are kept; the least recently used are dropped beyond this
+MAX_CACHED_CREDENTIALS = 32
+
+_registry: Optional["GoogleClientRegistry"] = None
+_registry_lock = threading.Lock()
+
+
+def credentials_key(creds) -> Tuple:
+    """
+    Cache key identifying the account and scopes behind a credentials object.
+
+    Credentials reloaded from token.json are new objects for the same account,
+    so user and service-account credentials are keyed by what they authorize
+    rather than by identity.
+    """
+    scopes = tuple(sorted(getattr(creds, 'scopes', None) or ()))
+    refresh_token = getattr(creds, 'refresh_token', None)
+    if refresh_token:
+        return ("user", getattr(creds, 'client_id', None), refresh_token, scopes)
+    email = getattr(creds, 'service_account_email', None)
+    if email:
+        return ("service_account", email, getattr(creds, '_subject', None), scopes)
+    return ("object", id(creds))
+
+
+class GoogleClientRegistry:
+    """Thread-safe cache of built Google API services keyed by credentials and API."""
+
+    def __init__(self, timeout: int = DEFAULT_HTTP_TIMEOUT, max_credentials: int = MAX_CACHED_CREDENTIALS):
+        """
+        Args:
+            timeout: Socket timeout for API requests, in seconds
+            max_credentials: Number of distinct credentials whose services are kept
+        """
+        self.timeout = timeout
+        self.max_credentials = max_credentials
+        # credentials key -> {"creds": credentials, "services": {(api, version): service}}
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._documents: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stats = {"builds": 0, "hits": 0, "connections": 0}
+
+    def _discovery_document(self, api: str, version: str) -> Optional[Dict[str, Any]]:
+        """Parsed discovery document bundled with googleapiclient (None if it isn't bundled)."""
+        key = (api, version)
+        if key not in self._documents:
+            content = get_static_doc(api, version)
+            if content is None:
+                return None
+            self._documents[key] = json.loads(content)
+        return self._documents[key]
+
+    def _thread_http(self, key: Tuple, creds) -> AuthorizedHttp:
+        """Authorized keep-alive connection owned by the current thread for these credentials."""
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        http = connections.get(key)
+        # An id()-keyed entry may belong to an earlier credentials object with the same id
+        if http is None or (key[0] == "object" and http.credentials is not creds):
+            http = connections[key] = AuthorizedHttp(creds, http=httplib2.Http(timeout=self.timeout))
+            with self._lock:
+                self._stats["connections"] += 1
+        return http
+
+    def _build(self, key: Tuple, creds, api: str, version: str):
+        """Build a service whose requests go through the calling thread's connection."""
+        def request_builder(http, *args, **kwargs):
+            return HttpRequest(self._thread_http(key, creds), *args, **kwargs)
+
+        http = self._thread_http(key, creds)
+        document = self._discovery_document(api, version)
+        if document is not None:
+            return build_from_document(document, http=http, requestBuilder=request_builder)
+        # APIs missing from the bundled documents are discovered over the network
+        return build(api, version, http=http, requestBuilder=request_builder, cache_discovery=False)
+
+    def get(self, creds, api: str, version: str = None):
+        """
+        Return the cached service for creds and api, building it on first use.
+
+        Args:
+            creds: Google credentials
+            api: API name (e.g. 'drive', 'docs', 'sheets', 'gmail', 'calendar', 'tasks')
+            version: API version (defaults to DEFAULT_API_VERSIONS[api])
+
+        Returns:
+            A googleapiclient Resource, safe to share between threads
+        """
+        version = version or DEFAULT_API_VERSIONS.get(api)
+        if version is None:
+            raise ValueError(f"No default version for the '{api}' API; pass one explicitly")
+
+        key = credentials_key(creds)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                service = entry["services"].get((api, version))
+                if service is not None:
+                    self._stats["hits"] += 1
+                    return service
+
+        service = self._build(key, creds, api, version)
+        with self._lock:
+            # Keeping the credentials referenced stops id()-based keys from being reused
+            entry = self._entries.setdefault(key, {"creds": creds, "services": {}})
+            self._entries.move_to_end(key)
+            # Another thread may have built the same service meanwhile; keep the first
+            service = entry["services"].setdefault((api, version), service)
+            self._stats["builds"] += 1
+            while len(self._entries) > self.max_credentials:
+                self._entries.popitem(last=False)
+        return service
+
+    def clear(self, creds=None):
+        """Drop cached services for creds (or for every credentials if None)."""
+        with self._lock:
+            if creds is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(credentials_key(creds), None)
+
+    def stats(self) -> Dict[str, int]:
+        """Services built, cache hits, thread connections opened and credentials cached."""
+        with self._lock:
+            return dict(self._stats, credentials=len(self._entries))
+
+
+def get_client_registry() -> GoogleClientRegistry:
+    """Return the process-wide client registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = GoogleClientRegistry()
+        return _registry
+
+
+def get_service(creds, api: str, version: str = None):
+    """Shared service for creds and api from the process-wide registry (see GoogleClientRegistry.get)."""
+    return get_client_registry().get(creds, api, version)
@@ -2,96 +2,292 @@
 """
 Script to index Google Drive documents into the knowledge base.
 Run this periodically to keep the knowledge base up-to-date.
+
+Usage:
+    python3 index_knowledge_base.py index                      # all Docs and Sheets in My Drive
+    python3 index_knowledge_base.py index --folder FOLDER_ID   # a folder and its subfolders
+    python3 index_knowledge_base.py index --query "name contains 'Strategy'"
+    python3 index_knowledge_base.py update                     # changes since the last run
+    python3 index_knowledge_base.py stats
+    python3 index_knowledge_base.py sweep | compact | shard {mime,folder,none}
+    python3 index_knowledge_base.py compare-backends --sample 200
+    python3 index_knowledge_base.py snapshot --dtype int8      # memory-mapped search snapshot
+
+Add --json before the subcommand to stream progress as JSON lines on stdout
+(log messages go to stderr). Run without arguments for an interactive menu.
 """
 
+import argparse
+import contextlib
+import json
+import os
 import sys
+import threading
 from auth import get_credentials
-from knowledge_base import initialize_knowledge_base
+from knowledge_base import (
+    initialize_knowledge_base, DEFAULT_FETCH_WORKERS, DEFAULT_EMBED_BATCH_SIZE, DEFAULT_LIST_WORKERS, SHARD_MODES
+)
 
+# Interactive menu / legacy numeric choices -> subcommands
+MENU = [
+    ("1", "Index all Google Docs and Sheets in My Drive", "index"),
+    ("2", "Index documents in a specific folder and its subfolders (enter folder ID)", "index --folder"),
+    ("3", "Index documents matching a search query (enter query)", "index --query"),
+    ("4", "Show knowledge base statistics", "stats"),
+    ("5", "Update only documents changed since the last run (incremental)", "update"),
+    ("6", "Compare embedding backends (torch / onnx / int8) on indexed chunks", "compare-backends"),
+    ("7", "Sweep orphaned chunks (deleted or untracked documents)", "sweep"),
+    ("8", "Compact the collection (reclaim space from deleted chunks)", "compact"),
+    ("9", "Shard the collection (mime / folder / none)", "shard"),
+    ("10", "Export a memory-mapped embedding snapshot for fast search start-up", "snapshot"),
+    ("11", "Exit", None),
+]
 
-def main():
-    """Index documents into the knowledge base."""
-    import sys
+
+class JsonLinesProgress:
+    """Writes progress events as JSON lines (thread-safe; events arrive from fetcher threads)."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def print_throughput(stats):
+    """Print indexing throughput from index_folder statistics."""
+    print(f"\nIndexed {stats['documents']} documents ({stats['chunks']} chunks, "
+          f"{stats['embedded']} embedded) in {stats['elapsed_seconds']:.1f}s")
+    print(f"  Throughput: {stats['docs_per_second']:.2f} docs/sec, "
+          f"{stats['chunks_per_second']:.2f} chunks/sec")
+    for api, calls in stats.get('api', {}).items():
+        if calls['retries'] or calls['failed']:
+            print(f"  {api} API: {calls['calls']} calls, {calls['retries']} retries "
+                  f"({calls['throttled']} throttled), {calls['failed']} failed, now {calls['rate']:.2f} req/s")
+
+
+def print_backend_comparison(results):
+    """Print the accuracy/throughput table from compare_embedding_backends."""
+    if not results:
+        return
+    print(f"\n{'Backend':<8} {'Load (s)':>9} {'Chunks/s':>10} {'Cosine':>8} {'Recall':>8} {'Overlap':>8}")
+    for result in results:
+        recall = next(v for key, v in result.items() if key.startswith('recall_at_'))
+        overlap = next(v for key, v in result.items() if key.startswith('overlap_at_'))
+        print(f"{result['backend']:<8} {result['load_seconds']:>9.2f} {result['chunks_per_second']:>10.1f} "
+              f"{result['cosine_to_reference']:>8.4f} {recall:>8.3f} {overlap:>8.3f}")
+    print("\nCosine and overlap are relative to the first backend; set KB_EMBEDDING_BACKEND to switch.")
+
+
+def print_stats(stats):
+    """Print knowledge base statistics."""
+    print("\nKnowledge Base Statistics:")
+    print(f"  Total documents indexed: {stats['total_documents']}")
+    print(f"  Total chunks: {stats['total_chunks']}")
+    print(f"  Collection layout: {stats['shard_by']}")
+    for shard_key, chunks in stats.get('shards', {}).items():
+        print(f"    {shard_key or '(none)'}: {chunks} chunks")
+    if 'snapshot' in stats:
+        snapshot = stats['snapshot']
+        state = "current" if snapshot['current'] else "stale - searches use Chroma until it is exported again"
+        print(f"  Embedding snapshot: {snapshot['rows']} chunks, {snapshot['dtype']}, {state}")
+    if stats['indexed_files']:
+        print(f"\n  Indexed files: {len(stats['indexed_files'])}")
+
+
+def build_parser():
+    """Build the command-line parser."""
+    parser = argparse.ArgumentParser(description="Index Google Drive documents into the Vonga knowledge base")
+    parser.add_argument("--json", action="store_true",
+                        help="Stream progress as JSON lines on stdout (log messages go to stderr)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    index = commands.add_parser("index", help="Index Docs and Sheets (all, a folder tree, or a Drive query)")
+    target = index.add_mutually_exclusive_group()
+    target.add_argument("--folder", help="Drive folder ID (subfolders included)")
+    target.add_argument("--query", help="Drive search query")
+    index.add_argument("--folder-name", default=None, help="Folder name for log messages")
+    index.add_argument("--no-recursive", action="store_true", help="Only index direct children of --folder")
+    index.add_argument("--fetch-workers", type=int, default=int(os.getenv("KB_FETCH_WORKERS", DEFAULT_FETCH_WORKERS)),
+                       help="Concurrent document fetchers")
+    index.add_argument("--batch-size", type=int, default=int(os.getenv("KB_EMBED_BATCH_SIZE", DEFAULT_EMBED_BATCH_SIZE)),
+                       help="Chunks per embedding batch")
+    index.add_argument("--list-workers", type=int, default=int(os.getenv("KB_LIST_WORKERS", DEFAULT_LIST_WORKERS)),
+                       help="Concurrent folder listings when crawling")
+    index.add_argument("--multi-process", action="store_true", default=os.getenv("KB_MULTI_PROCESS") == "1",
+                       help="Embed with a multi-process pool")
+    index.add_argument("--no-resume", action="store_true", help="Ignore a saved checkpoint and start over")
+
+    commands.add_parser("update", help="Index documents changed since the last run (Drive changes feed)")
+    commands.add_parser("stats", help="Show knowledge base statistics")
+
+    compare = commands.add_parser("compare-backends", help="Compare embedding backends on indexed chunks")
+    compare.add_argument("--sample", type=int, default=200, help="Number of indexed chunks to encode")
+
+    sweep = commands.add_parser("sweep", help="Remove orphaned chunks")
+    sweep.add_argument("--no-drive-check", action="store_true",
+                       help="Only check the manifest, not whether documents still exist in Drive")
+    commands.add_parser("compact", help="Rebuild the collection to reclaim space")
+    shard = commands.add_parser("shard", help="Change the collection layout")
+    shard.add_argument("shard_by", choices=list(SHARD_MODES), help="Shard by MIME type, top-level folder, or not at all")
     
+    snapshot = commands.add_parser("snapshot", help="Export a memory-mapped embedding snapshot for search")
+    snapshot.add_argument("--dtype", choices=["float16", "int8"], default=None,
+                          help="Stored vector type (default: the previous snapshot's, else float16)")
+    snapshot.add_argument("--ivf-lists", type=int, default=None,
+                          help="IVF lists for approximate search (0 = brute force; default: automatic)")
+
+    return parser
+
+
+def legacy_args(argv):
+    """Translate the old numeric choices (e.g. `5`, `2 FOLDER_ID NAME`, `9 mime`) into subcommand arguments."""
+    choice, rest = argv[0], argv[1:]
+    if choice == "1":
+        return ["index"]
+    if choice == "2":
+        args = ["index", "--folder", rest[0]] if rest else ["index", "--folder", input("Enter Google Drive folder ID: ").strip()]
+        if len(rest) > 1:
+            args += ["--folder-name", rest[1]]
+        return args
+    if choice == "3":
+        return ["index", "--query", rest[0] if rest else input("Enter Google Drive search query: ").strip()]
+    if choice == "6":
+        return ["compare-backends"] + (["--sample", rest[0]] if rest else [])
+    if choice == "9":
+        return ["shard", rest[0] if rest else input("Shard by (mime / folder / none): ").strip().lower()]
+    for number, _, command in MENU:
+        if number == choice:
+            return command.split() if command else None
+    return argv
+
+
+def interactive_args():
+    """Show the menu and return the chosen subcommand arguments (None to exit)."""
+    print("\n" + "="*60)
+    print("Vonga Knowledge Base Indexer")
+    print("="*60)
+    print("\nOptions:")
+    for number, label, _ in MENU:
+        print(f"{number}. {label}")
+    print("\nTip: run with a subcommand for non-interactive mode, e.g.:")
+    print("  python3 index_knowledge_base.py index")
+    print("  python3 index_knowledge_base.py update")
+    print("  python3 index_knowledge_base.py --json index   (JSON-lines progress)")
+
+    choice = input(f"\nEnter choice (1-{len(MENU)}): ").strip()
+    return legacy_args([choice])
+
+
+def run(args, progress):
+    """Run a subcommand. Returns the process exit code."""
     print("Initializing knowledge base...")
-    
-    # Get credentials
     creds = get_credentials()
-    
-    # Initialize knowledge base
     kb = initialize_knowledge_base(creds)
-    
-    # Check for command-line arguments
-    if len(sys.argv) > 1:
-        choice = sys.argv[1]
-    else:
-        print("\n" + "="*60)
-        print("Vonga Knowledge Base Indexer")
-        print("="*60)
-        print("\nOptions:")
-        print("1. Index all Google Docs and Sheets in My Drive")
-        print("2. Index documents in a specific folder (enter folder ID)")
-        print("3. Index documents matching a search query (enter query)")
-        print("4. Show knowledge base statistics")
-        print("5. Exit")
-        print("\nTip: Run with argument for non-interactive mode:")
-        print("  python3 index_knowledge_base.py 1  (index all)")
-        print("  python3 index_knowledge_base.py 4  (show stats)")
-        
-        try:
-            choice = input("\nEnter choice (1-5): ").strip()
-        except EOFError:
-            print("\nFor non-interactive mode, run with argument:")
-            print("  python3 index_knowledge_base.py 1")
-            return
-    
-    if choice == "1":
-        print("\nIndexing all Docs and Sheets in My Drive...")
-        kb.index_folder()
-    elif choice == "2":
-        if len(sys.argv) > 2:
-            folder_id = sys.argv[2]
-            folder_name = sys.argv[3] if len(sys.argv) > 3 else "Folder"
-        else:
-            folder_id = input("Enter Google Drive folder ID: ").strip()
-            folder_name = input("Enter folder name (for logging): ").strip() or "Folder"
+
+    if args.command == "index":
+        folder_name = args.folder_name or ("Folder" if args.folder else "My Drive")
         print(f"\nIndexing documents in {folder_name}...")
-        kb.index_folder(folder_id=folder_id, folder_name=folder_name)
-    elif choice == "3":
-        if len(sys.argv) > 2:
-            query = sys.argv[2]
-        else:
-            query = input("Enter Google Drive search query: ").strip()
-        print(f"\nIndexing documents matching query...")
-        kb.index_folder(query=query)
-    elif choice == "4":
+        stats = kb.index_folder(
+            folder_id=args.folder,
+            folder_name=folder_name,
+            query=args.query,
+            fetch_workers=args.fetch_workers,
+            batch_size=args.batch_size,
+            multi_process=args.multi_process,
+            recursive=not args.no_recursive,
+            list_workers=args.list_workers,
+            resume=not args.no_resume,
+            progress=progress
+        )
+        print_throughput(stats)
+        if "error" in stats:
+            return 1
+    elif args.command == "update":
+        print("\nUpdating changed documents...")
+        stats = kb.index_changes(progress=progress)
+        if "error" in stats:
+            return 1
+    elif args.command == "stats":
         stats = kb.get_stats()
-        print("\nKnowledge Base Statistics:")
-        print(f"  Total documents indexed: {stats['total_documents']}")
-        print(f"  Total chunks: {stats['total_chunks']}")
-        if stats['indexed_files']:
-            print(f"\n  Indexed files: {len(stats['indexed_files'])}")
-    elif choice == "5":
-        print("Exiting...")
-        return
-    else:
-        print("Invalid choice.")
-        return
-    
+        print_stats(stats)
+        if progress:
+            progress(dict(stats, event="stats"))
+        return 0
+    elif args.command == "compare-backends":
+        results = kb.compare_embedding_backends(sample_size=args.sample)
+        print_backend_comparison(results)
+        if progress:
+            progress({"event": "compare-backends", "results": results})
+    elif args.command == "sweep":
+        stats = kb.sweep_orphans(check_drive=not args.no_drive_check)
+        if progress:
+            progress(dict(stats, event="sweep"))
+    elif args.command == "compact":
+        stats = kb.compact_collection()
+        if progress:
+            progress(dict(stats, event="compact"))
+    elif args.command == "shard":
+        moved = kb.reshard(args.shard_by)
+        if progress:
+            progress({"event": "shard", "shard_by": args.shard_by, "chunks": moved})
+    elif args.command == "snapshot":
+        info = kb.export_snapshot(dtype=args.dtype, ivf_lists=args.ivf_lists)
+        if progress:
+            progress(dict(info, event="snapshot"))
+
     # Show final stats
     stats = kb.get_stats()
     print(f"\n✓ Complete. Total documents in knowledge base: {stats['total_documents']}")
+    return 0
+
+
+def main():
+    """Index documents into the knowledge base."""
+    argv = sys.argv[1:]
+    if not argv:
+        try:
+            argv = interactive_args()
+        except EOFError:
+            print("\nFor non-interactive mode, run with a subcommand:")
+            print("  python3 index_knowledge_base.py index")
+            return 0
+        if argv is None:
+            print("Exiting...")
+            return 0
+    elif argv[0].isdigit():
+        argv = legacy_args(argv)
+        if argv is None:
+            print("Exiting...")
+            return 0
+
+    args = build_parser().parse_args(argv)
+
+    if not args.json:
+        return run(args, progress=None)
+
+    # Keep stdout clean for the JSON stream; log messages go to stderr
+    progress = JsonLinesProgress(sys.stdout)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            return run(args, progress)
+    except Exception as e:
+        progress({"event": "error", "message": str(e)})
+        raise
 
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
-        print("\n\nInterrupted by user.")
-        sys.exit(0)
+        print("\n\nInterrupted by user. Run the same command again to resume.")
+        sys.exit(130)
     except Exception as e:
-        print(f"\nError: {e}")
+        print(f"\nError: {e}", file=sys.stderr)
         import traceback
         traceback.print_exc()
         sys.exit(1)
-
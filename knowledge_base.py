@@ -5,121 +5,654 @@ Uses ChromaDB for vector storage and retrieval.
 
 import os
 import json
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import asyncio
+import functools
+import hashlib
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Callable, Iterable, Iterator
+from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 try:
     import chromadb
     from chromadb.config import Settings
-    from sentence_transformers import SentenceTransformer
     CHROMADB_AVAILABLE = True
 except ImportError:
     CHROMADB_AVAILABLE = False
 
+try:
+    from snapshot import EmbeddingSnapshot, export_snapshot, read_snapshot_info
+    SNAPSHOT_AVAILABLE = True
+except ImportError:
+    SNAPSHOT_AVAILABLE = False
+
 from google.oauth2.credentials import Credentials
 from tools.drive_tools import get_drive_service, get_docs_service, get_sheets_service
+from doc_extractor import GET_ALL_TABS, extract_document
+from chunking import Chunker, StructureChunker, block_lines
+from embeddings import SENTENCE_TRANSFORMERS_AVAILABLE, get_embedding_service, get_reranker_service, compare_backends
+from cache import TTLCache
+from bm25 import BM25Index, reciprocal_rank_fusion
+from manifest import ManifestStore
+from checkpoint import IndexCheckpoint
+from rate_limit import get_rate_limiter
+from metrics import MetricsRegistry, SlowQueryLog, Trace, get_metrics, start_metrics_server
+from shards import ShardedCollection, collection_names, is_layout_member
+
+COLLECTION_NAME = "vonga_knowledge_base"
+COLLECTION_METADATA = {"description": "Vonga business knowledge base from Google Drive"}
+
+# Collection layouts: a single collection, or one shard per MIME type or top-level Drive folder
+SHARD_MODES = {"none": None, "mime": "file_type", "folder": "top_folder"}
+
+# Chunks copied per page when compacting or resharding the collection
+MAINTENANCE_PAGE_SIZE = 500
+
+DOC_MIME_TYPE = 'application/vnd.google-apps.document'
+SHEET_MIME_TYPE = 'application/vnd.google-apps.spreadsheet'
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+SUPPORTED_MIME_TYPES = [DOC_MIME_TYPE, SHEET_MIME_TYPE]
+
+# Sheets are read in row pages, several pages per values.batchGet request
+SHEET_ROW_PAGE_SIZE = 1000
+SHEET_PAGES_PER_BATCH = 5
+# Data rows per table block; each block of a tab repeats the tab's header row
+SHEET_ROWS_PER_BLOCK = 500
+
+# Indexing pipeline defaults
+DEFAULT_FETCH_WORKERS = 4
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_LIST_WORKERS = 4
+
+# Search cache defaults
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_TTL_SECONDS = 300
+
+# Search modes: dense vectors, BM25 keywords, or both fused with reciprocal rank fusion
+SEARCH_MODES = ["vector", "lexical", "hybrid"]
+HYBRID_CANDIDATE_MULTIPLIER = 4
+
+# Cross-encoder re-ranking: candidates re-scored per search (bounds latency) and minimum relevance kept
+DEFAULT_RERANK_CANDIDATES = 20
+DEFAULT_RERANK_MIN_SCORE = 0.2
+
+# Threads available to async searches (encoding and Chroma queries run off the event loop)
+ASYNC_SEARCH_WORKERS = 4
+
+# Timing metrics (see metrics.py): per-stage indexing spans, whole-document indexing time
+INDEX_STAGE_METRIC = "kb_index_stage_seconds"
+INDEX_DOCUMENT_METRIC = "kb_index_document_seconds"
+SEARCH_TRACE = "kb_search"
 
 
 class KnowledgeBase:
     """Knowledge base system that indexes and retrieves information from Google Drive."""
     
-    def __init__(self, creds: Credentials, persist_directory: str = "./knowledge_base"):
+    def __init__(self, creds: Credentials, persist_directory: str = "./knowledge_base",
+                 chunker: Chunker = None, embedding_backend: str = None, rerank: bool = None,
+                 use_snapshot: bool = None, metrics: MetricsRegistry = None):
         """
         Initialize the knowledge base.
         
         Args:
             creds: Google credentials for accessing Drive
             persist_directory: Directory to store the ChromaDB database
+            chunker: Chunking strategy (defaults to a structure-aware StructureChunker)
+            embedding_backend: "torch", "onnx" or "int8" (defaults to KB_EMBEDDING_BACKEND, else torch)
+            rerank: Re-rank search results with a cross-encoder by default (defaults to KB_RERANK=1)
+            use_snapshot: Search an up-to-date embedding snapshot instead of Chroma when one has
+                been exported (defaults to on unless KB_SNAPSHOT=0)
+            metrics: Registry for indexing and search timings (defaults to the process-wide one)
         """
-        if not CHROMADB_AVAILABLE:
+        if not CHROMADB_AVAILABLE or not SENTENCE_TRANSFORMERS_AVAILABLE:
             raise ImportError("chromadb and sentence-transformers are required. Install with: pip install chromadb sentence-transformers")
         
         self.creds = creds
+        self.chunker = chunker or StructureChunker()
         self.persist_directory = Path(persist_directory)
         self.persist_directory.mkdir(exist_ok=True)
         
-        # Initialize ChromaDB
-        self.client = chromadb.PersistentClient(
-            path=str(self.persist_directory),
-            settings=Settings(anonymized_telemetry=False)
-        )
+        # ChromaDB client and collection, opened on first use (searches served from a snapshot never open them)
+        self._client = None
+        self._collection = None
+        self._chroma_lock = threading.RLock()
+        
+        # Single collection or shards, as chosen with reshard()
+        self.layout_file = self.persist_directory / "collection_layout.json"
+        self.shard_by = self._load_layout()
+        
+        # Drive folder ID -> parent folder IDs, for resolving top-level folders
+        self._folder_parents = {}
+        
+        # Shared embedding model (free, local), loaded on the first search or index call
+        self.embedding_model = get_embedding_service(backend=embedding_backend)
+        
+        # Optional cross-encoder re-ranking stage, loaded on the first re-ranked search
+        self.rerank = os.getenv("KB_RERANK") == "1" if rerank is None else rerank
+        self.reranker = get_reranker_service()
+        
+        # Query embedding and result caches for repeated searches within an agent run
+        self._query_embedding_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS)
+        self._search_cache = TTLCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL_SECONDS)
+        
+        # Bounded executor for asearch, created on first use
+        self._search_executor = None
+        self._search_executor_lock = threading.Lock()
+        
+        # Per-document index manifest (SQLite); imports the legacy JSON tracking file once
+        self.manifest = ManifestStore(self.persist_directory / "manifest.db")
+        self.legacy_index_file = self.persist_directory / "indexed_files.json"
+        if self.legacy_index_file.exists() and len(self.manifest) == 0:
+            imported = self.manifest.import_json(self.legacy_index_file)
+            print(f"✓ Imported {imported} documents from {self.legacy_index_file.name} into the manifest")
         
-        # Get or create collection
-        self.collection = self.client.get_or_create_collection(
-            name="vonga_knowledge_base",
-            metadata={"description": "Vonga business knowledge base from Google Drive"}
+        # BM25 keyword index kept in sync with the collection (same chunk IDs)
+        self.lexical_index = BM25Index(self.persist_directory / "bm25_index.json")
+        
+        # Drive changes feed token for incremental updates
+        self.changes_token_file = self.persist_directory / "drive_changes_token.json"
+        
+        # Resume position of an interrupted full index
+        self.checkpoint_file = self.persist_directory / "index_checkpoint.json"
+        
+        # Read-only memory-mapped embedding snapshot for fast cold-start search (see export_snapshot)
+        self.snapshot_dir = self.persist_directory / "snapshot"
+        self.use_snapshot = SNAPSHOT_AVAILABLE and (
+            os.getenv("KB_SNAPSHOT", "1") != "0" if use_snapshot is None else use_snapshot
         )
+        self._snapshot = None
+        self._snapshot_mtime = None
+        self._snapshot_lock = threading.Lock()
         
-        # Initialize embedding model (using a free, local model)
-        print("Loading embedding model...")
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-        print("✓ Embedding model loaded")
-        
-        # Load index tracking file
-        self.index_file = self.persist_directory / "indexed_files.json"
-        self.indexed_files = self._load_indexed_files()
-    
-    def _load_indexed_files(self) -> Dict[str, Dict[str, Any]]:
-        """Load the tracking file for indexed documents."""
-        if self.index_file.exists():
-            with open(self.index_file, 'r') as f:
-                return json.load(f)
-        return {}
-    
-    def _save_indexed_files(self):
-        """Save the tracking file for indexed documents."""
-        with open(self.index_file, 'w') as f:
-            json.dump(self.indexed_files, f, indent=2)
-    
-    def _extract_text_from_doc(self, file_id: str) -> str:
-        """Extract text from a Google Doc."""
-        try:
-            docs_service = get_docs_service(self.creds)
-            doc = docs_service.documents().get(documentId=file_id).execute()
-            content = doc.get('body', {}).get('content', [])
-            
-            text_parts = []
-            for element in content:
-                if 'paragraph' in element:
-                    para = element['paragraph']
-                    for elem in para.get('elements', []):
-                        if 'textRun' in elem:
-                            text_parts.append(elem['textRun'].get('content', ''))
-            
-            return ''.join(text_parts)
-        except Exception as e:
-            print(f"Error extracting text from doc {file_id}: {e}")
+        # Stage timings for indexing and search, and a sampled log of slow searches
+        self.metrics = metrics or get_metrics()
+        start_metrics_server()
+        self.slow_query_log = SlowQueryLog(self.persist_directory / "slow_queries.jsonl")
+        
+        # Shared per-API rate budgets with retry/backoff for every Drive, Docs and Sheets call
+        self.rate_limiter = get_rate_limiter()
+    
+    @property
+    def client(self):
+        """The ChromaDB client, opened on first access."""
+        if self._client is None:
+            with self._chroma_lock:
+                if self._client is None:
+                    self._client = chromadb.PersistentClient(
+                        path=str(self.persist_directory),
+                        settings=Settings(anonymized_telemetry=False)
+                    )
+        return self._client
+    
+    @client.setter
+    def client(self, client):
+        self._client = client
+    
+    @property
+    def collection(self):
+        """The Chroma collection (or shard set) for the current layout, opened on first access."""
+        if self._collection is None:
+            with self._chroma_lock:
+                if self._collection is None:
+                    self._collection = self._open_collection(self.shard_by)
+        return self._collection
+    
+    @collection.setter
+    def collection(self, collection):
+        self._collection = collection
+    
+    def _load_changes_token(self, pending: bool = False) -> Optional[str]:
+        """
+        Load the saved Drive changes page token, if any.
+        
+        Args:
+            pending: Load the anchor token of a first full index that hasn't finished yet
+        """
+        if self.changes_token_file.exists():
+            with open(self.changes_token_file, 'r') as f:
+                return json.load(f).get('pending_start_page_token' if pending else 'start_page_token')
+        return None
+    
+    def _save_changes_token(self, token: str, pending: bool = False):
+        """Save the Drive changes page token for the next incremental run."""
+        with open(self.changes_token_file, 'w') as f:
+            json.dump({
+                "pending_start_page_token" if pending else "start_page_token": token,
+                "saved_at": datetime.utcnow().isoformat()
+            }, f, indent=2)
+    
+    def _load_layout(self) -> str:
+        """Load the collection layout (a SHARD_MODES key); defaults to a single collection."""
+        if self.layout_file.exists():
+            with open(self.layout_file, 'r') as f:
+                return json.load(f).get('shard_by', 'none')
+        return 'none'
+    
+    def _save_layout(self, shard_by: str):
+        """Persist the collection layout."""
+        with open(self.layout_file, 'w') as f:
+            json.dump({"shard_by": shard_by, "updated_at": datetime.utcnow().isoformat()}, f, indent=2)
+    
+    def _open_collection(self, shard_by: str, name: str = COLLECTION_NAME):
+        """Open the single collection or the sharded collection set for a layout."""
+        shard_key = SHARD_MODES[shard_by]
+        if shard_key is None:
+            return self.client.get_or_create_collection(name=name, metadata=COLLECTION_METADATA)
+        return ShardedCollection(self.client, name, shard_key, metadata=COLLECTION_METADATA)
+    
+    def _folder_parent_ids(self, drive_service, folder_id: str) -> List[str]:
+        """Return the parents of a Drive folder (cached; folders rarely move during a run)."""
+        if folder_id not in self._folder_parents:
+            folder = self.rate_limiter.execute("drive", drive_service.files().get(fileId=folder_id, fields="id, parents"))
+            self._folder_parents[folder_id] = folder.get('parents') or []
+        return self._folder_parents[folder_id]
+    
+    def _top_level_folder(self, file_id: str, parents: List[str] = None) -> str:
+        """
+        Return the top-level folder (a direct child of My Drive or a shared drive) containing a file.
+        
+        Files stored directly in the root get the root's ID.
+        """
+        drive_service = get_drive_service(self.creds)
+        if parents is None:
+            parents = self.rate_limiter.execute(
+                "drive", drive_service.files().get(fileId=file_id, fields="id, parents")
+            ).get('parents') or []
+        if not parents:
             return ""
+        
+        chain = [parents[0]]
+        while True:
+            up = self._folder_parent_ids(drive_service, chain[-1])
+            if not up or up[0] in chain:
+                break
+            chain.append(up[0])
+        # The last folder in the chain is the root; the one below it is the top-level folder
+        return chain[-2] if len(chain) > 1 else chain[-1]
     
-    def _extract_text_from_sheet(self, file_id: str) -> str:
-        """Extract text from a Google Sheet (first tab)."""
-        try:
-            sheets_service = get_sheets_service(self.creds)
-            spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=file_id).execute()
-            sheets = spreadsheet.get('sheets', [])
+    @staticmethod
+    def _content_hash(text: str) -> str:
+        """Return a stable content hash for a chunk or document."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    def _get_existing_chunks(self, file_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return the stored chunks of a file keyed by chunk ID (content hash, file name, top folder, embedding)."""
+        existing = self.collection.get(where={"file_id": file_id}, include=["metadatas", "embeddings"])
+        ids = existing.get('ids') or []
+        metadatas = existing.get('metadatas')
+        embeddings = existing.get('embeddings')
+        if metadatas is None:
+            metadatas = [{}] * len(ids)
+        if embeddings is None:
+            embeddings = [None] * len(ids)
+        
+        return {
+            chunk_id: {
+                "content_hash": (metadata or {}).get('content_hash'),
+                "file_name": (metadata or {}).get('file_name'),
+                "indexed_ts": (metadata or {}).get('indexed_ts'),
+                "top_folder": (metadata or {}).get('top_folder'),
+                "embedding": list(embedding) if embedding is not None else None
+            }
+            for chunk_id, metadata, embedding in zip(ids, metadatas, embeddings)
+        }
+    
+    def _invalidate_search_cache(self):
+        """Drop cached search results after the collection is written to."""
+        self._search_cache.clear()
+    
+    def _delete_document_chunks(self, file_id: str):
+        """Delete every chunk belonging to a file from the collection."""
+        self.collection.delete(where={"file_id": file_id})
+        self.lexical_index.remove_prefix(f"{file_id}_chunk_")
+        self._invalidate_search_cache()
+    
+    def remove_document(self, file_id: str, save: bool = True):
+        """
+        Remove a document and all of its chunks from the knowledge base.
+        
+        Args:
+            file_id: Google Drive file ID
+            save: Persist the keyword index (callers removing many documents save once at the end)
+        """
+        self._delete_document_chunks(file_id)
+        if save:
+            self.lexical_index.save()
+        removed = self.manifest.remove(file_id)
+        if removed:
+            print(f"✓ Removed {removed.get('file_name', file_id)} from knowledge base")
+    
+    def _extract_blocks_from_doc(self, file_id: str) -> List[Dict[str, Any]]:
+        """Fetch a Google Doc and extract its headings, paragraphs and tables as chunking blocks."""
+        docs_service = get_docs_service(self.creds)
+        with self.metrics.span(INDEX_STAGE_METRIC, stage="fetch"):
+            doc = self.rate_limiter.execute("docs", docs_service.documents().get(documentId=file_id, **GET_ALL_TABS))
+        with self.metrics.span(INDEX_STAGE_METRIC, stage="extract"):
+            return extract_document(doc, outline=True)["outline"]
+    
+    @staticmethod
+    def _column_letter(column: int) -> str:
+        """Convert a 1-based column number to A1 notation letters (1 -> A, 27 -> AA)."""
+        letters = ''
+        while column > 0:
+            column, remainder = divmod(column - 1, 26)
+            letters = chr(ord('A') + remainder) + letters
+        return letters
+    
+    def _iter_sheet_rows(self, sheets_service, file_id: str, title: str, row_count: int, column_count: int):
+        """
+        Yield the rows of one tab as text lines, reading SHEET_ROW_PAGE_SIZE-row pages.
+        
+        Several pages are fetched per values.batchGet call and converted to text
+        straight away, so only one batch of raw cell values is held at a time.
+        """
+        quoted_title = "'" + title.replace("'", "''") + "'"
+        last_column = self._column_letter(max(column_count, 1))
+        page_starts = list(range(1, row_count + 1, SHEET_ROW_PAGE_SIZE))
+        
+        for batch_start in range(0, len(page_starts), SHEET_PAGES_PER_BATCH):
+            ranges = [
+                f"{quoted_title}!A{start}:{last_column}{min(start + SHEET_ROW_PAGE_SIZE - 1, row_count)}"
+                for start in page_starts[batch_start:batch_start + SHEET_PAGES_PER_BATCH]
+            ]
+            result = self.rate_limiter.execute("sheets", sheets_service.spreadsheets().values().batchGet(
+                spreadsheetId=file_id,
+                ranges=ranges
+            ))
             
-            if not sheets:
-                return ""
+            for value_range in result.get('valueRanges', []):
+                for row in value_range.get('values', []):
+                    yield " | ".join(str(cell) for cell in row)
+    
+    def _extract_blocks_from_sheet(self, file_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Yield every tab of a Google Sheet as table blocks titled with the tab name.
+        
+        Rows are grouped into blocks of up to SHEET_ROWS_PER_BLOCK as they are
+        read, each starting with the tab's header row. Blocks are yielded as
+        soon as they fill, so the caller can hash and chunk them while later
+        pages are still being read.
+        """
+        sheets_service = get_sheets_service(self.creds)
+        spreadsheet = self.rate_limiter.execute("sheets", sheets_service.spreadsheets().get(
+            spreadsheetId=file_id,
+            fields="sheets(properties(title,sheetType,gridProperties(rowCount,columnCount)))"
+        ))
+        
+        for sheet in spreadsheet.get('sheets', []):
+            properties = sheet.get('properties', {})
+            # Charts and other non-grid sheets have no cell values
+            if properties.get('sheetType', 'GRID') != 'GRID':
+                continue
             
-            first_sheet_name = sheets[0].get('properties', {}).get('title', 'Sheet1')
-            result = sheets_service.spreadsheets().values().get(
-                spreadsheetId=file_id,
-                range=f"{first_sheet_name}!A1:Z1000"
-            ).execute()
+            title = properties.get('title', 'Sheet1')
+            grid = properties.get('gridProperties', {})
+            header = None
+            group = []
+            tab_blocks = 0
+            for row in self._iter_sheet_rows(
+                sheets_service,
+                file_id,
+                title,
+                grid.get('rowCount', SHEET_ROW_PAGE_SIZE),
+                grid.get('columnCount', 26)
+            ):
+                # The first non-blank row is the header, as in StructureChunker
+                if header is None:
+                    if row.strip():
+                        header = row
+                    continue
+                group.append(row)
+                if len(group) == SHEET_ROWS_PER_BLOCK:
+                    yield {"type": "table", "title": title, "rows": [header] + group}
+                    tab_blocks += 1
+                    group = []
+            if header is not None and (group or not tab_blocks):
+                yield {"type": "table", "title": title, "rows": [header] + group}
+    
+    def _should_index(self, file_id: str, modified_time: str = None, force_reindex: bool = False,
+                      parents: List[str] = None) -> bool:
+        """
+        Return True if a file is new, changed since it was indexed, or forced.
+        
+        When sharding by folder, a file moved to another top-level folder also
+        needs indexing: moving a file doesn't change its modifiedTime, but its
+        chunks must move to the new folder's shard. This is only checked when
+        the file's parents are known (e.g. from a listing or the changes feed).
+        """
+        existing = self.manifest.get(file_id)
+        if force_reindex or existing is None:
+            return True
+        if modified_time is not None and existing.get('modified_time') != modified_time:
+            return True
+        # Entries indexed before top_folder was recorded are left alone until their content changes
+        if self.shard_by == "folder" and parents is not None and existing.get('top_folder') is not None:
+            try:
+                return self._top_level_folder(file_id, parents) != existing['top_folder']
+            except Exception as e:
+                print(f"Could not resolve the folder of {file_id}: {e}")
+                return True
+        return False
+    
+    def _fetch_document(self, file_id: str, file_name: str, file_type: str,
+                        modified_time: str = None, parents: List[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a document from Drive and split it into chunks.
+        
+        This stage only does network I/O and text processing, so it is safe to
+        run from fetcher threads.
+        API errors that survive the rate limiter's retries are raised, so the
+        caller records the file as failed instead of as an empty document.
+        
+        Returns:
+            Dict with the document's chunks and hashes, or None if there is nothing to index
+        """
+        print(f"Indexing {file_name} ({file_id})...")
+        
+        # Extract structure based on file type
+        if file_type == DOC_MIME_TYPE:
+            blocks = self._extract_blocks_from_doc(file_id)
+            fetched = self._prepare_document(file_id, file_name, file_type, blocks, modified_time)
+        elif file_type == SHEET_MIME_TYPE:
+            # Sheets are read page by page while they are chunked, so reading and chunking count as fetch
+            blocks = self._extract_blocks_from_sheet(file_id)
+            fetched = self._prepare_document(file_id, file_name, file_type, blocks, modified_time, stage="fetch")
+        else:
+            print(f"Unsupported file type: {file_type}")
+            return None
+        
+        if fetched and self.shard_by == "folder":
+            fetched["top_folder"] = self._top_level_folder(file_id, parents)
+        return fetched
+    
+    def _prepare_document(self, file_id: str, file_name: str, file_type: str, blocks: Iterable[Dict[str, Any]],
+                          modified_time: str = None, stage: str = "chunk") -> Optional[Dict[str, Any]]:
+        """
+        Chunk extracted document blocks and hash the chunks.
+        
+        Blocks are read once: the document hash is computed as they pass to
+        the chunker, so a generator of blocks is never materialized.
+        
+        Args:
+            stage: INDEX_STAGE_METRIC stage the work is timed under
+        
+        Returns:
+            Dict with the document's chunks and hashes, or None if there is nothing to index
+        """
+        # Hash of the document's plain text (the lines of every block joined by newlines)
+        doc_hash = hashlib.sha256()
+        has_text = False
+        
+        def hashed(blocks):
+            nonlocal has_text
+            first = True
+            for block in blocks:
+                for line in block_lines(block):
+                    if not first:
+                        doc_hash.update(b"\n")
+                    doc_hash.update(line.encode('utf-8'))
+                    first = False
+                    has_text = has_text or bool(line.strip())
+                yield block
+        
+        with self.metrics.span(INDEX_STAGE_METRIC, stage=stage):
+            chunked = self.chunker.chunk(hashed(blocks))
+            if not has_text:
+                print(f"No text extracted from {file_name}")
+                return None
+            if not chunked:
+                return None
             
-            values = result.get('values', [])
-            # Convert rows to text
-            text_lines = []
-            for row in values:
-                text_lines.append(" | ".join(str(cell) for cell in row))
+            chunks = [chunk["text"] for chunk in chunked]
+            sections = [chunk["section"] for chunk in chunked]
             
-            return "\n".join(text_lines)
-        except Exception as e:
-            print(f"Error extracting text from sheet {file_id}: {e}")
-            return ""
+            return {
+                "file_id": file_id,
+                "file_name": file_name,
+                "file_type": file_type,
+                "modified_time": modified_time,
+                "doc_hash": doc_hash.hexdigest(),
+                "chunks": chunks,
+                "sections": sections,
+                # Section is part of the hash so a renamed heading refreshes chunk metadata
+                "hashes": [self._content_hash(f"{section}\n{chunk}") for section, chunk in zip(sections, chunks)]
+            }
     
-    def index_document(self, file_id: str, file_name: str, file_type: str, force_reindex: bool = False):
+    def _plan_document(self, fetched: Dict[str, Any], force_reindex: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Diff a fetched document against the chunks already stored for it.
+        
+        Returns:
+            Write plan listing changed, to-embed and stale chunks, or None if the
+            document content is unchanged
+        """
+        file_id = fetched["file_id"]
+        file_name = fetched["file_name"]
+        chunks = fetched["chunks"]
+        hashes = fetched["hashes"]
+        
+        # Skip the chunk diff entirely when the document text is unchanged, unless (when sharding
+        # by folder) the file moved and its chunks must move to the new folder's shard
+        existing_entry = self.manifest.get(file_id) or {}
+        moved = "top_folder" in fetched and existing_entry.get('top_folder') != fetched["top_folder"]
+        if (not force_reindex and existing_entry.get('content_hash') == fetched["doc_hash"]
+                and existing_entry.get('file_name') == file_name and not moved):
+            self.manifest.update_modified_time(file_id, fetched["modified_time"])
+            print(f"Document {file_name} content unchanged, skipping.")
+            return None
+        
+        ids = [f"{file_id}_chunk_{i}" for i in range(len(chunks))]
+        
+        # Diff against the chunks already stored for this document
+        existing = self._get_existing_chunks(file_id)
+        reusable_embeddings = {
+            chunk["content_hash"]: chunk["embedding"]
+            for chunk in existing.values()
+            if chunk["content_hash"] and chunk["embedding"] is not None
+        }
+        
+        changed = [
+            i for i in range(len(chunks))
+            if existing.get(ids[i], {}).get("content_hash") != hashes[i]
+            or existing[ids[i]].get("file_name") != file_name
+            # Chunks written before numeric timestamps existed get their metadata rewritten
+            or existing[ids[i]].get("indexed_ts") is None
+            # Re-upserting with the new folder moves the chunk to that folder's shard
+            or ("top_folder" in fetched and existing[ids[i]].get("top_folder") != fetched["top_folder"])
+        ]
+        new_ids = set(ids)
+        stale_ids = [chunk_id for chunk_id in existing if chunk_id not in new_ids]
+        
+        # Only embed chunks whose text has never been seen for this document
+        to_embed = []
+        pending_hashes = set()
+        for i in changed:
+            if hashes[i] not in reusable_embeddings and hashes[i] not in pending_hashes:
+                to_embed.append(i)
+                pending_hashes.add(hashes[i])
+        
+        return dict(fetched, ids=ids, changed=changed, stale_ids=stale_ids,
+                    to_embed=to_embed, embeddings=reusable_embeddings)
+    
+    def _encode(self, texts: List[str], batch_size: int = DEFAULT_EMBED_BATCH_SIZE, pool=None) -> List[List[float]]:
+        """Embed texts, optionally using a sentence-transformers multi-process pool."""
+        if not texts:
+            return []
+        with self.metrics.span(INDEX_STAGE_METRIC, stage="embed"):
+            if pool is not None:
+                return self.embedding_model.encode_multi_process(texts, pool, batch_size=batch_size).tolist()
+            return self.embedding_model.encode(texts, batch_size=batch_size).tolist()
+    
+    def _write_document(self, plan: Dict[str, Any], new_embeddings: List[List[float]]):
+        """Upsert changed chunks, delete stale ones and update the index tracking file."""
+        file_id = plan["file_id"]
+        file_name = plan["file_name"]
+        file_type = plan["file_type"]
+        chunks = plan["chunks"]
+        hashes = plan["hashes"]
+        changed = plan["changed"]
+        embeddings = plan["embeddings"]
+        
+        for i, embedding in zip(plan["to_embed"], new_embeddings):
+            embeddings[hashes[i]] = embedding
+        
+        # Only recorded when sharding by folder (it costs Drive lookups)
+        top_folder = {"top_folder": plan["top_folder"]} if plan.get("top_folder") is not None else {}
+        
+        if changed:
+            now = datetime.now(timezone.utc)
+            indexed_at = now.replace(tzinfo=None).isoformat()
+            self.collection.upsert(
+                embeddings=[embeddings[hashes[i]] for i in changed],
+                documents=[chunks[i] for i in changed],
+                ids=[plan["ids"][i] for i in changed],
+                metadatas=[
+                    dict({
+                        "file_id": file_id,
+                        "file_name": file_name,
+                        "file_type": file_type,
+                        "chunk_index": i,
+                        "section": plan["sections"][i],
+                        "content_hash": hashes[i],
+                        "indexed_at": indexed_at,
+                        # Numeric copy of indexed_at so date ranges can be filtered in Chroma
+                        "indexed_ts": now.timestamp()
+                    }, **top_folder)
+                    for i in changed
+                ]
+            )
+        
+        for i in changed:
+            self.lexical_index.add(plan["ids"][i], f"{plan['sections'][i]}\n{chunks[i]}")
+        
+        if plan["stale_ids"]:
+            self.collection.delete(ids=plan["stale_ids"])
+            self.lexical_index.remove(plan["stale_ids"])
+        
+        if changed or plan["stale_ids"]:
+            self._invalidate_search_cache()
+        
+        # Track in the manifest (single-row upsert)
+        self.manifest.upsert(
+            file_id,
+            file_name,
+            file_type,
+            modified_time=plan["modified_time"],
+            content_hash=plan["doc_hash"],
+            chunks=len(chunks),
+            top_folder=plan.get("top_folder")
+        )
+        
+        print(f"✓ Indexed {file_name} ({len(chunks)} chunks, {len(plan['to_embed'])} embedded, "
+              f"{len(changed) - len(plan['to_embed'])} reused, {len(plan['stale_ids'])} removed)")
+    
+    def index_document(self, file_id: str, file_name: str, file_type: str, force_reindex: bool = False,
+                       modified_time: str = None, parents: List[str] = None, save: bool = True):
         """
         Index a single document from Google Drive.
         
@@ -128,97 +661,169 @@ class KnowledgeBase:
             file_name: Name of the file
             file_type: MIME type of the file
             force_reindex: If True, reindex even if already indexed
+            modified_time: Drive modifiedTime of the file; a changed value triggers a reindex
+            parents: Drive parent folder IDs of the file (saves a lookup when sharding by folder)
+            save: Persist the keyword index (callers indexing many documents save once per batch)
         """
-        # Check if already indexed (unless forcing reindex)
-        if not force_reindex and file_id in self.indexed_files:
-            existing = self.indexed_files[file_id]
-            # Could check modification time here to see if reindex needed
+        # Check if already indexed and unchanged (unless forcing reindex)
+        if not self._should_index(file_id, modified_time, force_reindex, parents):
             print(f"Document {file_name} already indexed. Use force_reindex=True to reindex.")
             return
         
-        print(f"Indexing {file_name} ({file_id})...")
-        
-        # Extract text based on file type
-        text = ""
-        if file_type == 'application/vnd.google-apps.document':
-            text = self._extract_text_from_doc(file_id)
-        elif file_type == 'application/vnd.google-apps.spreadsheet':
-            text = self._extract_text_from_sheet(file_id)
-        else:
-            print(f"Unsupported file type: {file_type}")
+        with self.metrics.span(INDEX_DOCUMENT_METRIC, file_type=file_type):
+            fetched = self._fetch_document(file_id, file_name, file_type, modified_time, parents)
+            if fetched:
+                self._index_prepared(fetched, force_reindex, save)
+    
+    def _index_prepared(self, fetched: Dict[str, Any], force_reindex: bool = False, save: bool = True):
+        """Diff, embed and write a single prepared document, then (if save) persist the keyword index."""
+        with self.metrics.span(INDEX_STAGE_METRIC, stage="diff"):
+            plan = self._plan_document(fetched, force_reindex)
+        if not plan:
             return
         
-        if not text.strip():
-            print(f"No text extracted from {file_name}")
-            return
+        new_embeddings = self._encode([plan["chunks"][i] for i in plan["to_embed"]])
+        with self.metrics.span(INDEX_STAGE_METRIC, stage="write"):
+            self._write_document(plan, new_embeddings)
+            if save:
+                self.lexical_index.save()
+    
+    def index_blocks(self, file_id: str, file_name: str, file_type: str, blocks: List[Dict[str, Any]],
+                     force_reindex: bool = False, modified_time: str = None, save: bool = True):
+        """
+        Index a document that has already been extracted into blocks.
         
-        # Split text into chunks (simple approach - can be improved)
-        chunk_size = 1000
-        chunks = []
-        words = text.split()
-        current_chunk = []
-        current_length = 0
-        
-        for word in words:
-            word_length = len(word) + 1  # +1 for space
-            if current_length + word_length > chunk_size and current_chunk:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_length = word_length
-            else:
-                current_chunk.append(word)
-                current_length += word_length
+        Used for content that doesn't come from Drive (e.g. local fixture corpora);
+        see chunking.py for the block format.
         
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        Args:
+            file_id: Unique document ID
+            file_name: Name of the document
+            file_type: MIME type of the document
+            blocks: Document blocks
+            force_reindex: If True, re-embed even if the content is unchanged
+            modified_time: Optional modification time recorded in the manifest
+            save: Persist the keyword index (callers indexing many documents save once at the end)
+        """
+        fetched = self._prepare_document(file_id, file_name, file_type, blocks, modified_time)
+        if fetched:
+            self._index_prepared(fetched, force_reindex, save)
+    
+    def _list_pages(self, search_query: str, page_token: str = None):
+        """
+        Yield (page_token, files, next_page_token) for each page of a Drive query.
         
-        # Generate embeddings and add to collection
-        if chunks:
-            embeddings = self.embedding_model.encode(chunks).tolist()
-            
-            # Create IDs and metadata
-            ids = [f"{file_id}_chunk_{i}" for i in range(len(chunks))]
-            metadatas = [
-                {
-                    "file_id": file_id,
-                    "file_name": file_name,
-                    "file_type": file_type,
-                    "chunk_index": i,
-                    "indexed_at": datetime.utcnow().isoformat()
-                }
-                for i in range(len(chunks))
-            ]
-            
-            # Add to ChromaDB
-            self.collection.add(
-                embeddings=embeddings,
-                documents=chunks,
-                ids=ids,
-                metadatas=metadatas
-            )
+        Listing errors are raised so the caller can stop with a resumable checkpoint.
+        """
+        drive_service = get_drive_service(self.creds)
+        
+        while True:
+            results = self.rate_limiter.execute("drive", drive_service.files().list(
+                q=search_query,
+                pageSize=100,
+                pageToken=page_token,
+                fields="nextPageToken, files(id, name, mimeType, modifiedTime, parents)"
+            ))
             
-            # Track in indexed files
-            self.indexed_files[file_id] = {
-                "file_name": file_name,
-                "file_type": file_type,
-                "indexed_at": datetime.utcnow().isoformat(),
-                "chunks": len(chunks)
-            }
-            self._save_indexed_files()
+            next_page_token = results.get('nextPageToken')
+            yield page_token, results.get('files', []), next_page_token
             
-            print(f"✓ Indexed {file_name} ({len(chunks)} chunks)")
+            if not next_page_token:
+                return
+            page_token = next_page_token
+    
+    def _crawl_folder(self, folder_id: str, list_workers: int = DEFAULT_LIST_WORKERS):
+        """
+        Yield the Docs and Sheets in a folder and all of its subfolders.
+        
+        The folder tree is walked breadth-first. Up to `list_workers` files.list
+        calls (one page of one folder each) run concurrently, and files are
+        yielded as each page arrives. Files with several parents and folders
+        reached twice are only visited once.
+        """
+        local = threading.local()
+        mime_filter = ' or '.join(f"mimeType='{mime}'" for mime in SUPPORTED_MIME_TYPES + [FOLDER_MIME_TYPE])
+        
+        def list_page(parent_id: str, page_token: str = None) -> Dict[str, Any]:
+            # Drive service objects aren't thread-safe; keep one per lister thread
+            if not hasattr(local, 'drive_service'):
+                local.drive_service = get_drive_service(self.creds)
+            return self.rate_limiter.execute("drive", local.drive_service.files().list(
+                q=f"'{parent_id}' in parents and trashed = false and ({mime_filter})",
+                pageSize=100,
+                pageToken=page_token,
+                fields="nextPageToken, files(id, name, mimeType, modifiedTime, parents)"
+            ))
+        
+        seen_files = set()
+        seen_folders = {folder_id}
+        frontier = deque([(folder_id, None)])  # (folder ID, page token) still to list
+        in_flight = {}
+        
+        with ThreadPoolExecutor(max_workers=list_workers) as executor:
+            while frontier or in_flight:
+                while frontier and len(in_flight) < list_workers:
+                    parent_id, page_token = frontier.popleft()
+                    in_flight[executor.submit(list_page, parent_id, page_token)] = parent_id
+                
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    parent_id = in_flight.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        print(f"Error listing folder {parent_id}: {e}")
+                        continue
+                    
+                    if results.get('nextPageToken'):
+                        frontier.append((parent_id, results['nextPageToken']))
+                    
+                    for file in results.get('files', []):
+                        if file['mimeType'] == FOLDER_MIME_TYPE:
+                            if file['id'] not in seen_folders:
+                                seen_folders.add(file['id'])
+                                frontier.append((file['id'], None))
+                        elif file['id'] not in seen_files:
+                            seen_files.add(file['id'])
+                            yield file
+        
+        print(f"Crawled {len(seen_folders)} folders, found {len(seen_files)} documents")
     
-    def index_folder(self, folder_id: str = None, folder_name: str = "My Drive", query: str = None):
+    def index_folder(self, folder_id: str = None, folder_name: str = "My Drive", query: str = None,
+                     fetch_workers: int = DEFAULT_FETCH_WORKERS, batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+                     multi_process: bool = False, recursive: bool = True,
+                     list_workers: int = DEFAULT_LIST_WORKERS, resume: bool = True,
+                     progress: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
         """
         Index all documents in a folder or matching a query.
         
+        Fetcher threads pull document text concurrently and feed a bounded queue.
+        The calling thread batches chunks across documents and embeds them, so
+        network waits and encoding overlap. Folders are crawled recursively and
+        files are handed to the fetchers as soon as they are listed.
+        
+        Paged listings (everything except recursive folder crawls) are
+        checkpointed: the page token of the earliest unfinished page and the last
+        processed file are saved as the run progresses, and an interrupted run
+        resumes from that page. Files already indexed are skipped in any case.
+        
         Args:
             folder_id: Google Drive folder ID (if None, searches all files)
             folder_name: Name for logging
             query: Optional Drive search query
-        """
-        drive_service = get_drive_service(self.creds)
+            fetch_workers: Number of concurrent document fetchers
+            batch_size: Number of chunks to embed per encoder batch
+            multi_process: If True, embed with a multi-process pool (for large backfills)
+            recursive: If True, also index documents in subfolders of folder_id
+            list_workers: Number of concurrent files.list calls while crawling folders
+            resume: If True, continue from a saved checkpoint of the same run
+            progress: Optional callback receiving progress events (dicts with counts and rates)
         
+        Returns:
+            Indexing statistics (documents, chunks, embedded chunks, elapsed seconds,
+            rates and per-API call/retry counts for the process; "error" is set if
+            listing failed and the run can be resumed)
+        """
         # Build search query
         if folder_id:
             search_query = f"'{folder_id}' in parents"
@@ -226,95 +831,907 @@ class KnowledgeBase:
             search_query = query
         else:
             # Default: search for Docs and Sheets
-            search_query = "(mimeType='application/vnd.google-apps.document' or mimeType='application/vnd.google-apps.spreadsheet')"
+            search_query = f"(mimeType='{DOC_MIME_TYPE}' or mimeType='{SHEET_MIME_TYPE}')"
+        
+        crawl = bool(folder_id and recursive)
+        checkpoint = None
+        start_token = None
+        if not crawl:
+            checkpoint = IndexCheckpoint(self.checkpoint_file, search_query)
+            if resume and checkpoint.saved:
+                start_token = checkpoint.resume_token
+                last = checkpoint.last_file or {}
+                print(f"Resuming from checkpoint ({checkpoint.files_done} files done, last: {last.get('name', 'none')})")
+            elif checkpoint.saved:
+                checkpoint.clear()
         
         print(f"Searching for files in {folder_name}...")
         
-        page_token = None
-        total_indexed = 0
+        start_time = time.time()
+        work_queue = queue.Queue(maxsize=fetch_workers * 4)
+        done = object()
+        stats = {"documents": 0, "chunks": 0, "embedded": 0, "skipped": 0, "failed": 0, "listed": 0}
+        stats_lock = threading.Lock()
+        listing_error = []
         
-        while True:
+        def emit(event: str, **fields):
+            if progress is None:
+                return
+            elapsed = time.time() - start_time
+            with stats_lock:
+                payload = dict(stats)
+            payload.update(
+                event=event,
+                elapsed_seconds=round(elapsed, 3),
+                docs_per_second=round(payload["documents"] / elapsed, 3) if elapsed > 0 else 0.0,
+                chunks_per_second=round(payload["chunks"] / elapsed, 3) if elapsed > 0 else 0.0,
+                **fields
+            )
+            progress(payload)
+        
+        def finish(file_id: str, file_name: str, status: str):
+            """Record a finished file (indexed, skipped or failed) in the stats and checkpoint."""
+            with stats_lock:
+                if status != "indexed":
+                    stats[status] += 1
+            # Failed files pin the checkpoint so a resumed run retries them
+            if checkpoint is not None and status != "failed":
+                checkpoint.file_done(file_id, file_name)
+            emit("document", file_id=file_id, file_name=file_name, status=status)
+        
+        def fetch(file: Dict[str, Any]):
             try:
-                results = drive_service.files().list(
-                    q=search_query,
-                    pageSize=100,
-                    pageToken=page_token,
-                    fields="nextPageToken, files(id, name, mimeType, modifiedTime)"
-                ).execute()
-                
-                files = results.get('files', [])
+                fetched = self._fetch_document(file['id'], file['name'], file['mimeType'], file.get('modifiedTime'),
+                                               file.get('parents'))
+            except Exception as e:
+                print(f"Error indexing {file['name']}: {e}")
+                finish(file['id'], file['name'], "failed")
+                return
+            if fetched:
+                work_queue.put(fetched)
+            else:
+                finish(file['id'], file['name'], "skipped")
+        
+        def submit(executor, file: Dict[str, Any]):
+            # Only index Docs and Sheets that are new or changed
+            if file['mimeType'] not in SUPPORTED_MIME_TYPES:
+                finish(file['id'], file['name'], "skipped")
+                return
+            if not self._should_index(file['id'], file.get('modifiedTime'), parents=file.get('parents')):
+                print(f"Document {file['name']} already indexed. Use force_reindex=True to reindex.")
+                finish(file['id'], file['name'], "skipped")
+                return
+            executor.submit(fetch, file)
+        
+        def list_and_fetch():
+            try:
+                with ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+                    if crawl:
+                        for file in self._crawl_folder(folder_id, list_workers):
+                            with stats_lock:
+                                stats["listed"] += 1
+                            submit(executor, file)
+                    else:
+                        for page_token, files, next_page_token in self._list_pages(search_query, start_token):
+                            checkpoint.page_listed(page_token, [file['id'] for file in files], next_page_token)
+                            with stats_lock:
+                                stats["listed"] += len(files)
+                            emit("page", files=len(files))
+                            for file in files:
+                                submit(executor, file)
+            except Exception as e:
+                print(f"Error listing files: {e}")
+                listing_error.append(e)
+            finally:
+                work_queue.put(done)
+        
+        pending = []
+        
+        def flush():
+            """Embed all pending documents in one batch and write them."""
+            texts = [plan["chunks"][i] for plan in pending for i in plan["to_embed"]]
+            try:
+                new_embeddings = self._encode(texts, batch_size=batch_size, pool=pool)
+            except Exception as e:
+                print(f"Error embedding batch: {e}")
+                for plan in pending:
+                    finish(plan["file_id"], plan["file_name"], "failed")
+                pending.clear()
+                return
+            
+            offset = 0
+            for plan in pending:
+                count = len(plan["to_embed"])
+                try:
+                    with self.metrics.span(INDEX_STAGE_METRIC, stage="write"):
+                        self._write_document(plan, new_embeddings[offset:offset + count])
+                except Exception as e:
+                    print(f"Error indexing {plan['file_name']}: {e}")
+                    finish(plan["file_id"], plan["file_name"], "failed")
+                else:
+                    with stats_lock:
+                        stats["documents"] += 1
+                        stats["chunks"] += len(plan["chunks"])
+                        stats["embedded"] += count
+                    finish(plan["file_id"], plan["file_name"], "indexed")
+                offset += count
+            pending.clear()
+        
+        emit("start", query=search_query, resumed_from=start_token)
+        pool = self.embedding_model.start_multi_process_pool() if multi_process else None
+        lister = threading.Thread(target=list_and_fetch, daemon=True)
+        lister.start()
+        
+        try:
+            while True:
+                try:
+                    # Don't hold a partial batch while fetchers are waiting on the network
+                    item = work_queue.get(timeout=0.5) if pending else work_queue.get()
+                except queue.Empty:
+                    flush()
+                    continue
                 
-                if not files:
+                if item is done:
                     break
                 
-                for file in files:
-                    file_id = file['id']
-                    file_name = file['name']
-                    file_type = file['mimeType']
-                    
-                    # Only index Docs and Sheets
-                    if file_type in ['application/vnd.google-apps.document', 'application/vnd.google-apps.spreadsheet']:
-                        try:
-                            self.index_document(file_id, file_name, file_type)
-                            total_indexed += 1
-                        except Exception as e:
-                            print(f"Error indexing {file_name}: {e}")
+                try:
+                    with self.metrics.span(INDEX_STAGE_METRIC, stage="diff"):
+                        plan = self._plan_document(item)
+                except Exception as e:
+                    print(f"Error indexing {item['file_name']}: {e}")
+                    finish(item["file_id"], item["file_name"], "failed")
+                    continue
                 
-                page_token = results.get('nextPageToken')
-                if not page_token:
-                    break
+                if plan:
+                    pending.append(plan)
+                    if sum(len(p["to_embed"]) for p in pending) >= batch_size:
+                        flush()
+                else:
+                    finish(item["file_id"], item["file_name"], "skipped")
+            
+            if pending:
+                flush()
+        finally:
+            if pool is not None:
+                self.embedding_model.stop_multi_process_pool(pool)
+            self.lexical_index.save()
+        
+        lister.join()
+        
+        elapsed = time.time() - start_time
+        stats["elapsed_seconds"] = elapsed
+        stats["docs_per_second"] = stats["documents"] / elapsed if elapsed > 0 else 0.0
+        stats["chunks_per_second"] = stats["chunks"] / elapsed if elapsed > 0 else 0.0
+        stats["api"] = self.rate_limiter.stats()
+        
+        if listing_error:
+            stats["error"] = str(listing_error[0])
+            if checkpoint is not None:
+                checkpoint.save()
+                stats["checkpoint"] = checkpoint.summary()
+            emit("error", message=stats["error"], checkpoint=stats.get("checkpoint"))
+            print(f"Indexing stopped after {stats['documents']} documents: {stats['error']}")
+            if checkpoint is not None:
+                print("Run the same command again to resume from the checkpoint.")
+            return stats
+        
+        if checkpoint is not None:
+            checkpoint.clear()
+        emit("complete")
+        print(f"✓ Indexing complete. Total documents indexed: {stats['documents']}")
+        return stats
+    
+    def index_changes(self, progress: Callable[[Dict[str, Any]], None] = None) -> Dict[str, Any]:
+        """
+        Incrementally update the knowledge base from the Drive changes feed.
+        
+        Only files added, modified or trashed since the last run are processed.
+        On the first run (no saved token) a full index is performed and the
+        changes feed is anchored at the token captured before the crawl. The
+        feed position is saved after every page, so an interrupted update
+        resumes where it stopped.
+        
+        Args:
+            progress: Optional callback receiving progress events (dicts with counts)
+        
+        Returns:
+            Update statistics (documents updated, removed and failed)
+        """
+        drive_service = get_drive_service(self.creds)
+        page_token = self._load_changes_token()
+        
+        if not page_token:
+            print("No saved changes token - running a full index first...")
+            # Reuse the anchor of an interrupted first run so no changes are missed
+            start_token = self._load_changes_token(pending=True)
+            if not start_token:
+                start_token = self.rate_limiter.execute(
+                    "drive", drive_service.changes().getStartPageToken()
+                ).get('startPageToken')
+                self._save_changes_token(start_token, pending=True)
+            stats = self.index_folder(progress=progress)
+            if "error" not in stats:
+                self._save_changes_token(start_token)
+            return stats
+        
+        print("Checking Drive for changes since last run...")
+        
+        stats = {"updated": 0, "removed": 0, "failed": 0}
+        start_time = time.time()
+        
+        def emit(event: str, **fields):
+            if progress is not None:
+                progress(dict(stats, event=event, elapsed_seconds=round(time.time() - start_time, 3), **fields))
+        
+        emit("start")
+        while page_token:
+            results = self.rate_limiter.execute("drive", drive_service.changes().list(
+                pageToken=page_token,
+                pageSize=100,
+                spaces='drive',
+                includeRemoved=True,
+                fields="nextPageToken, newStartPageToken, changes(fileId, removed, file(id, name, mimeType, modifiedTime, trashed, parents))"
+            ))
+            
+            # Only removals of indexed files and changes to Docs and Sheets need work
+            actionable = []
+            for change in results.get('changes', []):
+                file = change.get('file') or {}
+                if change.get('removed') or file.get('trashed'):
+                    if change.get('fileId') in self.manifest:
+                        actionable.append(change)
+                elif file.get('mimeType') in SUPPORTED_MIME_TYPES:
+                    actionable.append(change)
+            emit("page", changes=len(results.get('changes', [])), pending=len(actionable))
+            
+            # The keyword index is saved once per page, before the feed position is checkpointed
+            try:
+                for change in actionable:
+                    file_id = change.get('fileId')
+                    file = change.get('file') or {}
+                    file_name = file.get('name', file_id)
                     
-            except Exception as e:
-                print(f"Error during indexing: {e}")
+                    if change.get('removed') or file.get('trashed'):
+                        self.remove_document(file_id, save=False)
+                        stats["removed"] += 1
+                        emit("document", file_id=file_id, file_name=file_name, status="removed")
+                        continue
+                    
+                    try:
+                        self.index_document(file_id, file['name'], file['mimeType'], modified_time=file.get('modifiedTime'),
+                                            parents=file.get('parents'), save=False)
+                        stats["updated"] += 1
+                        emit("document", file_id=file_id, file_name=file_name, status="updated",
+                             modified_time=file.get('modifiedTime'))
+                    except Exception as e:
+                        print(f"Error indexing {file_name}: {e}")
+                        stats["failed"] += 1
+                        emit("document", file_id=file_id, file_name=file_name, status="failed")
+            finally:
+                self.lexical_index.save()
+            
+            if results.get('newStartPageToken'):
+                # End of the feed - persist the token for the next run
+                self._save_changes_token(results['newStartPageToken'])
                 break
+            page_token = results.get('nextPageToken')
+            # Checkpoint the feed position so an interrupted update resumes here
+            self._save_changes_token(page_token)
         
-        print(f"✓ Indexing complete. Total documents indexed: {total_indexed}")
+        emit("complete")
+        print(f"✓ Incremental update complete. Documents updated: {stats['updated']}, removed: {stats['removed']}")
+        return stats
+    
+    @staticmethod
+    def _normalize_query(query: str) -> str:
+        """Normalize a query for cache lookups (case and whitespace insensitive)."""
+        return ' '.join(query.lower().split())
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """Embed a search query, reusing a cached embedding when available."""
+        key = self._normalize_query(query)
+        query_embedding = self._query_embedding_cache.get(key)
+        if query_embedding is None:
+            query_embedding = self.embedding_model.encode([query]).tolist()[0]
+            self._query_embedding_cache.set(key, query_embedding)
+        return query_embedding
+    
+    def rebuild_lexical_index(self, page_size: int = 1000):
+        """Rebuild the BM25 index from the chunks stored in the collection."""
+        print("Building keyword index from the collection...")
+        self.lexical_index.clear()
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            ids = page.get('ids') or []
+            if not ids:
+                break
+            for chunk_id, document, metadata in zip(ids, page['documents'], page['metadatas']):
+                self.lexical_index.add(chunk_id, f"{(metadata or {}).get('section', '')}\n{document}")
+            offset += len(ids)
+        self.lexical_index.save()
+        print(f"✓ Keyword index built ({len(self.lexical_index)} chunks)")
+    
+    def _format_result(self, document: str, metadata: Dict[str, Any], distance: float = None,
+                       score: float = None) -> Dict[str, Any]:
+        """Format a stored chunk as a search result."""
+        metadata = metadata or {}
+        return {
+            "content": document,
+            "file_name": metadata.get('file_name', 'Unknown'),
+            "file_id": metadata.get('file_id', ''),
+            "file_type": metadata.get('file_type', ''),
+            "section": metadata.get('section', ''),
+            "distance": distance,
+            "score": score,
+            "relevance": None
+        }
+    
+    @staticmethod
+    def _to_timestamp(value: str) -> float:
+        """Convert an ISO date or datetime string (UTC if no offset) to a POSIX timestamp."""
+        parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    
+    @classmethod
+    def _upper_bound(cls, value: str) -> Dict[str, float]:
+        """Filter for "on or before value": a date-only value includes the whole day (UTC)."""
+        try:
+            day = date.fromisoformat(value.strip())
+        except ValueError:
+            return {"$lte": cls._to_timestamp(value)}
+        next_day = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+        return {"$lt": next_day.timestamp()}
     
-    def search(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
+    def _build_where(self, file_id=None, file_type=None, indexed_after: str = None,
+                     indexed_before: str = None, top_folder=None) -> Optional[Dict[str, Any]]:
+        """
+        Build a Chroma metadata filter from search filters.
+        
+        Args:
+            file_id: A Drive file ID or list of IDs
+            file_type: A MIME type or list of MIME types
+            indexed_after: Only chunks indexed on or after this ISO date/datetime
+            indexed_before: Only chunks indexed on or before this ISO date/datetime
+            top_folder: A top-level Drive folder ID or list of IDs (recorded when sharding by folder)
+        
+        Returns:
+            Chroma `where` filter, or None if no filters were given
+        """
+        conditions = []
+        for key, value in (("file_id", file_id), ("file_type", file_type), ("top_folder", top_folder)):
+            if isinstance(value, (list, tuple, set)):
+                conditions.append({key: {"$in": list(value)}})
+            elif value:
+                conditions.append({key: value})
+        if indexed_after:
+            conditions.append({"indexed_ts": {"$gte": self._to_timestamp(indexed_after)}})
+        if indexed_before:
+            conditions.append({"indexed_ts": self._upper_bound(indexed_before)})
+        
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+    
+    def _current_snapshot(self):
+        """Open the exported snapshot (reopening it after a new export); None if there is none or it doesn't fit."""
+        try:
+            stat = (self.snapshot_dir / "snapshot.json").stat()
+        except FileNotFoundError:
+            self._snapshot = None
+            self._snapshot_mtime = None
+            return None
+        with self._snapshot_lock:
+            # Keyed on the export's stat, so a rejected snapshot stays rejected until the next export
+            if self._snapshot_mtime != (stat.st_ino, stat.st_mtime_ns):
+                self._snapshot = None
+                self._snapshot_mtime = (stat.st_ino, stat.st_mtime_ns)
+                try:
+                    snapshot = EmbeddingSnapshot(self.snapshot_dir)
+                except (OSError, ValueError) as e:
+                    print(f"Ignoring embedding snapshot: {e}")
+                    return None
+                if snapshot.info.get("model_name") not in (None, self.embedding_model.model_name):
+                    print(f"Ignoring embedding snapshot made with {snapshot.info['model_name']}")
+                    return None
+                self._snapshot = snapshot
+            return self._snapshot
+    
+    def _search_collection(self):
+        """
+        Collection that searches read from.
+        
+        The memory-mapped snapshot is used while it matches the manifest (no
+        document indexed or removed since the export); otherwise searches fall
+        back to Chroma, so results are never stale.
+        """
+        if self.use_snapshot:
+            snapshot = self._current_snapshot()
+            if snapshot is not None and snapshot.fingerprint == self.manifest.fingerprint():
+                return snapshot
+        return self.collection
+    
+    def _vector_search(self, query: str, n_results: int, where: Dict[str, Any], collection,
+                       trace: Trace) -> Dict[str, Dict[str, Any]]:
+        """Run a dense vector query; returns results keyed by chunk ID in rank order."""
+        with trace.span("encode"):
+            query_embedding = self._embed_query(query)
+        
+        query_args = {"where": where} if where else {}
+        with trace.span("query"):
+            results = collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                **query_args
+            )
+        
+        hits = {}
+        with trace.span("format"):
+            if results['documents'] and len(results['documents'][0]) > 0:
+                for i, chunk_id in enumerate(results['ids'][0]):
+                    hits[chunk_id] = self._format_result(
+                        results['documents'][0][i],
+                        results['metadatas'][0][i],
+                        distance=results['distances'][0][i] if results.get('distances') else None
+                    )
+        return hits
+    
+    def _rerank(self, query: str, results: List[Dict[str, Any]], n_results: int,
+                min_relevance: float) -> List[Dict[str, Any]]:
+        """Re-score candidates with the cross-encoder and keep the best ones above min_relevance."""
+        if not results:
+            return results
+        passages = [
+            f"{result['section']}\n{result['content']}" if result.get('section') else result['content']
+            for result in results
+        ]
+        for result, relevance in zip(results, self.reranker.score(query, passages)):
+            result["relevance"] = relevance
+        ranked = sorted(results, key=lambda result: result["relevance"], reverse=True)
+        return [result for result in ranked if result["relevance"] >= min_relevance][:n_results]
+    
+    def search(self, query: str, n_results: int = 5, mode: str = "hybrid", file_id=None, file_type=None,
+               indexed_after: str = None, indexed_before: str = None, top_folder=None, rerank: bool = None,
+               rerank_candidates: int = DEFAULT_RERANK_CANDIDATES,
+               min_relevance: float = DEFAULT_RERANK_MIN_SCORE) -> List[Dict[str, Any]]:
         """
         Search the knowledge base.
         
+        Hybrid mode over-fetches candidates from both the vector collection and
+        the BM25 keyword index and fuses the two rankings with reciprocal rank
+        fusion, so exact names and SKUs are found alongside semantic matches.
+        
+        Filters are pushed down into Chroma as a `where` clause (and restrict the
+        keyword candidates), so only matching chunks are ranked. When the
+        collection is sharded, a file_type or top_folder filter on the shard key
+        only queries the matching shards.
+        
+        If an embedding snapshot has been exported and no document has changed
+        since, candidates are read from the memory-mapped snapshot instead of
+        Chroma (see export_snapshot).
+        
+        With re-ranking, up to `rerank_candidates` candidates are fetched,
+        re-scored by a local cross-encoder, and only results with a relevance of
+        at least `min_relevance` are returned (possibly fewer than n_results).
+        
+        Results are cached per normalized query, n_results, mode, filters and
+        re-ranking settings until the TTL expires or the collection changes.
+        
+        Every search is timed by stage (encode, query, format, rerank) into the
+        kb_search metrics, and searches slower than KB_SLOW_QUERY_MS are sampled
+        into slow_queries.jsonl in the persist directory.
+        
         Args:
             query: Search query
             n_results: Number of results to return
+            mode: "hybrid" (default), "vector" or "lexical"
+            file_id: Restrict to a Drive file ID or list of IDs
+            file_type: Restrict to a MIME type or list of MIME types
+            indexed_after: Only chunks indexed on or after this ISO date/datetime
+            indexed_before: Only chunks indexed on or before this ISO date/datetime
+            top_folder: Restrict to a top-level Drive folder ID or list of IDs (requires folder sharding)
+            rerank: Re-rank candidates with the cross-encoder (defaults to the knowledge base setting)
+            rerank_candidates: Maximum candidates to re-rank (at least n_results)
+            min_relevance: Minimum cross-encoder relevance (0-1) for a re-ranked result
             
         Returns:
             List of results with document chunks and metadata
         """
-        if self.collection.count() == 0:
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}")
+        
+        where = self._build_where(file_id, file_type, indexed_after, indexed_before, top_folder)
+        rerank = self.rerank if rerank is None else rerank
+        
+        trace = self.metrics.trace(SEARCH_TRACE, mode=mode)
+        results = self._traced_search(trace, query, n_results, mode, where, rerank, rerank_candidates, min_relevance)
+        total_ms = trace.finish(rerank=rerank) * 1000
+        self.slow_query_log.maybe_log(total_ms, {
+            "query": query[:200],
+            "mode": mode,
+            "where": where,
+            "n_results": n_results,
+            "rerank": rerank,
+            "results": len(results),
+            "backend": trace.labels.get("backend"),
+            "cache": trace.labels.get("cache"),
+            "stages_ms": trace.timings_ms(),
+        })
+        return results
+    
+    def _traced_search(self, trace: Trace, query: str, n_results: int, mode: str, where: Dict[str, Any],
+                       rerank: bool, rerank_candidates: int, min_relevance: float) -> List[Dict[str, Any]]:
+        """Run a search (see search), timing each stage into trace."""
+        # _build_where only filters on columns the snapshot stores (snapshot.FILTER_COLUMNS), so
+        # either backend can serve any search; Chroma is only opened when the snapshot isn't used
+        with trace.span("query"):
+            collection = self._search_collection()
+            count = collection.count()
+        trace.labels["backend"] = "snapshot" if collection is self._snapshot else "chroma"
+        if count == 0:
             return []
         
-        # Generate embedding for query
-        query_embedding = self.embedding_model.encode([query]).tolist()[0]
+        # Re-ranking over-fetches a capped candidate set from the first stage
+        fetch_n = max(n_results, rerank_candidates) if rerank else n_results
+        rerank_key = (rerank_candidates, min_relevance) if rerank else None
+        
+        # The chunk count and manifest fingerprint guard against writes made by another process
+        # (e.g. the indexer), including edits that leave the chunk count unchanged
+        version = (count, self.manifest.fingerprint())
+        cache_key = (self._normalize_query(query), n_results, mode, json.dumps(where, sort_keys=True), rerank_key)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None and cached[0] == version:
+            trace.labels["cache"] = "hit"
+            return [dict(result) for result in cached[1]]
+        trace.labels["cache"] = "miss"
+        
+        if mode != "vector":
+            with trace.span("query"):
+                self.lexical_index.refresh()
+                if len(self.lexical_index) == 0:
+                    # Collections indexed before the keyword index existed
+                    self.rebuild_lexical_index()
+        
+        if mode == "vector":
+            formatted_results = list(self._vector_search(query, fetch_n, where, collection, trace).values())
+        else:
+            candidates = fetch_n * HYBRID_CANDIDATE_MULTIPLIER if mode == "hybrid" else fetch_n
+            allowed_ids = None
+            if where:
+                with trace.span("query"):
+                    allowed_ids = collection.get(where=where, include=[])['ids']
+                if not allowed_ids:
+                    self._search_cache.set(cache_key, (version, []))
+                    return []
+            with trace.span("query"):
+                lexical_hits = self.lexical_index.search(query, candidates, allowed_ids=allowed_ids)
+            
+            if mode == "hybrid":
+                available = len(allowed_ids) if allowed_ids is not None else count
+                vector_hits = self._vector_search(query, min(candidates, available), where, collection, trace)
+                lexical_ranking = [chunk_id for chunk_id, _ in lexical_hits]
+                with trace.span("format"):
+                    fused = reciprocal_rank_fusion([list(vector_hits.keys()), lexical_ranking])[:fetch_n]
+            else:
+                vector_hits = {}
+                fused = lexical_hits
+            
+            # Keyword-only hits aren't in the vector results; fetch them from the collection
+            missing = [chunk_id for chunk_id, _ in fused if chunk_id not in vector_hits]
+            if missing:
+                with trace.span("query"):
+                    fetched = collection.get(ids=missing, include=["documents", "metadatas"])
+                with trace.span("format"):
+                    for chunk_id, document, metadata in zip(fetched['ids'], fetched['documents'],
+                                                            fetched['metadatas']):
+                        vector_hits[chunk_id] = self._format_result(document, metadata)
+            
+            with trace.span("format"):
+                formatted_results = []
+                for chunk_id, score in fused:
+                    if chunk_id in vector_hits:
+                        result = vector_hits[chunk_id]
+                        result["score"] = score
+                        formatted_results.append(result)
+        
+        if rerank:
+            with trace.span("rerank"):
+                formatted_results = self._rerank(query, formatted_results, n_results, min_relevance)
         
-        # Search in ChromaDB
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=n_results
+        self._search_cache.set(cache_key, (version, formatted_results))
+        return [dict(result) for result in formatted_results]
+    
+    def _get_search_executor(self) -> ThreadPoolExecutor:
+        """Return the bounded executor used by asearch, creating it on first use."""
+        if self._search_executor is None:
+            with self._search_executor_lock:
+                if self._search_executor is None:
+                    self._search_executor = ThreadPoolExecutor(
+                        max_workers=ASYNC_SEARCH_WORKERS,
+                        thread_name_prefix="kb-search"
+                    )
+        return self._search_executor
+    
+    async def asearch(self, query: str, n_results: int = 5, **kwargs) -> List[Dict[str, Any]]:
+        """
+        Async version of search.
+        
+        Query encoding and the Chroma/BM25 lookups run on a bounded thread pool,
+        so several searches (and other async tools) can proceed concurrently.
+        Accepts the same arguments as search.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_search_executor(),
+            functools.partial(self.search, query, n_results, **kwargs)
         )
+    
+    def _iter_collection(self, include: List[str], collection=None, page_size: int = MAINTENANCE_PAGE_SIZE):
+        """Yield pages of every chunk in the collection."""
+        collection = collection if collection is not None else self.collection
+        offset = 0
+        while True:
+            page = collection.get(include=include, limit=page_size, offset=offset)
+            if not page.get('ids'):
+                return
+            yield page
+            offset += len(page['ids'])
+    
+    def _drive_file_exists(self, drive_service, file_id: str) -> bool:
+        """True unless Drive reports the file as missing or trashed (other errors count as present)."""
+        try:
+            file = self.rate_limiter.execute("drive", drive_service.files().get(fileId=file_id, fields="id, trashed"))
+        except Exception as e:
+            status = getattr(getattr(e, 'resp', None), 'status', None)
+            if status == 404:
+                return False
+            print(f"Could not check {file_id} in Drive ({e}); keeping it")
+            return True
+        return not file.get('trashed')
+    
+    def sweep_orphans(self, check_drive: bool = True) -> Dict[str, int]:
+        """
+        Remove chunks that no longer belong to an indexed Drive document.
+        
+        Deletes chunks whose file_id isn't in the manifest, documents that were
+        deleted or trashed in Drive (if check_drive), and keyword index entries
+        without a chunk in the collection.
+        
+        Returns:
+            Counts of removed chunks, documents and keyword index entries
+        """
+        print("Sweeping orphaned chunks...")
+        known = set(self.manifest.file_ids())
+        chunk_ids = set()
+        orphan_ids = []
+        for page in self._iter_collection(include=["metadatas"]):
+            for chunk_id, metadata in zip(page['ids'], page['metadatas']):
+                chunk_ids.add(chunk_id)
+                if (metadata or {}).get('file_id') not in known:
+                    orphan_ids.append(chunk_id)
+        
+        for start in range(0, len(orphan_ids), MAINTENANCE_PAGE_SIZE):
+            batch = orphan_ids[start:start + MAINTENANCE_PAGE_SIZE]
+            self.collection.delete(ids=batch)
+            self.lexical_index.remove(batch)
         
-        # Format results
-        formatted_results = []
-        if results['documents'] and len(results['documents'][0]) > 0:
-            for i in range(len(results['documents'][0])):
-                formatted_results.append({
-                    "content": results['documents'][0][i],
-                    "file_name": results['metadatas'][0][i].get('file_name', 'Unknown'),
-                    "file_id": results['metadatas'][0][i].get('file_id', ''),
-                    "file_type": results['metadatas'][0][i].get('file_type', ''),
-                    "distance": results['distances'][0][i] if results.get('distances') else None
-                })
+        removed_documents = 0
+        if check_drive:
+            drive_service = get_drive_service(self.creds)
+            for file_id in known:
+                if not self._drive_file_exists(drive_service, file_id):
+                    entry = self.manifest.get(file_id) or {}
+                    print(f"  {entry.get('file_name', file_id)} is no longer in Drive")
+                    self.remove_document(file_id, save=False)
+                    removed_documents += 1
         
-        return formatted_results
+        stale_keywords = [chunk_id for chunk_id in self.lexical_index.ids() if chunk_id not in chunk_ids]
+        self.lexical_index.remove(stale_keywords)
+        self.lexical_index.save()
+        self._invalidate_search_cache()
+        
+        stats = {
+            "orphan_chunks": len(orphan_ids),
+            "removed_documents": removed_documents,
+            "stale_keyword_entries": len(stale_keywords)
+        }
+        print(f"✓ Sweep complete. Removed {stats['orphan_chunks']} orphaned chunks, "
+              f"{removed_documents} deleted documents, {len(stale_keywords)} stale keyword entries")
+        return stats
+    
+    def _layout_collection_names(self, name: str) -> List[str]:
+        """Names of the collection or shard collections stored under a base name."""
+        return [existing for existing in collection_names(self.client) if is_layout_member(existing, name)]
+    
+    def _rebuild_collection(self, shard_by: str) -> int:
+        """
+        Copy every chunk into freshly created collections for a layout and swap them in.
+        
+        The copy is written under a temporary name and verified before the old
+        collections are deleted, so an interrupted rebuild leaves the original intact.
+        
+        Returns:
+            Number of chunks copied
+        """
+        temp_name = f"{COLLECTION_NAME}_rebuild"
+        for name in self._layout_collection_names(temp_name):
+            self.client.delete_collection(name)  # leftovers from an interrupted rebuild
+        target = self._open_collection(shard_by, name=temp_name)
+        
+        top_folders = {}
+        copied = 0
+        for page in self._iter_collection(include=["embeddings", "documents", "metadatas"]):
+            metadatas = [dict(metadata or {}) for metadata in page['metadatas']]
+            if shard_by == "folder":
+                for metadata in metadatas:
+                    file_id = metadata.get('file_id', '')
+                    if file_id not in top_folders:
+                        try:
+                            top_folders[file_id] = self._top_level_folder(file_id)
+                        except Exception as e:
+                            print(f"Could not resolve the folder of {file_id}: {e}")
+                            top_folders[file_id] = ""
+                    metadata['top_folder'] = top_folders[file_id]
+            target.upsert(
+                ids=page['ids'],
+                embeddings=[list(embedding) for embedding in page['embeddings']],
+                documents=page['documents'],
+                metadatas=metadatas
+            )
+            copied += len(page['ids'])
+            print(f"  Copied {copied} chunks...")
+        
+        if target.count() != self.collection.count():
+            raise RuntimeError("Rebuilt collection doesn't match the original; original left unchanged")
+        
+        for name in self._layout_collection_names(COLLECTION_NAME):
+            self.client.delete_collection(name)
+        for name in self._layout_collection_names(temp_name):
+            self.client.get_collection(name).modify(name=COLLECTION_NAME + name[len(temp_name):])
+        
+        if shard_by == "folder":
+            self.manifest.update_top_folders(top_folders)
+        self.shard_by = shard_by
+        self._save_layout(shard_by)
+        self.collection = self._open_collection(shard_by)
+        self._invalidate_search_cache()
+        return copied
+    
+    def compact_collection(self) -> Dict[str, Any]:
+        """
+        Rebuild the collection to reclaim space left by deleted and replaced chunks.
+        
+        Returns:
+            Chunks copied and on-disk size before and after
+        """
+        size_before = self._disk_size()
+        print(f"Compacting the collection ({self.collection.count()} chunks)...")
+        copied = self._rebuild_collection(self.shard_by)
+        
+        # Reclaim free pages in Chroma's SQLite store
+        chroma_db = self.persist_directory / "chroma.sqlite3"
+        if chroma_db.exists():
+            try:
+                conn = sqlite3.connect(str(chroma_db))
+                conn.execute("VACUUM")
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Could not vacuum {chroma_db.name}: {e}")
+        
+        stats = {"chunks": copied, "bytes_before": size_before, "bytes_after": self._disk_size()}
+        print(f"✓ Compaction complete. {copied} chunks, "
+              f"{stats['bytes_before'] / 1024 / 1024:.1f} MB -> {stats['bytes_after'] / 1024 / 1024:.1f} MB")
+        return stats
+    
+    def reshard(self, shard_by: str) -> int:
+        """
+        Change the collection layout.
+        
+        Args:
+            shard_by: "mime" (one shard per file type), "folder" (one shard per
+                top-level Drive folder) or "none" (a single collection)
+        
+        Returns:
+            Number of chunks moved
+        """
+        if shard_by not in SHARD_MODES:
+            raise ValueError(f"Unknown shard mode '{shard_by}'. Use one of: {', '.join(SHARD_MODES)}")
+        print(f"Resharding the collection by {shard_by}...")
+        moved = self._rebuild_collection(shard_by)
+        print(f"✓ Reshard complete. {moved} chunks in layout '{shard_by}'")
+        return moved
+    
+    def _disk_size(self) -> int:
+        """Total size in bytes of the knowledge base directory."""
+        return sum(path.stat().st_size for path in self.persist_directory.rglob('*') if path.is_file())
+    
+    def compare_embedding_backends(self, sample_size: int = 200, k: int = 5,
+                                   backends: List[str] = None) -> List[Dict[str, Any]]:
+        """
+        Compare embedding backends on a sample of indexed chunks.
+
+        Args:
+            sample_size: Number of indexed chunks to encode with each backend
+            k: Cut-off for recall and neighbour overlap
+            backends: Backends to compare (default: torch, onnx, int8; the first is the reference)
+
+        Returns:
+            One result dict per backend (see embeddings.compare_backends)
+        """
+        sample = self.collection.get(limit=sample_size, include=["documents"])
+        texts = [text for text in sample.get('documents') or [] if text]
+        if len(texts) < 2:
+            print("Not enough indexed chunks to compare backends. Index some documents first.")
+            return []
+        print(f"Comparing embedding backends on {len(texts)} indexed chunks...")
+        return compare_backends(texts, backends=backends, k=k, model_name=self.embedding_model.model_name)
+    
+    def export_snapshot(self, dtype: str = None, ivf_lists: int = None) -> Dict[str, Any]:
+        """
+        Export the collection as a read-only, memory-mapped embedding snapshot.
+        
+        New processes search the snapshot without opening Chroma, and every
+        process shares its pages through the OS page cache. The snapshot is
+        used until a document is indexed or removed; export again (the sync
+        service does this after each sync that changed something) to refresh it.
+        
+        Args:
+            dtype: "float16" or "int8" (default: the previous snapshot's, else float16)
+            ivf_lists: IVF lists for approximate search (0 for brute force; default picks
+                brute force below 50,000 chunks)
+        
+        Returns:
+            Snapshot info (rows, dimension, dtype, IVF lists, fingerprint)
+        """
+        if not SNAPSHOT_AVAILABLE:
+            raise ImportError("numpy is required for embedding snapshots. Install with: pip install numpy")
+        dtype = dtype or (read_snapshot_info(self.snapshot_dir) or {}).get("dtype", "float16")
+        # Taken before reading, so documents written during the export leave the snapshot stale
+        fingerprint = self.manifest.fingerprint()
+        count = self.collection.count()
+        print(f"Exporting {count} chunks to an embedding snapshot ({dtype})...")
+        
+        start = time.time()
+        info = export_snapshot(
+            self._iter_collection(include=["embeddings", "documents", "metadatas"]),
+            count,
+            self.snapshot_dir,
+            fingerprint,
+            dtype=dtype,
+            ivf_lists=ivf_lists,
+            model_name=self.embedding_model.model_name
+        )
+        size_mb = sum(path.stat().st_size for path in self.snapshot_dir.iterdir()) / 1024 / 1024
+        search = f"IVF with {info['ivf_lists']} lists" if info['ivf_lists'] else "brute force"
+        print(f"✓ Snapshot written to {self.snapshot_dir} ({info['rows']} chunks, {size_mb:.1f} MB, {search}) "
+              f"in {time.time() - start:.1f}s")
+        return info
     
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about the knowledge base."""
         count = self.collection.count()
-        return {
+        stats = {
             "total_chunks": count,
-            "total_documents": len(self.indexed_files),
-            "indexed_files": list(self.indexed_files.keys())
+            "total_documents": len(self.manifest),
+            "indexed_files": self.manifest.file_ids(),
+            "shard_by": self.shard_by
         }
+        if isinstance(self.collection, ShardedCollection):
+            stats["shards"] = self.collection.shard_counts()
+        snapshot = read_snapshot_info(self.snapshot_dir) if SNAPSHOT_AVAILABLE else None
+        if snapshot:
+            stats["snapshot"] = {
+                "dtype": snapshot["dtype"],
+                "rows": snapshot["rows"],
+                "ivf_lists": snapshot["ivf_lists"],
+                "created_at": snapshot["created_at"],
+                "current": snapshot["fingerprint"] == self.manifest.fingerprint()
+            }
+        return stats
 
 
 def initialize_knowledge_base(creds: Credentials) -> KnowledgeBase:
@@ -0,0 +1,167 @@
+"""
+Embedded SQLite manifest of indexed knowledge base documents.
+
+Replaces indexed_files.json: each document is upserted individually inside a
+transaction, so indexing cost stays constant per document and a crash can
+never leave a half-written manifest.
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class ManifestStore:
+    """Per-document index manifest stored in a SQLite database."""
+
+    def __init__(self, path: Path):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # Shared across indexer threads; access is serialized with the lock
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    file_id TEXT PRIMARY KEY,
+                    file_name TEXT NOT NULL,
+                    file_type TEXT,
+                    modified_time TEXT,
+                    content_hash TEXT,
+                    chunks INTEGER NOT NULL DEFAULT 0,
+                    indexed_at TEXT,
+                    top_folder TEXT
+                )
+                """
+            )
+            # Manifests created before top_folder was tracked
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(documents)")]
+            if "top_folder" not in columns:
+                self._conn.execute("ALTER TABLE documents ADD COLUMN top_folder TEXT")
+
+    def __contains__(self, file_id: str) -> bool:
+        return self.get(file_id) is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Return the manifest entry for a file, or None if it isn't indexed."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM documents WHERE file_id = ?", (file_id,)).fetchone()
+        return dict(row) if row else None
+
+    def file_ids(self) -> List[str]:
+        """Return the IDs of every indexed file."""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT file_id FROM documents")]
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Return every manifest entry."""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM documents")]
+
+    def upsert(self, file_id: str, file_name: str, file_type: str, modified_time: str = None,
+               content_hash: str = None, chunks: int = 0, indexed_at: str = None, top_folder: str = None):
+        """Insert or replace the manifest entry for a file (top_folder is only known when sharding by folder)."""
+        indexed_at = indexed_at or datetime.utcnow().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT INTO documents (file_id, file_name, file_type, modified_time, content_hash, chunks, indexed_at,
+                                       top_folder)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(file_id) DO UPDATE SET
+                    file_name = excluded.file_name,
+                    file_type = excluded.file_type,
+                    modified_time = excluded.modified_time,
+                    content_hash = excluded.content_hash,
+                    chunks = excluded.chunks,
+                    indexed_at = excluded.indexed_at,
+                    top_folder = excluded.top_folder
+                """,
+                (file_id, file_name, file_type, modified_time, content_hash, chunks, indexed_at, top_folder)
+            )
+
+    def fingerprint(self) -> str:
+        """Summary that changes whenever a document is indexed, re-indexed or removed."""
+        with self._lock:
+            count, chunks, last_indexed = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunks), 0), COALESCE(MAX(indexed_at), '') FROM documents"
+            ).fetchone()
+        return f"{count}:{chunks}:{last_indexed}"
+
+    def update_top_folders(self, top_folders: Dict[str, str]):
+        """Record the top-level Drive folder of files (e.g. after resharding by folder)."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE documents SET top_folder = ? WHERE file_id = ?",
+                [(top_folder, file_id) for file_id, top_folder in top_folders.items()]
+            )
+
+    def update_modified_time(self, file_id: str, modified_time: str):
+        """Record a new Drive modifiedTime for a file whose content didn't change."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE documents SET modified_time = ? WHERE file_id = ?",
+                (modified_time, file_id)
+            )
+
+    def remove(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Remove a file from the manifest and return its old entry, if any."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT * FROM documents WHERE file_id = ?", (file_id,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("DELETE FROM documents WHERE file_id = ?", (file_id,))
+        return dict(row)
+
+    def import_json(self, json_path: Path) -> int:
+        """
+        Import entries from a legacy indexed_files.json.
+
+        Existing manifest entries are kept; the JSON file is left in place.
+
+        Returns:
+            Number of entries imported
+        """
+        with open(json_path, 'r') as f:
+            legacy = json.load(f)
+
+        rows = [
+            (
+                file_id,
+                entry.get('file_name', ''),
+                entry.get('file_type'),
+                entry.get('modified_time'),
+                entry.get('content_hash'),
+                entry.get('chunks', 0),
+                entry.get('indexed_at')
+            )
+            for file_id, entry in legacy.items()
+        ]
+        with self._lock, self._conn:
+            cursor = self._conn.executemany(
+                """
+                INSERT OR IGNORE INTO documents
+                    (file_id, file_name, file_type, modified_time, content_hash, chunks, indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+        return cursor.rowcount
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,343 @@
+"""
+Timing spans and metrics for the knowledge base hot paths.
+
+Stages of indexing (fetch, extract, chunk, embed, write) and search (encode,
+query, rerank, format) are timed with spans and aggregated into latency
+histograms in a process-wide MetricsRegistry. The registry can be read as
+Prometheus text or JSON, written to a file (KB_METRICS_FILE, .prom or .json,
+refreshed at most every KB_METRICS_FLUSH_SECONDS), served over HTTP
+(KB_METRICS_PORT) and forwarded to extra sinks (any callable taking a span
+dict) registered with add_sink.
+
+Searches slower than KB_SLOW_QUERY_MS are sampled (KB_SLOW_QUERY_SAMPLE) into
+a JSON-lines slow-query log with their per-stage timings.
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS_FILE = os.getenv("KB_METRICS_FILE")
+METRICS_FLUSH_SECONDS = float(os.getenv("KB_METRICS_FLUSH_SECONDS", "10"))
+METRICS_PORT = int(os.getenv("KB_METRICS_PORT", "0"))
+
+DEFAULT_SLOW_QUERY_MS = float(os.getenv("KB_SLOW_QUERY_MS", "500"))
+DEFAULT_SLOW_QUERY_SAMPLE = float(os.getenv("KB_SLOW_QUERY_SAMPLE", "1.0"))
+# The slow-query log is rotated to <name>.1 once it grows past this size
+SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_registry: Optional["MetricsRegistry"] = None
+_server: Optional[ThreadingHTTPServer] = None
+_registry_lock = threading.Lock()
+
+
+class Histogram:
+    """Cumulative latency histogram (count, sum and bucket counts)."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q: float) -> float:
+        """Approximate quantile: the smallest bucket bound covering q of the observations."""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= target:
+                return bound
+        return float("inf")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe store of latency histograms and counters, with exporters."""
+
+    def __init__(self, export_path: str = METRICS_FILE, flush_seconds: float = METRICS_FLUSH_SECONDS):
+        """
+        Args:
+            export_path: Optional file the metrics are written to (.json for JSON, else Prometheus text)
+            flush_seconds: Minimum seconds between writes of export_path
+        """
+        self.export_path = Path(export_path) if export_path else None
+        self.flush_seconds = flush_seconds
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._sinks: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def add_sink(self, sink: Callable[[Dict[str, Any]], None]):
+        """Forward every recorded span ({"name", "seconds", "labels", "timestamp"}) to sink as well."""
+        with self._lock:
+            self._sinks.append(sink)
+
+    def describe(self, name: str, help_text: str):
+        """Set the HELP text shown for a metric in the Prometheus output."""
+        self._help[name] = help_text
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record a duration in the histogram for name and labels."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            histogram = self._histograms.setdefault(name, {}).get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = Histogram()
+            histogram.observe(seconds)
+            sinks = list(self._sinks)
+        span = {"name": name, "seconds": seconds, "labels": labels, "timestamp": time.time()}
+        for sink in sinks:
+            try:
+                sink(span)
+            except Exception as e:
+                print(f"Metrics sink failed: {e}")
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        """Add to a counter."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items()))
+        with self._lock:
+            counters = self._counters.setdefault(name, {})
+            counters[key] = counters.get(key, 0) + amount
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        """Time the body of a with block into the histogram for name and labels."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def trace(self, name: str, **labels) -> "Trace":
+        """Start a multi-stage trace (see Trace)."""
+        return Trace(self, name, labels)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Metrics as JSON-serializable data, with approximate p50/p95/p99 per histogram."""
+        with self._lock:
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(key),
+                        "count": h.count,
+                        "sum_seconds": round(h.sum, 6),
+                        "mean_seconds": round(h.sum / h.count, 6) if h.count else 0.0,
+                        "p50_seconds": h.quantile(0.5),
+                        "p95_seconds": h.quantile(0.95),
+                        "p99_seconds": h.quantile(0.99),
+                    }
+                    for key, h in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+            counters = {
+                name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                for name, series in self._counters.items()
+            }
+        return {"generated_at": datetime.utcnow().isoformat(), "histograms": histograms, "counters": counters}
+
+    def to_prometheus(self) -> str:
+        """Metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, h in series.items():
+                    for bound, count in zip(h.buckets, h.counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', repr(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {h.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {h.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path = None):
+        """Write the metrics to path (default: export_path); .json files get JSON, others Prometheus text."""
+        path = Path(path) if path else self.export_path
+        if path is None:
+            return
+        content = (json.dumps(self.to_dict(), indent=2) if path.suffix == ".json" else self.to_prometheus())
+        # A unique temp file, so processes exporting to the same path can't clobber each other's
+        with tempfile.NamedTemporaryFile('w', dir=path.parent, prefix=path.name + '.', suffix='.tmp',
+                                         delete=False) as f:
+            f.write(content)
+        os.replace(f.name, path)
+
+    def maybe_flush(self):
+        """Write export_path if it is set and the last write is older than flush_seconds."""
+        if self.export_path is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_flush < self.flush_seconds:
+                return
+            self._last_flush = now
+        try:
+            self.write()
+        except OSError as e:
+            print(f"Could not write metrics to {self.export_path}: {e}")
+
+
+class Trace:
+    """
+    Per-operation stage timings.
+
+    Each stage's time is accumulated (a stage may be entered several times)
+    and, on finish, recorded in the `<name>_stage_seconds` histogram; the
+    total goes to `<name>_seconds`.
+    """
+
+    def __init__(self, registry: MetricsRegistry, name: str, labels: Dict[str, Any]):
+        self.registry = registry
+        self.name = name
+        self.labels = dict(labels)
+        self.stages: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self.seconds = None
+
+    @contextmanager
+    def span(self, stage: str):
+        """Time the body of a with block as part of a stage."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = self.stages.get(stage, 0.0) + time.perf_counter() - start
+
+    def finish(self, **labels) -> float:
+        """Record the stage and total timings (extra labels apply to both). Returns the total seconds."""
+        self.seconds = time.perf_counter() - self._start
+        self.labels.update(labels)
+        for stage, seconds in self.stages.items():
+            self.registry.observe(f"{self.name}_stage_seconds", seconds, stage=stage, **self.labels)
+        self.registry.observe(f"{self.name}_seconds", self.seconds, **self.labels)
+        self.registry.maybe_flush()
+        return self.seconds
+
+    def timings_ms(self) -> Dict[str, float]:
+        """Stage timings in milliseconds, plus the total once finished."""
+        timings = {stage: round(seconds * 1000, 3) for stage, seconds in self.stages.items()}
+        if self.seconds is not None:
+            timings["total"] = round(self.seconds * 1000, 3)
+        return timings
+
+
+class SlowQueryLog:
+    """Samples operations slower than a threshold into a JSON-lines file."""
+
+    def __init__(self, path: Path, threshold_ms: float = DEFAULT_SLOW_QUERY_MS,
+                 sample_rate: float = DEFAULT_SLOW_QUERY_SAMPLE):
+        """
+        Args:
+            path: JSON-lines log file
+            threshold_ms: Only operations at least this slow are logged
+            sample_rate: Fraction (0-1) of slow operations that are logged
+        """
+        self.path = Path(path)
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+
+    def maybe_log(self, total_ms: float, entry: Dict[str, Any]) -> bool:
+        """Log entry if total_ms is over the threshold and it is sampled. Returns True if logged."""
+        if total_ms < self.threshold_ms or random.random() >= self.sample_rate:
+            return False
+        line = json.dumps(dict(entry, timestamp=datetime.utcnow().isoformat(), total_ms=round(total_ms, 3)),
+                          default=str)
+        with self._lock:
+            if self.path.exists() and self.path.stat().st_size > SLOW_QUERY_LOG_MAX_BYTES:
+                os.replace(self.path, self.path.with_name(self.path.name + ".1"))
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+        return True
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        registry = get_metrics()
+        if self.path == "/metrics":
+            body, content_type = registry.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body, content_type = json.dumps(registry.to_dict()).encode("utf-8"), "application/json"
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """Serve /metrics (Prometheus text) and /metrics.json on localhost; one server per process."""
+    global _server
+    if not port:
+        return None
+    with _registry_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                print(f"Could not start metrics server on {host}:{port}: {e}")
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"✓ Metrics on http://{host}:{port}/metrics")
+        return _server
+
+
+def get_metrics() -> MetricsRegistry:
+    """Return the process-wide metrics registry."""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+            _registry.describe("kb_search_seconds", "Knowledge base search latency")
+            _registry.describe("kb_search_stage_seconds", "Knowledge base search latency by stage")
+            _registry.describe("kb_index_document_seconds", "Time to index one document")
+            _registry.describe("kb_index_stage_seconds", "Indexing time by stage")
+        return _registry
@@ -0,0 +1,251 @@
+"""
+Quota-aware rate limiting and retries for Google API calls.
+
+Every Drive, Docs and Sheets request the indexer makes goes through a shared
+ApiRateLimiter: a token bucket per API keeps the request rate inside the
+per-user quota, and throttling (429, rate-limit 403s) or transient server and
+network errors are retried with exponential backoff and full jitter.
+
+The buckets adapt to the quota actually available: a throttled response halves
+that API's rate, and each successful call wins a little of it back (up to the
+configured budget), so long runs settle at the fastest sustainable rate instead
+of stalling or aborting.
+
+Budgets default to the standard per-user quotas and can be overridden with
+KB_DRIVE_RPS, KB_DOCS_RPS and KB_SHEETS_RPS (requests per second).
+"""
+
+import os
+import random
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Requests per second and burst size per API (Docs allows 300 and Sheets 60 read requests per minute per user)
+DEFAULT_API_BUDGETS = {
+    "drive": (float(os.getenv("KB_DRIVE_RPS", "10")), 20),
+    "docs": (float(os.getenv("KB_DOCS_RPS", "4")), 8),
+    "sheets": (float(os.getenv("KB_SHEETS_RPS", "1")), 5),
+}
+
+# Backoff: delay before retry n is uniform in [0, min(MAX_DELAY, BASE_DELAY * 2**n)]
+DEFAULT_MAX_RETRIES = int(os.getenv("KB_API_MAX_RETRIES", "6"))
+DEFAULT_BASE_DELAY_SECONDS = 1.0
+DEFAULT_MAX_DELAY_SECONDS = 64.0
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded"}
+
+# A throttled API drops to this fraction of its current rate, never below MIN_RATE_FRACTION of its budget
+THROTTLE_FACTOR = 0.5
+MIN_RATE_FRACTION = 0.05
+# Fraction of the budget regained per successful call
+RECOVERY_FRACTION = 0.02
+
+_limiter: Optional["ApiRateLimiter"] = None
+_limiter_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Thread-safe token bucket with an adjustable refill rate."""
+
+    def __init__(self, rate: float, burst: int):
+        """
+        Args:
+            rate: Tokens added per second (the sustained request rate)
+            burst: Maximum tokens held (requests allowed back to back)
+        """
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self) -> float:
+        """Take one token, sleeping until one is available. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttle(self):
+        """Slow down after a rate-limit response and drop any saved-up burst."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate * THROTTLE_FACTOR)
+            self._tokens = min(self._tokens, 0.0)
+
+    def recover(self):
+        """Speed back up towards the configured rate after a successful call."""
+        if self.rate < self.max_rate:
+            with self._lock:
+                self._refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_FRACTION)
+
+
+def _error_status(error: Exception) -> Optional[int]:
+    """HTTP status of a googleapiclient HttpError (None for other exceptions)."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_reasons(error: Exception) -> set:
+    """Error reasons reported in an HttpError body (e.g. userRateLimitExceeded)."""
+    reasons = set()
+    for detail in getattr(error, 'error_details', None) or []:
+        if isinstance(detail, dict) and detail.get('reason'):
+            reasons.add(detail['reason'])
+    content = getattr(error, 'content', b'') or b''
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='ignore')
+    reasons.update(reason for reason in RATE_LIMIT_REASONS if reason in content)
+    return reasons
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """
+    Decide whether a failed API call should be retried.
+
+    Returns:
+        "throttled" for quota/rate-limit responses, "transient" for server and
+        network errors worth retrying, or None if the error is permanent
+    """
+    status = _error_status(error)
+    if status is not None:
+        if status == 429 or (status == 403 and _error_reasons(error) & RATE_LIMIT_REASONS):
+            return "throttled"
+        if status in RETRYABLE_STATUSES:
+            return "transient"
+        return None
+    if isinstance(error, (ConnectionError, TimeoutError, socket.timeout)):
+        return "transient"
+    # httplib2 and ssl errors don't share a base class with the builtins above
+    if type(error).__module__.split('.')[0] in ("httplib2", "ssl"):
+        return "transient"
+    return None
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if present."""
+    resp = getattr(error, 'resp', None)
+    if resp is None or not hasattr(resp, 'get'):
+        return None
+    value = resp.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class ApiRateLimiter:
+    """Per-API token buckets plus retry with exponential backoff and jitter."""
+
+    def __init__(self, budgets: Dict[str, Tuple[float, int]] = None, max_retries: int = DEFAULT_MAX_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY_SECONDS, max_delay: float = DEFAULT_MAX_DELAY_SECONDS):
+        """
+        Args:
+            budgets: API name -> (requests per second, burst); defaults to DEFAULT_API_BUDGETS
+            max_retries: Retries per call before the error is raised
+            base_delay: Backoff ceiling for the first retry, in seconds
+            max_delay: Upper bound on any single backoff, in seconds
+        """
+        budgets = budgets or DEFAULT_API_BUDGETS
+        self.buckets = {api: TokenBucket(rate, burst) for api, (rate, burst) in budgets.items()}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats = {api: {"calls": 0, "retries": 0, "throttled": 0, "failed": 0, "waited_seconds": 0.0}
+                       for api in self.buckets}
+        self._stats_lock = threading.Lock()
+
+    def _record(self, api: str, key: str, amount: float = 1):
+        with self._stats_lock:
+            self._stats[api][key] += amount
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff for a retry attempt (0-based)."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def call(self, api: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn under the API's rate budget, retrying throttled and transient failures.
+
+        Args:
+            api: Budget to charge ("drive", "docs" or "sheets")
+            fn: Zero-argument callable making one API request
+
+        Returns:
+            The value returned by fn
+
+        Raises:
+            The last error if it is permanent or retries are exhausted
+        """
+        if api not in self.buckets:
+            raise ValueError(f"Unknown API budget '{api}'. Use one of: {', '.join(self.buckets)}")
+        bucket = self.buckets[api]
+
+        attempt = 0
+        while True:
+            waited = bucket.acquire()
+            self._record(api, "calls")
+            if waited:
+                self._record(api, "waited_seconds", waited)
+            try:
+                result = fn()
+            except Exception as e:
+                kind = classify_error(e)
+                if kind is None or attempt >= self.max_retries:
+                    if kind is not None:
+                        self._record(api, "failed")
+                    raise
+                if kind == "throttled":
+                    bucket.throttle()
+                    self._record(api, "throttled")
+                delay = min(self.max_delay, max(self._backoff(attempt), _retry_after(e) or 0.0))
+                self._record(api, "retries")
+                self._record(api, "waited_seconds", delay)
+                print(f"{api} API {kind} ({e.__class__.__name__}); retrying in {delay:.1f}s "
+                      f"({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+                attempt += 1
+                continue
+            bucket.recover()
+            return result
+
+    def execute(self, api: str, request) -> Any:
+        """Execute a googleapiclient request (anything with .execute()) under the API's budget."""
+        return self.call(api, request.execute)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Calls, retries, throttled responses, exhausted retries, seconds waited and current rate per API."""
+        with self._stats_lock:
+            snapshot = {api: dict(values) for api, values in self._stats.items()}
+        for api, values in snapshot.items():
+            values["waited_seconds"] = round(values["waited_seconds"], 3)
+            values["rate"] = round(self.buckets[api].rate, 3)
+        return snapshot
+
+
+def get_rate_limiter() -> ApiRateLimiter:
+    """Return the process-wide rate limiter shared by every indexer thread."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = ApiRateLimiter()
+        return _limiter
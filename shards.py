@@ -0,0 +1,209 @@
+"""
+Sharded Chroma collection for the knowledge base.
+
+Chunks are spread over one Chroma collection per shard key (a metadata value
+such as the MIME type or the top-level Drive folder). ShardedCollection exposes
+the subset of the Chroma collection API the knowledge base uses, so it can be
+swapped in for a single collection. Queries whose `where` filter pins the shard
+key only touch the matching shards; everything else fans out and merges.
+"""
+
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+SHARD_SEPARATOR = "__"
+
+
+def collection_names(client) -> List[str]:
+    """Names of every collection in a Chroma client (list_collections returns names or objects by version)."""
+    return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+
+def shard_collection_name(base_name: str, shard_key: str) -> str:
+    """Chroma-safe collection name for a shard key."""
+    return f"{base_name}{SHARD_SEPARATOR}{hashlib.sha1(shard_key.encode('utf-8')).hexdigest()[:12]}"
+
+
+def is_layout_member(name: str, base_name: str) -> bool:
+    """True if a collection name is the unsharded collection or one of the shards for base_name."""
+    return name == base_name or name.startswith(base_name + SHARD_SEPARATOR)
+
+
+class ShardedCollection:
+    """A set of Chroma collections, one per value of a metadata key, used as one collection."""
+
+    def __init__(self, client, base_name: str, shard_key: str, metadata: Dict[str, Any] = None):
+        """
+        Args:
+            client: Chroma client
+            base_name: Collection name prefix; shards are named base_name__<hash>
+            shard_key: Chunk metadata key whose value selects the shard (e.g. "file_type")
+            metadata: Extra metadata stored on each shard collection
+        """
+        self.client = client
+        self.base_name = base_name
+        self.shard_key = shard_key
+        self.metadata = metadata or {}
+        self._shards: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+        for name in collection_names(client):
+            if name.startswith(base_name + SHARD_SEPARATOR):
+                collection = client.get_collection(name)
+                key = (collection.metadata or {}).get("shard_key", "")
+                self._shards[key] = collection
+
+    @property
+    def shards(self) -> Dict[str, Any]:
+        """Shard collections keyed by shard key."""
+        return dict(self._shards)
+
+    def _shard(self, key: str):
+        """Return the collection for a shard key, creating it on first write."""
+        with self._lock:
+            collection = self._shards.get(key)
+            if collection is None:
+                collection = self.client.get_or_create_collection(
+                    name=shard_collection_name(self.base_name, key),
+                    metadata=dict(self.metadata, shard_by=self.shard_key, shard_key=key)
+                )
+                self._shards[key] = collection
+            return collection
+
+    def _keys_in_where(self, where: Optional[Dict[str, Any]]) -> Optional[List[str]]:
+        """Shard keys a where filter is limited to, or None if it can match any shard."""
+        if not where:
+            return None
+        if "$and" in where:
+            for condition in where["$and"]:
+                keys = self._keys_in_where(condition)
+                if keys is not None:
+                    return keys
+            return None
+        value = where.get(self.shard_key)
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            if "$eq" in value:
+                return [value["$eq"]]
+            if "$in" in value:
+                return list(value["$in"])
+            return None
+        return [value]
+
+    def _targets(self, where: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """Shard collections that can hold chunks matching where."""
+        keys = self._keys_in_where(where)
+        if keys is None:
+            return list(self._shards.values())
+        return [self._shards[key] for key in keys if key in self._shards]
+
+    def count(self) -> int:
+        return sum(collection.count() for collection in self._shards.values())
+
+    def shard_counts(self) -> Dict[str, int]:
+        """Number of chunks in each shard."""
+        return {key: collection.count() for key, collection in self._shards.items()}
+
+    def get(self, ids: List[str] = None, where: Dict[str, Any] = None, include: List[str] = None,
+            limit: int = None, offset: int = None) -> Dict[str, List[Any]]:
+        """Same as Collection.get; paging runs across shards in a stable order."""
+        include = ["documents", "metadatas"] if include is None else include
+        merged = {"ids": []}
+        merged.update({key: [] for key in include})
+
+        def extend(page):
+            merged["ids"].extend(page["ids"])
+            for key in include:
+                merged[key].extend(page.get(key) if page.get(key) is not None else [])
+
+        if ids is not None or where:
+            for collection in self._targets(where):
+                args = {"include": include}
+                if ids is not None:
+                    args["ids"] = ids
+                if where:
+                    args["where"] = where
+                extend(collection.get(**args))
+            start = offset or 0
+            end = start + limit if limit is not None else None
+            return {key: values[start:end] for key, values in merged.items()}
+
+        skip = offset or 0
+        remaining = limit
+        for collection in self._targets():
+            if remaining is not None and remaining <= 0:
+                break
+            size = collection.count()
+            if skip >= size:
+                skip -= size
+                continue
+            page = collection.get(include=include, limit=remaining, offset=skip)
+            skip = 0
+            extend(page)
+            if remaining is not None:
+                remaining -= len(page["ids"])
+        return merged
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Dict[str, Any] = None,
+              include: List[str] = None) -> Dict[str, List[List[Any]]]:
+        """Same as Collection.query; each shard is queried and the hits are merged by distance."""
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        shard_include = list(include) if "distances" in include else list(include) + ["distances"]
+        merged = {"ids": []}
+        merged.update({key: [] for key in include})
+
+        targets = [(collection, collection.count()) for collection in self._targets(where)]
+        for embedding in query_embeddings:
+            hits = []
+            for collection, size in targets:
+                if size == 0:
+                    continue
+                args = {"where": where} if where else {}
+                results = collection.query(
+                    query_embeddings=[embedding],
+                    n_results=min(n_results, size),
+                    include=shard_include,
+                    **args
+                )
+                for i, chunk_id in enumerate(results["ids"][0]):
+                    hits.append((results["distances"][0][i], chunk_id,
+                                 {key: results[key][0][i] for key in include}))
+            hits.sort(key=lambda hit: hit[0])
+            hits = hits[:n_results]
+            merged["ids"].append([hit[1] for hit in hits])
+            for key in include:
+                merged[key].append([hit[2][key] for hit in hits])
+        return merged
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+               metadatas: List[Dict[str, Any]]):
+        """Same as Collection.upsert; each chunk goes to the shard for its metadata value."""
+        groups: Dict[str, List[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(str((metadata or {}).get(self.shard_key, "")), []).append(i)
+
+        for key, positions in groups.items():
+            group_ids = [ids[i] for i in positions]
+            collection = self._shard(key)
+            # A chunk whose shard value changed (e.g. the file moved folders) must leave its old shard
+            for other in self._targets():
+                if other is not collection:
+                    other.delete(ids=group_ids)
+            collection.upsert(
+                ids=group_ids,
+                embeddings=[embeddings[i] for i in positions],
+                documents=[documents[i] for i in positions],
+                metadatas=[metadatas[i] for i in positions]
+            )
+
+    def delete(self, ids: List[str] = None, where: Dict[str, Any] = None):
+        """Same as Collection.delete, applied to every shard the filter can match."""
+        args = {}
+        if ids is not None:
+            args["ids"] = ids
+        if where:
+            args["where"] = where
+        for collection in self._targets(where):
+            collection.delete(**args)
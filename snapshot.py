@@ -0,0 +1,420 @@
+"""
+Read-only, memory-mapped snapshot of the knowledge base embeddings.
+
+Opening the Chroma PersistentClient and warming its index costs every new
+process (e.g. each Streamlit session building the Chief of Staff) seconds
+before the first query. A snapshot is a directory with:
+
+    embeddings.npy   chunk embeddings as float16, or int8 with per-row scales
+    scales.npy       int8 only: per-row dequantization scales (float32)
+    norms.npy        squared L2 norm of each stored vector (float32)
+    centroids.npy    optional IVF centroids; rows are grouped by list
+    list_offsets.npy optional IVF list boundaries into the row order
+    chunks.db        SQLite table of chunk IDs, documents, metadata and filter columns
+    snapshot.json    format, row count, dimension and the manifest fingerprint
+
+The arrays are opened with numpy memory-mapping, so opening is instant, pages
+are read on demand and the OS page cache is shared by every process reading
+the same snapshot. EmbeddingSnapshot implements the read-only subset of the
+Chroma collection API the knowledge base search uses (count, get, query), with
+distances in Chroma's default squared-L2 space.
+"""
+
+import json
+import os
+import shutil
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_DTYPES = ["float16", "int8"]
+
+# Metadata keys stored as columns so `where` filters run in SQL
+FILTER_COLUMNS = {"file_id": "TEXT", "file_type": "TEXT", "top_folder": "TEXT", "indexed_ts": "REAL"}
+WHERE_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+# Rows scored per block in brute-force search (bounds the float32 working set)
+SCORE_BLOCK_ROWS = 65536
+
+# IVF: collections smaller than this are searched brute-force unless lists are requested explicitly
+IVF_MIN_ROWS = 50000
+IVF_TRAIN_SAMPLE = 50000
+IVF_ITERATIONS = 10
+DEFAULT_IVF_PROBES = int(os.getenv("KB_SNAPSHOT_PROBES", "8"))
+
+
+class UnsupportedFilter(ValueError):
+    """A `where` filter uses a key or operator the snapshot can't evaluate."""
+
+
+def _where_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Translate a Chroma `where` filter on FILTER_COLUMNS into a SQL condition and parameters."""
+    if "$and" in where or "$or" in where:
+        joiner = " AND " if "$and" in where else " OR "
+        parts, params = [], []
+        for condition in where.get("$and") or where.get("$or"):
+            sql, values = _where_sql(condition)
+            parts.append(f"({sql})")
+            params.extend(values)
+        return joiner.join(parts), params
+
+    parts, params = [], []
+    for key, value in where.items():
+        if key not in FILTER_COLUMNS:
+            raise UnsupportedFilter(f"Snapshot can't filter on '{key}'")
+        if not isinstance(value, dict):
+            value = {"$eq": value}
+        for operator, operand in value.items():
+            if operator == "$in":
+                operand = list(operand)
+                if not operand:
+                    parts.append("0")
+                    continue
+                parts.append(f"{key} IN ({', '.join('?' * len(operand))})")
+                params.extend(operand)
+            elif operator in WHERE_OPERATORS:
+                parts.append(f"{key} {WHERE_OPERATORS[operator]} ?")
+                params.append(operand)
+            else:
+                raise UnsupportedFilter(f"Snapshot can't evaluate '{operator}'")
+    return " AND ".join(parts) or "1", params
+
+
+def _kmeans(vectors: np.ndarray, lists: int, iterations: int = IVF_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """Train IVF centroids with Lloyd's k-means (L2) on a sample of vectors."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > IVF_TRAIN_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), IVF_TRAIN_SAMPLE, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroid(vectors, centroids)
+        for i in range(lists):
+            members = vectors[assignment == i]
+            if len(members):
+                centroids[i] = members.mean(axis=0)
+    return centroids
+
+
+def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (squared L2) for each vector."""
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    centroid_norms = np.sum(centroids * centroids, axis=1)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = vectors[start:start + SCORE_BLOCK_ROWS]
+        assignment[start:start + SCORE_BLOCK_ROWS] = np.argmin(centroid_norms - 2 * block @ centroids.T, axis=1)
+    return assignment
+
+
+def export_snapshot(pages: Iterable[Dict[str, List[Any]]], count: int, directory: Path, fingerprint: str,
+                    dtype: str = "float16", ivf_lists: int = None, model_name: str = None) -> Dict[str, Any]:
+    """
+    Write a snapshot from pages of collection chunks.
+
+    The snapshot is built in a temporary directory and swapped in at the end,
+    so readers never see a partial snapshot; processes still mapping the old
+    files keep reading them until they reopen.
+
+    Args:
+        pages: Pages from Collection.get with ids, embeddings, documents and metadatas
+        count: Number of chunks in the collection
+        directory: Snapshot directory (replaced if it exists)
+        fingerprint: Manifest fingerprint the snapshot is current for
+        dtype: "float16" or "int8" (per-row symmetric quantization)
+        ivf_lists: IVF lists (0 for brute force; None picks sqrt(rows) above IVF_MIN_ROWS)
+        model_name: Embedding model the vectors came from
+
+    Returns:
+        The snapshot's snapshot.json contents
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Unknown snapshot dtype '{dtype}'. Use one of: {', '.join(SNAPSHOT_DTYPES)}")
+    directory = Path(directory)
+    tmp_dir = directory.with_name(directory.name + "_tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    # Collect vectors as float32 first: IVF needs every vector before rows can be ordered by list
+    vectors = None
+    conn = sqlite3.connect(str(tmp_dir / "chunks.db"))
+    columns = ', '.join(f"{name} {kind}" for name, kind in FILTER_COLUMNS.items())
+    conn.execute(f"CREATE TABLE staged (id TEXT, document TEXT, metadata TEXT, {columns})")
+    rows = 0
+    for page in pages:
+        embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+        if len(embeddings) == 0:
+            continue
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(tmp_dir / "staged.npy", mode="w+", dtype=np.float32,
+                                                shape=(count, embeddings.shape[1]))
+        take = min(len(embeddings), count - rows)
+        vectors[rows:rows + take] = embeddings[:take]
+        conn.executemany(
+            f"INSERT INTO staged VALUES (?, ?, ?, {', '.join('?' * len(FILTER_COLUMNS))})",
+            [
+                (chunk_id, document, json.dumps(metadata or {}),
+                 *[(metadata or {}).get(name) for name in FILTER_COLUMNS])
+                for chunk_id, document, metadata in
+                zip(page['ids'][:take], page['documents'][:take], page['metadatas'][:take])
+            ]
+        )
+        rows += take
+    if vectors is None or rows == 0:
+        conn.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise ValueError("The collection is empty; nothing to snapshot")
+    vectors = vectors[:rows]
+
+    if ivf_lists is None:
+        ivf_lists = int(np.sqrt(rows)) if rows >= IVF_MIN_ROWS else 0
+    ivf_lists = min(ivf_lists, rows)
+    if ivf_lists:
+        centroids = _kmeans(np.asarray(vectors), ivf_lists)
+        assignment = _nearest_centroid(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.searchsorted(assignment[order], np.arange(ivf_lists + 1))
+        np.save(tmp_dir / "centroids.npy", centroids.astype(np.float32))
+        np.save(tmp_dir / "list_offsets.npy", offsets.astype(np.int64))
+    else:
+        order = np.arange(rows)
+
+    dim = vectors.shape[1]
+    stored = np.lib.format.open_memmap(tmp_dir / "embeddings.npy", mode="w+",
+                                       dtype=np.int8 if dtype == "int8" else np.float16, shape=(rows, dim))
+    norms = np.empty(rows, dtype=np.float32)
+    scales = np.empty(rows, dtype=np.float32) if dtype == "int8" else None
+    for start in range(0, rows, SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[order[start:start + SCORE_BLOCK_ROWS]])
+        if dtype == "int8":
+            block_scales = np.maximum(np.abs(block).max(axis=1), 1e-12) / 127.0
+            quantized = np.clip(np.rint(block / block_scales[:, None]), -127, 127).astype(np.int8)
+            stored[start:start + len(block)] = quantized
+            scales[start:start + len(block)] = block_scales
+            restored = quantized.astype(np.float32) * block_scales[:, None]
+        else:
+            stored[start:start + len(block)] = block.astype(np.float16)
+            restored = stored[start:start + len(block)].astype(np.float32)
+        norms[start:start + len(block)] = np.sum(restored * restored, axis=1)
+    stored.flush()
+    del stored, vectors
+    np.save(tmp_dir / "norms.npy", norms)
+    if scales is not None:
+        np.save(tmp_dir / "scales.npy", scales)
+    os.remove(tmp_dir / "staged.npy")
+
+    # Final table in snapshot row order: row = position in embeddings.npy
+    conn.execute(f"CREATE TABLE chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE, document TEXT, metadata TEXT, "
+                 f"{columns})")
+    conn.execute("CREATE TEMP TABLE row_order (staged INTEGER PRIMARY KEY, row INTEGER)")
+    conn.executemany("INSERT INTO row_order VALUES (?, ?)",
+                     ((staged + 1, row) for row, staged in enumerate(order.tolist())))
+    conn.execute(
+        "INSERT INTO chunks SELECT row_order.row, staged.* FROM staged "
+        "JOIN row_order ON row_order.staged = staged.rowid"
+    )
+    conn.execute("DROP TABLE staged")
+    for name in FILTER_COLUMNS:
+        conn.execute(f"CREATE INDEX idx_{name} ON chunks ({name})")
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+    info = {
+        "format": SNAPSHOT_FORMAT,
+        "rows": rows,
+        "dim": dim,
+        "dtype": dtype,
+        "ivf_lists": ivf_lists,
+        "fingerprint": fingerprint,
+        "model_name": model_name,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    with open(tmp_dir / "snapshot.json", 'w') as f:
+        json.dump(info, f, indent=2)
+
+    old_dir = directory.with_name(directory.name + "_old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old_dir)
+    tmp_dir.rename(directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return info
+
+
+def read_snapshot_info(directory: Path) -> Optional[Dict[str, Any]]:
+    """Contents of a snapshot's snapshot.json, or None if there is no snapshot."""
+    info_path = Path(directory) / "snapshot.json"
+    if not info_path.exists():
+        return None
+    with open(info_path, 'r') as f:
+        return json.load(f)
+
+
+class EmbeddingSnapshot:
+    """A snapshot opened for searching: memory-mapped vectors plus the chunk table."""
+
+    def __init__(self, directory: Path, probes: int = DEFAULT_IVF_PROBES):
+        """
+        Args:
+            directory: Snapshot directory written by export_snapshot
+            probes: IVF lists scanned per query (ignored for brute-force snapshots)
+        """
+        self.directory = Path(directory)
+        self.info = read_snapshot_info(self.directory)
+        if self.info is None:
+            raise FileNotFoundError(f"No snapshot in {self.directory}")
+        if self.info.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {self.info.get('format')}; export it again")
+        self.fingerprint = self.info["fingerprint"]
+        self.probes = probes
+
+        self.embeddings = np.load(self.directory / "embeddings.npy", mmap_mode="r")
+        self.norms = np.load(self.directory / "norms.npy", mmap_mode="r")
+        self.scales = (np.load(self.directory / "scales.npy", mmap_mode="r")
+                       if self.info["dtype"] == "int8" else None)
+        self.centroids = None
+        self.list_offsets = None
+        if self.info.get("ivf_lists"):
+            self.centroids = np.load(self.directory / "centroids.npy")
+            self.list_offsets = np.load(self.directory / "list_offsets.npy")
+
+        # Read-only and shared by search threads; access is serialized with the lock
+        self._conn = sqlite3.connect(f"file:{self.directory / 'chunks.db'}?mode=ro", uri=True,
+                                     check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        return self.info["rows"]
+
+    def _select(self, sql: str, params: List[Any]) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _rows_matching(self, where: Dict[str, Any]) -> np.ndarray:
+        """Sorted snapshot rows whose metadata matches a where filter."""
+        sql, params = _where_sql(where)
+        return np.array([row for (row,) in self._select(f"SELECT row FROM chunks WHERE {sql} ORDER BY row", params)],
+                        dtype=np.int64)
+
+    def _load(self, rows: List[int], include: List[str]) -> Dict[int, Tuple[str, str, Dict[str, Any]]]:
+        """Chunk ID, document and metadata for snapshot rows."""
+        found = {}
+        for start in range(0, len(rows), 500):
+            batch = [int(row) for row in rows[start:start + 500]]
+            for row, chunk_id, document, metadata in self._select(
+                f"SELECT row, id, document, metadata FROM chunks WHERE row IN ({', '.join('?' * len(batch))})",
+                batch
+            ):
+                found[row] = (chunk_id, document, json.loads(metadata) if "metadatas" in include else None)
+        return found
+
+    def _score(self, query: np.ndarray, rows: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Squared L2 distances from query to the given rows (all rows if None), in blocks."""
+        total = len(self.embeddings) if rows is None else len(rows)
+        distances = np.empty(total, dtype=np.float32)
+        query_norm = float(query @ query)
+        for start in range(0, total, SCORE_BLOCK_ROWS):
+            if rows is None:
+                index = slice(start, min(start + SCORE_BLOCK_ROWS, total))
+            else:
+                index = rows[start:start + SCORE_BLOCK_ROWS]
+            dots = np.asarray(self.embeddings[index], dtype=np.float32) @ query
+            if self.scales is not None:
+                dots *= self.scales[index]
+            distances[start:start + len(dots)] = self.norms[index] + query_norm - 2 * dots
+        return (np.arange(total) if rows is None else rows), distances
+
+    def _probe_rows(self, query: np.ndarray) -> np.ndarray:
+        """Rows in the IVF lists nearest to the query."""
+        centroid_distances = np.sum(self.centroids * self.centroids, axis=1) - 2 * self.centroids @ query
+        lists = np.argsort(centroid_distances)[:max(1, self.probes)]
+        return np.concatenate([
+            np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in sorted(lists)
+        ]).astype(np.int64)
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10, where: Dict[str, Any] = None,
+              include: List[str] = None) -> Dict[str, List[List[Any]]]:
+        """Same as Collection.query: top-k by squared L2 distance, brute force or IVF."""
+        include = ["documents", "metadatas", "distances"] if include is None else include
+        allowed = self._rows_matching(where) if where else None
+        results = {"ids": []}
+        results.update({key: [] for key in include})
+
+        for embedding in query_embeddings:
+            query = np.asarray(embedding, dtype=np.float32)
+            rows = allowed
+            if rows is None and self.centroids is not None:
+                rows = self._probe_rows(query)
+                if len(rows) < n_results:
+                    rows = None
+            rows, distances = self._score(query, rows)
+
+            k = min(n_results, len(distances))
+            if k == 0:
+                top = np.array([], dtype=np.int64)
+            else:
+                top = np.argpartition(distances, k - 1)[:k]
+                top = top[np.argsort(distances[top])]
+            chunks = self._load(rows[top].tolist(), include)
+
+            results["ids"].append([chunks[int(rows[i])][0] for i in top])
+            if "documents" in include:
+                results["documents"].append([chunks[int(rows[i])][1] for i in top])
+            if "metadatas" in include:
+                results["metadatas"].append([chunks[int(rows[i])][2] for i in top])
+            if "distances" in include:
+                results["distances"].append([float(distances[i]) for i in top])
+            if "embeddings" in include:
+                results["embeddings"].append([self._vector(int(rows[i])) for i in top])
+        return results
+
+    def _vector(self, row: int) -> List[float]:
+        """Dequantized embedding of a row."""
+        vector = np.asarray(self.embeddings[row], dtype=np.float32)
+        if self.scales is not None:
+            vector = vector * self.scales[row]
+        return vector.tolist()
+
+    def get(self, ids: List[str] = None, where: Dict[str, Any] = None, include: List[str] = None,
+            limit: int = None, offset: int = None) -> Dict[str, List[Any]]:
+        """Same as Collection.get, in snapshot row order."""
+        include = ["documents", "metadatas"] if include is None else include
+        conditions, params = [], []
+        if ids is not None:
+            if not ids:
+                conditions.append("0")
+            else:
+                conditions.append(f"id IN ({', '.join('?' * len(ids))})")
+                params.extend(ids)
+        if where:
+            sql, values = _where_sql(where)
+            conditions.append(f"({sql})")
+            params.extend(values)
+        sql = "SELECT row, id, document, metadata FROM chunks"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset or 0])
+
+        results = {"ids": []}
+        results.update({key: [] for key in include})
+        for row, chunk_id, document, metadata in self._select(sql, params):
+            results["ids"].append(chunk_id)
+            if "documents" in include:
+                results["documents"].append(document)
+            if "metadatas" in include:
+                results["metadatas"].append(json.loads(metadata))
+            if "embeddings" in include:
+                results["embeddings"].append(self._vector(row))
+        return results
+
+    def close(self):
+        """Close the chunk table (the memory maps are released when the object is dropped)."""
+        with self._lock:
+            self._conn.close()
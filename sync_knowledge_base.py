@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Long-running knowledge base sync service.
+
+Replaces the daily cron + update_knowledge_base.sh run: the embedding model is
+loaded once and kept warm, and the Drive changes feed is polled on an interval
+so edits reach the knowledge base within minutes. A small HTTP endpoint on
+localhost reports the sync state:
+
+    GET  /status   queue depth, lag, last success/error and run counts (JSON)
+    GET  /healthz  200 if the last successful sync is recent, else 503
+    GET  /metrics  indexing and search timings in the Prometheus text format
+    POST /sync     start a sync now instead of waiting for the next poll
+
+Usage:
+    python3 sync_knowledge_base.py                       # poll every 5 minutes, status on 127.0.0.1:8765
+    python3 sync_knowledge_base.py --interval 60 --port 9000
+    python3 sync_knowledge_base.py --json                # JSON-lines events on stdout, logs on stderr
+
+SIGTERM lets an in-progress sync finish before exiting. Ctrl+C stops at once;
+the changes feed position is saved after every page, so the next start resumes
+there.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+from auth import get_credentials
+from index_knowledge_base import JsonLinesProgress
+from knowledge_base import initialize_knowledge_base
+from metrics import get_metrics
+
+DEFAULT_POLL_INTERVAL_SECONDS = int(os.getenv("KB_SYNC_INTERVAL", "300"))
+DEFAULT_STATUS_HOST = os.getenv("KB_SYNC_HOST", "127.0.0.1")
+DEFAULT_STATUS_PORT = int(os.getenv("KB_SYNC_PORT", "8765"))
+
+# /healthz fails once the last successful sync is older than this many poll intervals
+HEALTHY_INTERVALS = 3
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _parse_time(value: str) -> Optional[float]:
+    """Epoch seconds of an RFC 3339 timestamp (e.g. a Drive modifiedTime)."""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+    except (AttributeError, ValueError):
+        return None
+
+
+class SyncWorker:
+    """Polls the Drive changes feed with a warm knowledge base and tracks sync state."""
+
+    def __init__(self, kb, interval: int = DEFAULT_POLL_INTERVAL_SECONDS, progress=None):
+        """
+        Args:
+            kb: KnowledgeBase to keep in sync
+            interval: Seconds between polls of the changes feed
+            progress: Optional callback receiving every sync event (see KnowledgeBase.index_changes)
+        """
+        self.kb = kb
+        self.interval = interval
+        self.progress = progress
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.state = {
+            "started_at": _utc_now(),
+            "running": False,
+            "queue_depth": 0,
+            "last_poll": None,
+            "last_success": None,
+            "last_success_ts": None,
+            "last_error": None,
+            "last_error_at": None,
+            "last_run": None,
+            "last_change_lag_seconds": None,
+            "runs": 0,
+            "failures": 0,
+            "updated": 0,
+            "removed": 0,
+        }
+
+    def _on_event(self, event: Dict[str, Any]):
+        """Update queue depth and change lag from index_changes / index_folder events."""
+        with self._lock:
+            if event.get("event") == "page" and "pending" in event:
+                self.state["queue_depth"] = event["pending"]
+            elif event.get("event") == "document":
+                self.state["queue_depth"] = max(0, self.state["queue_depth"] - 1)
+                modified = _parse_time(event.get("modified_time"))
+                if modified is not None:
+                    self.state["last_change_lag_seconds"] = round(time.time() - modified, 1)
+        if self.progress:
+            self.progress(event)
+
+    def sync_once(self) -> Dict[str, Any]:
+        """Apply pending Drive changes once and record the outcome."""
+        with self._lock:
+            self.state["running"] = True
+            self.state["last_poll"] = _utc_now()
+        start = time.time()
+        try:
+            # Pick up keyword entries saved by other indexer runs while the daemon was idle
+            self.kb.lexical_index.refresh()
+            stats = self.kb.index_changes(progress=self._on_event)
+            error = stats.get("error")
+        except Exception as e:
+            print(f"Sync failed: {e}")
+            stats, error = {}, str(e)
+
+        with self._lock:
+            self.state["running"] = False
+            self.state["queue_depth"] = 0
+            self.state["runs"] += 1
+            self.state["last_run"] = dict(stats, elapsed_seconds=round(time.time() - start, 3))
+            self.state["updated"] += stats.get("updated", stats.get("documents", 0))
+            self.state["removed"] += stats.get("removed", 0)
+            if error:
+                self.state["failures"] += 1
+                self.state["last_error"] = error
+                self.state["last_error_at"] = _utc_now()
+            else:
+                self.state["last_success"] = _utc_now()
+                self.state["last_success_ts"] = time.time()
+        
+        # Keep an exported search snapshot current so new processes don't fall back to Chroma
+        changed = stats.get("updated", stats.get("documents", 0)) or stats.get("removed", 0)
+        if changed:
+            try:
+                if (self.kb.snapshot_dir / "snapshot.json").exists():
+                    self.kb.export_snapshot()
+            except Exception as e:
+                print(f"Snapshot export failed: {e}")
+        return stats
+
+    def request_sync(self):
+        """Wake the worker so it syncs now."""
+        self._wake.set()
+
+    def stop(self):
+        """Stop after the current sync."""
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        """Warm the model, then sync every interval until stopped."""
+        print("Warming up the embedding model...")
+        self.kb.embedding_model.model
+        while not self._stop.is_set():
+            self.sync_once()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+        print("Sync worker stopped")
+
+    def status(self) -> Dict[str, Any]:
+        """Current sync state, including seconds since the last successful sync."""
+        with self._lock:
+            status = dict(self.state)
+        last_success_ts = status.pop("last_success_ts")
+        status["interval_seconds"] = self.interval
+        status["lag_seconds"] = round(time.time() - last_success_ts, 1) if last_success_ts else None
+        status["healthy"] = bool(last_success_ts) and time.time() - last_success_ts < self.interval * HEALTHY_INTERVALS
+        return status
+
+
+def make_status_handler(worker: SyncWorker):
+    """Build the HTTP handler class serving a worker's status."""
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def _send_json(self, code: int, payload: Dict[str, Any]):
+            body = json.dumps(payload, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._send_json(200, worker.status())
+            elif self.path == "/healthz":
+                status = worker.status()
+                self._send_json(200 if status["healthy"] else 503, {
+                    "healthy": status["healthy"], "lag_seconds": status["lag_seconds"]
+                })
+            elif self.path == "/metrics":
+                body = get_metrics().to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path == "/sync":
+                worker.request_sync()
+                self._send_json(202, {"queued": True})
+            else:
+                self._send_json(404, {"error": "not found"})
+
+        def log_message(self, format, *args):
+            # Keep polling of the endpoint out of the sync log
+            pass
+
+    return StatusHandler
+
+
+def main():
+    """Run the sync worker and its status endpoint until interrupted."""
+    parser = argparse.ArgumentParser(description="Keep the Vonga knowledge base in sync with Google Drive")
+    parser.add_argument("--interval", type=int, default=DEFAULT_POLL_INTERVAL_SECONDS,
+                        help="Seconds between polls of the Drive changes feed")
+    parser.add_argument("--host", default=DEFAULT_STATUS_HOST, help="Status endpoint address")
+    parser.add_argument("--port", type=int, default=DEFAULT_STATUS_PORT, help="Status endpoint port (0 to disable)")
+    parser.add_argument("--json", action="store_true",
+                        help="Stream sync events as JSON lines on stdout (log messages go to stderr)")
+    args = parser.parse_args()
+
+    progress = JsonLinesProgress(sys.stdout) if args.json else None
+    redirect = contextlib.redirect_stdout(sys.stderr) if args.json else contextlib.nullcontext()
+
+    with redirect:
+        print("Initializing knowledge base...")
+        kb = initialize_knowledge_base(get_credentials())
+        worker = SyncWorker(kb, interval=args.interval, progress=progress)
+
+        server = None
+        if args.port:
+            server = ThreadingHTTPServer((args.host, args.port), make_status_handler(worker))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            print(f"✓ Status endpoint on http://{args.host}:{server.server_address[1]}/status")
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+        print(f"✓ Syncing every {args.interval}s (Ctrl+C to stop)")
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            print("\nStopping...")
+        finally:
+            if server is not None:
+                server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,8 @@ from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
 from dateutil import parser as date_parser
 from dateutil import tz
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
+from google_clients import get_service
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 
@@ -37,7 +37,7 @@ class CalendarCreateEventInput(BaseModel):
 
 def get_calendar_service(creds: Credentials):
     """Get Calendar API service."""
-    return build('calendar', 'v3', credentials=creds)
+    return get_service(creds, 'calendar')
 
 
 class CalendarListTool(BaseTool):
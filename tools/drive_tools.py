@@ -3,8 +3,10 @@ Google Drive tools for reading and writing Google Docs.
 """
 
 from typing import List, Dict, Any, Optional
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
+from google_clients import get_service
+from drive_resolver import get_drive_resolver
+from doc_extractor import GET_ALL_TABS, document_text, extract_document
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 import io
@@ -34,17 +36,17 @@ class DriveAppendDocInput(BaseModel):
 
 def get_drive_service(creds: Credentials):
     """Get Drive API service."""
-    return build('drive', 'v3', credentials=creds)
+    return get_service(creds, 'drive')
 
 
 def get_docs_service(creds: Credentials):
     """Get Docs API service."""
-    return build('docs', 'v1', credentials=creds)
+    return get_service(creds, 'docs')
 
 
 def get_sheets_service(creds: Credentials):
     """Get Sheets API service."""
-    return build('sheets', 'v4', credentials=creds)
+    return get_service(creds, 'sheets')
 
 
 def read_google_doc_by_name(creds: Credentials, filename: str) -> str:
@@ -59,71 +61,20 @@ def read_google_doc_by_name(creds: Credentials, filename: str) -> str:
         Full text content of the document, or error message if not found
     """
     try:
-        drive_service = get_drive_service(creds)
         docs_service = get_docs_service(creds)
         
-        # Search for the document - try multiple variations
-        search_queries = [
-            f"name='{filename}'",
-            f"name contains '{filename}'",
-            f"fullText contains '{filename}'"
-        ]
+        # Find the document (exact name, then partial and full-text matches; lookups are cached) and read it
+        file, doc = get_drive_resolver().fetch(
+            creds, filename,
+            lambda file: docs_service.documents().get(documentId=file['id'], **GET_ALL_TABS).execute(),
+            mime_type='application/vnd.google-apps.document',
+            fuzzy=True
+        )
         
-        file_id = None
-        file_type = None
-        
-        for query in search_queries:
-            results = drive_service.files().list(
-                q=f"{query} and mimeType='application/vnd.google-apps.document'",
-                pageSize=5,
-                fields="files(id, name, mimeType)"
-            ).execute()
-            
-            files = results.get('files', [])
-            if files:
-                # Prefer exact match
-                exact_match = [f for f in files if f.get('name') == filename]
-                if exact_match:
-                    file_id = exact_match[0]['id']
-                    file_type = exact_match[0].get('mimeType', '')
-                    break
-                else:
-                    file_id = files[0]['id']
-                    file_type = files[0].get('mimeType', '')
-                    break
-        
-        if not file_id:
+        if not file:
             return f"Error: Google Doc '{filename}' not found. Please ensure the document exists in Google Drive."
         
-        # Read the document content
-        doc = docs_service.documents().get(documentId=file_id).execute()
-        title = doc.get('title', filename)
-        body_content = doc.get('body', {}).get('content', [])
-        
-        # Extract text from document elements
-        content = ""
-        for element in body_content:
-            if 'paragraph' in element:
-                para = element['paragraph']
-                for elem in para.get('elements', []):
-                    if 'textRun' in elem:
-                        content += elem['textRun'].get('content', '')
-            elif 'table' in element:
-                # Handle tables
-                for row in element['table'].get('tableRows', []):
-                    row_text = []
-                    for cell in row.get('tableCells', []):
-                        cell_content = cell.get('content', [])
-                        cell_text = ""
-                        for cell_elem in cell_content:
-                            if 'paragraph' in cell_elem:
-                                for para_elem in cell_elem['paragraph'].get('elements', []):
-                                    if 'textRun' in para_elem:
-                                        cell_text += para_elem['textRun'].get('content', '')
-                        row_text.append(cell_text)
-                    content += ' | '.join(row_text) + '\n'
-        
-        return content
+        return document_text(doc)
         
     except Exception as e:
         return f"Error reading document '{filename}': {str(e)}"
@@ -200,35 +151,15 @@ class DriveReadDocTool(BaseTool):
     def __init__(self, creds: Credentials, **kwargs):
         super().__init__(creds=creds, **kwargs)
     
-    def _extract_text(self, elements: List[Dict[str, Any]]) -> str:
-        """Recursively extract text from document elements."""
-        text_parts = []
-        for element in elements:
-            if 'paragraph' in element:
-                para = element['paragraph']
-                for elem in para.get('elements', []):
-                    if 'textRun' in elem:
-                        text_parts.append(elem['textRun'].get('content', ''))
-            elif 'table' in element:
-                # Handle tables - extract text from cells
-                for row in element['table'].get('tableRows', []):
-                    row_text = []
-                    for cell in row.get('tableCells', []):
-                        cell_text = self._extract_text(cell.get('content', []))
-                        row_text.append(cell_text)
-                    text_parts.append(' | '.join(row_text))
-        return ''.join(text_parts)
-    
     def _run(self, file_id: str) -> str:
         """Execute the read."""
         try:
             docs_service = get_docs_service(self.creds)
-            doc = docs_service.documents().get(documentId=file_id).execute()
-            
-            title = doc.get('title', 'Untitled')
-            content = doc.get('body', {}).get('content', [])
+            doc = docs_service.documents().get(documentId=file_id, **GET_ALL_TABS).execute()
             
-            text = self._extract_text(content)
+            extracted = extract_document(doc)
+            title = extracted['title'] or 'Untitled'
+            text = extracted['text']
             
             return f"Document: {title}\n\nContent:\n{text}"
         except Exception as e:
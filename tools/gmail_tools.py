@@ -3,11 +3,17 @@ Gmail tools for reading, searching, and drafting emails.
 """
 
 from typing import List, Dict, Any, Optional
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
+from google_clients import get_service
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 
+# Gmail recommends at most 50 requests per batch (the hard limit is 100)
+GMAIL_BATCH_SIZE = 50
+
+# Headers fetched for message listings
+METADATA_HEADERS = ['Subject', 'From', 'Date']
+
 
 class GmailSearchInput(BaseModel):
     """Input for Gmail search."""
@@ -28,7 +34,66 @@ class GmailDraftInput(BaseModel):
 
 def get_gmail_service(creds: Credentials):
     """Get Gmail API service."""
-    return build('gmail', 'v1', credentials=creds)
+    return get_service(creds, 'gmail')
+
+
+def get_message_metadata(service, message_ids: List[str],
+                         headers: List[str] = METADATA_HEADERS) -> List[Dict[str, Any]]:
+    """
+    Fetch the metadata of several messages in batched HTTP requests.
+    
+    Each message is fetched with format='metadata' and only the requested
+    headers, up to GMAIL_BATCH_SIZE messages per round trip. Messages that
+    fail inside a batch are retried once on their own.
+    
+    Args:
+        service: Gmail API service
+        message_ids: IDs of the messages to fetch
+        headers: Header names to include
+        
+    Returns:
+        Messages (id, threadId, labelIds, snippet, internalDate and payload
+        headers) in the order of message_ids; messages that can't be fetched
+        are left out
+    """
+    def metadata_request(message_id: str):
+        return service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format='metadata',
+            metadataHeaders=headers,
+            fields='id,threadId,labelIds,snippet,internalDate,payload/headers'
+        )
+    
+    fetched = {}
+    failed = []
+    
+    def on_response(request_id, response, exception):
+        if exception is None:
+            fetched[request_id] = response
+        else:
+            failed.append(request_id)
+    
+    # Request IDs must be unique within a batch
+    unique_ids = list(dict.fromkeys(message_ids))
+    for start in range(0, len(unique_ids), GMAIL_BATCH_SIZE):
+        batch = service.new_batch_http_request(callback=on_response)
+        for message_id in unique_ids[start:start + GMAIL_BATCH_SIZE]:
+            batch.add(metadata_request(message_id), request_id=message_id)
+        batch.execute()
+    
+    for message_id in failed:
+        try:
+            fetched[message_id] = metadata_request(message_id).execute()
+        except Exception as e:
+            print(f"Could not fetch message {message_id}: {e}")
+    
+    return [fetched[message_id] for message_id in message_ids if message_id in fetched]
+
+
+def message_headers(message: Dict[str, Any]) -> Dict[str, str]:
+    """Map of header name to value for a fetched message."""
+    return {h['name']: h['value'] for h in message.get('payload', {}).get('headers', [])}
 
 
 class GmailSearchTool(BaseTool):
@@ -51,20 +116,13 @@ class GmailSearchTool(BaseTool):
                 return f"No messages found for query: {query}"
             
             output = []
-            for msg in messages:
-                msg_detail = service.users().messages().get(userId='me', id=msg['id']).execute()
-                payload = msg_detail['payload']
-                headers = payload.get('headers', [])
-                
-                subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-                sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
-                date = next((h['value'] for h in headers if h['name'] == 'Date'), 'Unknown')
-                
+            for msg in get_message_metadata(service, [msg['id'] for msg in messages]):
+                headers = message_headers(msg)
                 output.append({
                     'id': msg['id'],
-                    'subject': subject,
-                    'from': sender,
-                    'date': date
+                    'subject': headers.get('Subject', 'No Subject'),
+                    'from': headers.get('From', 'Unknown'),
+                    'date': headers.get('Date', 'Unknown')
                 })
             
             return f"Found {len(output)} messages:\n" + "\n".join([
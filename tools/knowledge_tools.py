@@ -6,13 +6,25 @@ from typing import List, Optional
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 from google.oauth2.credentials import Credentials
-from knowledge_base import KnowledgeBase, initialize_knowledge_base
+from knowledge_base import KnowledgeBase, initialize_knowledge_base, DOC_MIME_TYPE, SHEET_MIME_TYPE
+
+# Friendly file type names accepted by the search tool
+FILE_TYPE_ALIASES = {
+    "doc": DOC_MIME_TYPE,
+    "document": DOC_MIME_TYPE,
+    "sheet": SHEET_MIME_TYPE,
+    "spreadsheet": SHEET_MIME_TYPE,
+}
 
 
 class KnowledgeSearchInput(BaseModel):
     """Input for searching the knowledge base."""
     query: str = Field(description="Search query to find relevant business information")
     n_results: int = Field(default=5, description="Number of results to return (default: 5)")
+    file_id: Optional[str] = Field(default=None, description="Only search within this Google Drive file ID")
+    file_type: Optional[str] = Field(default=None, description="Only search this file type: 'document' or 'spreadsheet'")
+    indexed_after: Optional[str] = Field(default=None, description="Only results indexed on or after this date (YYYY-MM-DD)")
+    indexed_before: Optional[str] = Field(default=None, description="Only results indexed on or before this date (YYYY-MM-DD)")
 
 
 class KnowledgeSearchTool(BaseTool):
@@ -26,6 +38,11 @@ class KnowledgeSearchTool(BaseTool):
     - Historical information or context
     - Any business-related information that might be in company documents
     
+    OPTIONAL filters (use them to narrow results instead of asking for more results):
+    - file_id (string): only search within one document (e.g. a File ID from a previous result)
+    - file_type (string): 'document' or 'spreadsheet'
+    - indexed_after / indexed_before (string): date range in YYYY-MM-DD format
+    
     The tool will return relevant excerpts from indexed documents. Use this information
     to provide accurate, context-aware responses."""
     knowledge_base: KnowledgeBase = Field(exclude=True)
@@ -33,28 +50,61 @@ class KnowledgeSearchTool(BaseTool):
     def __init__(self, knowledge_base: KnowledgeBase, **kwargs):
         super().__init__(knowledge_base=knowledge_base, **kwargs)
     
-    def _run(self, query: str, n_results: int = 5) -> str:
+    def _search_kwargs(self, n_results: int, file_id: str, file_type: str,
+                       indexed_after: str, indexed_before: str) -> dict:
+        """Build KnowledgeBase.search keyword arguments from tool arguments."""
+        if file_type:
+            file_type = FILE_TYPE_ALIASES.get(file_type.strip().lower(), file_type)
+        return {
+            "n_results": n_results,
+            "file_id": file_id,
+            "file_type": file_type,
+            "indexed_after": indexed_after,
+            "indexed_before": indexed_before
+        }
+    
+    def _format_results(self, query: str, results: List[dict]) -> str:
+        """Format search results for the agent."""
+        if not results:
+            return f"No relevant information found for: {query}"
+        
+        output = [f"Found {len(results)} relevant result(s) for: {query}\n"]
+        
+        for i, result in enumerate(results, 1):
+            source = result['file_name']
+            if result.get('section'):
+                source += f" > {result['section']}"
+            if result.get('relevance') is not None:
+                source += f", relevance {result['relevance']:.2f}"
+            output.append(f"\n--- Result {i} (from: {source}) ---")
+            output.append(result['content'])
+            output.append(f"[Source: {result['file_name']}, File ID: {result['file_id']}]")
+        
+        return "\n".join(output)
+    
+    def _run(self, query: str, n_results: int = 5, file_id: str = None, file_type: str = None,
+             indexed_after: str = None, indexed_before: str = None) -> str:
         """Execute the search."""
         try:
-            results = self.knowledge_base.search(query, n_results=n_results)
-            
-            if not results:
-                return f"No relevant information found for: {query}"
-            
-            output = [f"Found {len(results)} relevant result(s) for: {query}\n"]
-            
-            for i, result in enumerate(results, 1):
-                output.append(f"\n--- Result {i} (from: {result['file_name']}) ---")
-                output.append(result['content'])
-                output.append(f"[Source: {result['file_name']}, File ID: {result['file_id']}]")
-            
-            return "\n".join(output)
+            results = self.knowledge_base.search(
+                query,
+                **self._search_kwargs(n_results, file_id, file_type, indexed_after, indexed_before)
+            )
+            return self._format_results(query, results)
         except Exception as e:
             return f"Error searching knowledge base: {str(e)}"
     
-    async def _arun(self, query: str, n_results: int = 5) -> str:
-        """Async version - not implemented."""
-        raise NotImplementedError("Async not implemented")
+    async def _arun(self, query: str, n_results: int = 5, file_id: str = None, file_type: str = None,
+                    indexed_after: str = None, indexed_before: str = None) -> str:
+        """Execute the search without blocking the event loop."""
+        try:
+            results = await self.knowledge_base.asearch(
+                query,
+                **self._search_kwargs(n_results, file_id, file_type, indexed_after, indexed_before)
+            )
+            return self._format_results(query, results)
+        except Exception as e:
+            return f"Error searching knowledge base: {str(e)}"
 
 
 def get_knowledge_tools(knowledge_base: KnowledgeBase) -> List[BaseTool]:
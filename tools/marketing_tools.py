@@ -7,7 +7,8 @@ from google.oauth2.credentials import Credentials
 from langchain.tools import BaseTool
 from pydantic import Field
 import pandas as pd
-from tools.drive_tools import get_sheets_service, get_drive_service, get_docs_service, read_google_doc_by_name
+from drive_resolver import get_drive_resolver
+from tools.drive_tools import get_sheets_service, get_docs_service, read_google_doc_by_name
 
 
 class AnalyzePerformanceMetricsTool(BaseTool):
@@ -28,24 +29,21 @@ class AnalyzePerformanceMetricsTool(BaseTool):
         """Execute the performance metrics analysis."""
         try:
             sheets_service = get_sheets_service(self.creds)
-            drive_service = get_drive_service(self.creds)
             
-            # Search for the sheet
+            # Find the sheet (name lookups are cached) and read its tabs
             sheet_name = "Vonga_Marketing_Metrics"
-            results = drive_service.files().list(
-                q=f"name='{sheet_name}' and mimeType='application/vnd.google-apps.spreadsheet'",
-                fields="files(id, name)"
-            ).execute()
-            
-            files = results.get('files', [])
+            file, spreadsheet = get_drive_resolver().fetch(
+                self.creds, sheet_name,
+                lambda file: sheets_service.spreadsheets().get(spreadsheetId=file['id']).execute(),
+                mime_type='application/vnd.google-apps.spreadsheet'
+            )
             
-            if not files:
+            if not file:
                 return f"Error: Google Sheet '{sheet_name}' not found. Please create the sheet first with campaign data."
             
-            spreadsheet_id = files[0]['id']
+            spreadsheet_id = file['id']
             
             # Get the first sheet
-            spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
             sheet_names = [s.get('properties', {}).get('title', 'Sheet1') for s in spreadsheet.get('sheets', [])]
             first_sheet = sheet_names[0] if sheet_names else 'Sheet1'
             
@@ -4,20 +4,12 @@ Specifically for saving prospect data to the customer database.
 """
 
 from typing import Dict, Any, Optional
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 from langchain.tools import BaseTool
 from pydantic import Field
 
-
-def get_sheets_service(creds: Credentials):
-    """Get Sheets API service."""
-    return build('sheets', 'v4', credentials=creds)
-
-
-def get_drive_service(creds: Credentials):
-    """Get Drive API service."""
-    return build('drive', 'v3', credentials=creds)
+from drive_resolver import get_drive_resolver
+from tools.drive_tools import get_sheets_service
 
 
 class ReadCustomerDBTool(BaseTool):
@@ -40,24 +32,21 @@ class ReadCustomerDBTool(BaseTool):
         """Execute the read operation."""
         try:
             sheets_service = get_sheets_service(self.creds)
-            drive_service = get_drive_service(self.creds)
             
-            # Search for the sheet
+            # Find the sheet (name lookups are cached) and read its tabs
             sheet_name = "Vonga_Customer_DB"
-            results = drive_service.files().list(
-                q=f"name='{sheet_name}' and mimeType='application/vnd.google-apps.spreadsheet'",
-                fields="files(id, name)"
-            ).execute()
-            
-            files = results.get('files', [])
+            file, spreadsheet = get_drive_resolver().fetch(
+                self.creds, sheet_name,
+                lambda file: sheets_service.spreadsheets().get(spreadsheetId=file['id']).execute(),
+                mime_type='application/vnd.google-apps.spreadsheet'
+            )
             
-            if not files:
+            if not file:
                 return f"Error: Google Sheet '{sheet_name}' not found. Please create the sheet first."
             
-            spreadsheet_id = files[0]['id']
+            spreadsheet_id = file['id']
             
             # Get the first sheet
-            spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
             sheet_names = [s.get('properties', {}).get('title', 'Sheet1') for s in spreadsheet.get('sheets', [])]
             first_sheet = sheet_names[0] if sheet_names else 'Sheet1'
             
@@ -130,24 +119,21 @@ class UpdateCustomerDBTool(BaseTool):
             from datetime import datetime
             
             sheets_service = get_sheets_service(self.creds)
-            drive_service = get_drive_service(self.creds)
             
-            # Search for the sheet
+            # Find the sheet (name lookups are cached) and read its tabs
             sheet_name = "Vonga_Customer_DB"
-            results = drive_service.files().list(
-                q=f"name='{sheet_name}' and mimeType='application/vnd.google-apps.spreadsheet'",
-                fields="files(id, name)"
-            ).execute()
-            
-            files = results.get('files', [])
+            file, spreadsheet = get_drive_resolver().fetch(
+                self.creds, sheet_name,
+                lambda file: sheets_service.spreadsheets().get(spreadsheetId=file['id']).execute(),
+                mime_type='application/vnd.google-apps.spreadsheet'
+            )
             
-            if not files:
+            if not file:
                 return f"Error: Google Sheet '{sheet_name}' not found. Please create the sheet first."
             
-            spreadsheet_id = files[0]['id']
+            spreadsheet_id = file['id']
             
             # Get the first sheet
-            spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
             sheet_names = [s.get('properties', {}).get('title', 'Sheet1') for s in spreadsheet.get('sheets', [])]
             first_sheet = sheet_names[0] if sheet_names else 'Sheet1'
             
@@ -231,24 +217,21 @@ class SaveProspectToDBTool(BaseTool):
             from datetime import datetime
             
             sheets_service = get_sheets_service(self.creds)
-            drive_service = get_drive_service(self.creds)
             
-            # Search for the sheet
+            # Find the sheet (name lookups are cached) and read its tabs
             sheet_name = "Vonga_Customer_DB"
-            results = drive_service.files().list(
-                q=f"name='{sheet_name}' and mimeType='application/vnd.google-apps.spreadsheet'",
-                fields="files(id, name)"
-            ).execute()
-            
-            files = results.get('files', [])
+            file, spreadsheet = get_drive_resolver().fetch(
+                self.creds, sheet_name,
+                lambda file: sheets_service.spreadsheets().get(spreadsheetId=file['id']).execute(),
+                mime_type='application/vnd.google-apps.spreadsheet'
+            )
             
-            if not files:
+            if not file:
                 return f"Error: Google Sheet '{sheet_name}' not found. Please create the sheet first."
             
-            spreadsheet_id = files[0]['id']
+            spreadsheet_id = file['id']
             
             # Get the first sheet (or default to Sheet1)
-            spreadsheet = sheets_service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
             sheet_names = [s.get('properties', {}).get('title', 'Sheet1') for s in spreadsheet.get('sheets', [])]
             first_sheet = sheet_names[0] if sheet_names else 'Sheet1'
             
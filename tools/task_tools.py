@@ -3,8 +3,8 @@ Google Tasks tools for listing and creating tasks.
 """
 
 from typing import List, Dict, Any, Optional
-from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
+from google_clients import get_service
 from langchain.tools import BaseTool
 from pydantic import BaseModel, Field
 
@@ -26,7 +26,7 @@ class TaskCreateInput(BaseModel):
 
 def get_tasks_service(creds: Credentials):
     """Get Tasks API service."""
-    return build('tasks', 'v1', credentials=creds)
+    return get_service(creds, 'tasks')
 
 
 class TaskListTool(BaseTool):
@@ -1,6 +1,7 @@
 #!/bin/bash
 # Daily knowledge base update script
-# This script updates the knowledge base by indexing new documents
+# This script updates the knowledge base with documents added, modified or
+# trashed since the last run (via the Drive changes feed)
 
 # Get the directory where this script is located
 SCRIPT_DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" && pwd )"
@@ -16,8 +17,8 @@ log_message() {
 
 log_message "Starting knowledge base update..."
 
-# Run the indexing script (option 1 = index all docs)
-python3 index_knowledge_base.py 1 >> "$LOG_FILE" 2>&1
+# Run the incremental update (resumes from the saved changes-feed position)
+python3 index_knowledge_base.py update >> "$LOG_FILE" 2>&1
 
 # Check exit status
 if [ $? -eq 0 ]; then